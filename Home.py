@@ -2,10 +2,25 @@ import streamlit as st
 import pandas as pd
 import os
 from datetime import datetime
+from helpers import get_meals_file
+from adherence import load_tracker, read_goal, set_goal
+from insights import load_insight
+
+def dashboard_summary(tracker, goal_calories, today):
+    """Today's totals and adherence windows shown on the dashboard."""
+    consumed = tracker.consumed(today)
+    return {
+        "consumed": consumed,
+        "remaining": max(goal_calories - consumed, 0),
+        "progress": min(consumed / goal_calories, 1.0),
+        "current_streak": tracker.current_streak(today),
+        "week": tracker.rolling(7, today),
+        "month": tracker.rolling(30, today),
+    }
+
 
 def home_page():
-    st.set_page_config(page_title="Calorie & Nutrition Tracker", layout="wide")
-    
+    # Page config is set once in main.py; a second call here raises
     username = st.session_state.get("user", "demo")   # logged-in user
 
     st.title("🍎 Calorie & Nutrition Tracker")
@@ -17,12 +32,7 @@ def home_page():
     # -------------------------------------------------
     os.makedirs("data", exist_ok=True)
 
-    if username == "demo":
-        MEALS_FILE = "data/meals.csv"
-        GOAL_FILE = "data/goal.txt"
-    else:
-        MEALS_FILE = f"data/{username}_meals.csv"
-        GOAL_FILE = f"data/goal_{username}.txt"
+    MEALS_FILE = get_meals_file(username)
 
     # -------------------------------------------------
     # MEALS CSV INITIALIZATION
@@ -34,22 +44,15 @@ def home_page():
         ])
         empty_df.to_csv(MEALS_FILE, index=False)
 
-    df = pd.read_csv(MEALS_FILE)
-
-    if "Date" in df.columns:
-        df["Date"] = pd.to_datetime(df["Date"], errors="coerce").dt.date
+    # Daily totals + goal history, kept up to date as meals are logged
+    tracker = load_tracker(username)
 
     # -------------------------------------------------
     # CALORIE GOAL HANDLING
     # -------------------------------------------------
     st.header("🎯 Daily Calorie Goal")
 
-    if not os.path.exists(GOAL_FILE):
-        with open(GOAL_FILE, "w") as f:
-            f.write("2000")
-
-    with open(GOAL_FILE, "r") as f:
-        goal_calories = int(f.read().strip())
+    goal_calories = read_goal(username)
 
     new_goal = st.number_input(
         "Set your daily calorie goal:",
@@ -58,8 +61,7 @@ def home_page():
     )
 
     if new_goal != goal_calories:
-        with open(GOAL_FILE, "w") as f:
-            f.write(str(new_goal))
+        tracker = set_goal(username, new_goal, tracker)
         goal_calories = new_goal
         st.success(f"Updated your daily goal to {goal_calories} kcal ✔")
 
@@ -69,21 +71,48 @@ def home_page():
     st.header("📊 Today's Overview")
     today = datetime.now().date()
 
-    if not df.empty:
-        today_df = df[df["Date"] == today]
-        consumed = today_df["Calories"].sum()
-        remaining = max(goal_calories - consumed, 0)
+    if tracker.daily:
+        summary = dashboard_summary(tracker, goal_calories, today)
 
         col1, col2, col3 = st.columns(3)
         col1.metric("Goal", f"{goal_calories} kcal")
-        col2.metric("Consumed", f"{consumed:.0f} kcal")
-        col3.metric("Remaining", f"{remaining:.0f} kcal")
-
-        progress = min(consumed / goal_calories, 1.0)
-        st.progress(progress)
+        col2.metric("Consumed", f"{summary['consumed']:.0f} kcal")
+        col3.metric("Remaining", f"{summary['remaining']:.0f} kcal")
+
+        st.progress(summary["progress"])
+
+        # -------------------------------------------------
+        # GOAL ADHERENCE
+        # -------------------------------------------------
+        st.header("🏆 Goal Adherence")
+        week = summary["week"]
+        month = summary["month"]
+
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Current Streak", f"{summary['current_streak']} days")
+        col2.metric("Best Streak", f"{tracker.best_streak} days")
+        col3.metric("Last 7 Days", f"{week['days_met']}/7 days",
+                    f"{week['deficit']:+.0f} kcal deficit")
+        col4.metric("Last 30 Days", f"{month['days_met']}/30 days",
+                    f"{month['deficit']:+.0f} kcal deficit")
+
+        st.caption(
+            f"Goal met on {tracker.days_met} of {tracker.days_logged} logged days · "
+            f"all-time deficit {tracker.total_deficit:+.0f} kcal"
+        )
     else:
         st.info("Start logging your meals to see your progress.")
 
+    # -------------------------------------------------
+    # WEEKLY INSIGHT (written by the nightly insights job)
+    # -------------------------------------------------
+    insight = load_insight(username)
+    if insight:
+        st.header("🧠 Your Weekly Insight")
+        st.write(insight["text"])
+        stats = insight["stats"]
+        st.caption(f"Week of {stats['week_start']} – {stats['week_end']} · generated {insight['generated_at']}")
+
     # -------------------------------------------------
     # QUICK NAVIGATION
     # -------------------------------------------------
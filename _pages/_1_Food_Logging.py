@@ -2,6 +2,17 @@ import streamlit as st
 import pandas as pd
 import os
 from datetime import datetime, date
+import archive
+import changes
+from helpers import get_meals_file
+from meal_store import (
+    ensure_meals_file, locked_log, read_meals_file, append_meal, update_meal, delete_meal, new_entry_id
+)
+from adherence import load_tracker
+from catalog import load_catalog
+from food_index import load_food_index, time_of_day
+from profiling import span
+from swaps import GOALS, load_swap_index, swap_label
 
 def food_logging_page():
     # ---------------------------
@@ -17,23 +28,13 @@ def food_logging_page():
     # USER-SPECIFIC PATHS
     # ---------------------------
     DATA_DIR = "data"
-    if username == "demo":
-        MEALS_FILE = os.path.join(DATA_DIR, "meals.csv")
-    else:
-        MEALS_FILE = os.path.join(DATA_DIR, f"{username}_meals.csv")
+    MEALS_FILE = get_meals_file(username)
 
     USDA_FILE = "USDA.csv"
 
     if not os.path.exists(DATA_DIR):
         os.makedirs(DATA_DIR)
 
-    expected_cols = ["DateTime", "Date", "MealType", "Meal",
-                     "Servings", "Calories", "Protein", "Carbs", "Fat"]
-
-    # Ensure meals file exists
-    if not os.path.exists(MEALS_FILE) or os.stat(MEALS_FILE).st_size == 0:
-        pd.DataFrame(columns=expected_cols).to_csv(MEALS_FILE, index=False)
-
     # ---------------------------
     # Load USDA
     # ---------------------------
@@ -41,60 +42,11 @@ def food_logging_page():
         st.error("Missing USDA.csv. Please place it in the main folder.")
         st.stop()
 
-    meals_df = pd.read_csv(USDA_FILE)
-    meals_df = meals_df.rename(columns={"Description": "Meal", "Carbohydrate": "Carbs"})
-    for col in ["Calories", "Protein", "Carbs", "Fat"]:
-        meals_df[col] = pd.to_numeric(meals_df[col], errors="coerce")
-
-    # Meal Name Cleanup
-    def get_display_name(desc):
-        if pd.isna(desc):
-            return "Unknown"
-        desc = str(desc).lower()
-        if "rice" in desc:
-            if "brown" in desc:
-                return "Brown Rice"
-            elif "wild" in desc:
-                return "Wild Rice"
-            return "White Rice"
-        if "chick" in desc:
-            return "Chicken"
-        if "tomato" in desc:
-            return "Tomato"
-        if "butter" in desc:
-            return "Butter"
-        if "milk" in desc:
-            return "Milk"
-        if "soup" in desc:
-            if "tomato" in desc:
-                return "Tomato Soup"
-            if "chick" in desc:
-                return "Chicken Soup"
-        return str(desc).split(",")[0].title()
-
-    meals_df["DisplayMeal"] = meals_df["Meal"].apply(get_display_name)
-
-    friendly_df = meals_df.groupby("DisplayMeal").agg({
-        "Calories": "mean",
-        "Protein": "mean",
-        "Carbs": "mean",
-        "Fat": "mean"
-    }).reset_index()
+    # Parsed once per USDA.csv version, with ID / DisplayMeal hash indexes
+    catalog = load_catalog(USDA_FILE)
 
-    # ---------------------------
-    # Helper functions
-    # ---------------------------
-    def read_meals_file():
-        df = pd.read_csv(MEALS_FILE)
-        for col in expected_cols:
-            if col not in df.columns:
-                df[col] = pd.NA
-        for col in ["Servings", "Calories", "Protein", "Carbs", "Fat"]:
-            df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0)
-        return df[expected_cols]
-
-    def write_meals_file(df):
-        df.to_csv(MEALS_FILE, index=False)
+    # Ensure meals file exists (and every entry has an ID)
+    ensure_meals_file(MEALS_FILE, catalog)
 
     # ---------------------------
     # Session State
@@ -111,16 +63,101 @@ def food_logging_page():
         st.session_state.meals_by_date[username] = {}
 
     user_meals_by_date = st.session_state.meals_by_date[username]
-    all_meals_df = read_meals_file()
+
+    # Apply what changed elsewhere (another tab, the API) since this session last looked
+    cursors = st.session_state.setdefault("changes_cursor", {})
+    feed = changes.changes_since(MEALS_FILE, cursors.get(username))
+    if feed["reset"]:
+        user_meals_by_date.clear()  # days are reloaded from the log below as they're viewed
+    for event in feed["changes"]:
+        entry = event["entry"]
+        for day, day_meals in user_meals_by_date.items():
+            if event["EntryID"] in day_meals and (entry is None or entry["Date"] != day):
+                del day_meals[event["EntryID"]]
+        if entry is not None and entry["Date"] in user_meals_by_date:
+            user_meals_by_date[entry["Date"]][event["EntryID"]] = entry
+    cursors[username] = feed["cursor"]
+
+    all_meals_df = read_meals_file(MEALS_FILE, catalog)
+
+    # Goal adherence totals and the quick-add food index are updated in place on every add/edit/delete,
+    # each reloaded under the log's lock so changes made by another process (the API) are kept
+    food_index = load_food_index(username)
+
+    def log_meal(row):
+        # Under the log's lock: the log and its derived state are flushed together
+        with span("meals.log", "write"), locked_log(MEALS_FILE):
+            # Add to session-state
+            user_meals_by_date.setdefault(row["Date"], {})[row["EntryID"]] = row
+
+            # Write to CSV
+            append_meal(MEALS_FILE, row, catalog)
+            tracker = load_tracker(username)
+            tracker.add_calories(row["Date"], row["Calories"])
+            tracker.save()
+            current_index = load_food_index(username)
+            current_index.record(row)
+            current_index.save()
 
     # ---------------------------
     # Load meals for selected date from CSV if not in session-state
+    # (EntryID -> row, so edit / delete find their entry directly)
     # ---------------------------
     if selected_date_str not in user_meals_by_date:
-        user_meals_by_date[selected_date_str] = all_meals_df[all_meals_df["Date"] == selected_date_str].to_dict("records")
+        day_rows = all_meals_df[all_meals_df["Date"] == selected_date_str].to_dict("records")
+        # Days older than the hot window live (mostly) in the monthly archive
+        if archive.covers(MEALS_FILE, selected_date_str):
+            day_rows = archive.read_archived(MEALS_FILE, selected_date_str, selected_date_str).to_dict("records") + day_rows
+        user_meals_by_date[selected_date_str] = {r["EntryID"]: r for r in day_rows}
 
     today_meals = user_meals_by_date[selected_date_str]
 
+    # ---------------------------
+    # Quick Add (favorites + most logged foods, no search)
+    # ---------------------------
+    if food_index.foods:
+        st.subheader("⚡ Quick Add")
+        meal_types = ["Breakfast", "Lunch", "Dinner", "Snack"]
+        bucket = time_of_day(datetime.now().hour)
+        likely_type = food_index.likely_meal_type(bucket)
+        quick_type = st.radio(
+            "Log as", meal_types, horizontal=True,
+            index=meal_types.index(likely_type) if likely_type in meal_types else 0,
+            key="quick_meal_type"
+        )
+
+        quick_foods = food_index.favorite_foods() + food_index.top_foods(quick_type, bucket)
+        quick_cols = st.columns(4)
+        for i, (key, stats) in enumerate(quick_foods):
+            entry = stats["entry"]
+            is_favorite = key in food_index.favorites
+            label = entry["Meal"]
+            if entry.get("Unit") and entry.get("Quantity") is not None:
+                label += f" · {entry['Quantity']:g} {entry['Unit']}"
+            if entry.get("Calories") is not None:  # None for foods without USDA nutrients
+                label += f" ({entry['Calories']:.0f} kcal)"
+
+            col = quick_cols[i % 4]
+            if col.button(("⭐ " if is_favorite else "") + label, key=f"quick_{key}"):
+                row = dict(entry)
+                row.update({
+                    "EntryID": new_entry_id(),
+                    "DateTime": datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f"),
+                    "Date": selected_date_str,
+                    "MealType": quick_type,
+                })
+                row["FoodID"] = pd.NA if row["FoodID"] is None else row["FoodID"]
+                row["Grams"] = pd.NA if row["Grams"] is None else row["Grams"]
+                log_meal(row)
+                st.success(f"{quick_type} - {entry['Meal']} added!")
+                st.rerun()
+            if col.button("Unpin" if is_favorite else "☆ Pin", key=f"pin_{key}"):
+                with locked_log(MEALS_FILE):
+                    current_index = load_food_index(username)
+                    current_index.toggle_favorite(key)
+                    current_index.save()
+                st.rerun()
+
     # ---------------------------
     # Meal Input
     # ---------------------------
@@ -130,24 +167,61 @@ def food_logging_page():
     matched_meals = pd.DataFrame()
 
     if meal_input.strip():
-        matched_meals = friendly_df[friendly_df["DisplayMeal"]
-                                    .str.contains(meal_input, case=False, na=False)]
+        matched_meals = catalog.search(meal_input)
         if not matched_meals.empty:
             option = st.selectbox("Select Meal", matched_meals["DisplayMeal"].tolist())
             if option:
-                selected_meal = matched_meals[matched_meals["DisplayMeal"] == option].iloc[0]
+                selected_meal = catalog.by_display[option]
+
+                # Pick a specific USDA food instead of the average of every variant
+                variant_ids = catalog.variants.get(option, ())
+                if len(variant_ids) > 1:
+                    variant = st.selectbox(
+                        "Variant",
+                        [None] + list(variant_ids),
+                        format_func=lambda i: f"Average of all {len(variant_ids)} variants"
+                        if i is None else f"{catalog.by_id[i].Meal.title()} (#{i})"
+                    )
+                    if variant is not None:
+                        selected_meal = catalog.by_id[variant]
+                elif variant_ids:
+                    selected_meal = catalog.by_id[variant_ids[0]]
 
     meal_type = st.selectbox("Meal Type", ["Breakfast", "Lunch", "Dinner", "Snack"])
-    servings = st.number_input("Servings", min_value=0.1, value=1.0, step=0.1)
 
     # Autofill macros
     if selected_meal is not None:
-        calories = selected_meal["Calories"] * servings
-        protein = selected_meal["Protein"] * servings
-        carbs = selected_meal["Carbs"] * servings
-        fat = selected_meal["Fat"] * servings
-        st.info(f"Calories: {calories:.1f} kcal | Protein: {protein:.1f} g | Carbs: {carbs:.1f} g | Fat: {fat:.1f} g")
+        units = catalog.portions.available_units(selected_meal.DisplayMeal)
+        default_unit = catalog.portions.default_unit(selected_meal.DisplayMeal)
+        col_qty, col_unit = st.columns(2)
+        quantity = col_qty.number_input("Quantity", min_value=0.1, value=1.0, step=0.1)
+        unit = col_unit.selectbox("Unit", units, index=units.index(default_unit))
+
+        grams = catalog.to_grams(selected_meal, quantity, unit)
+        servings = grams / 100  # USDA basis
+        macros = catalog.macros(selected_meal, grams)
+        calories = macros["Calories"]
+        protein = macros["Protein"]
+        carbs = macros["Carbs"]
+        fat = macros["Fat"]
+        st.info(f"{grams:.0f} g → Calories: {calories:.1f} kcal | Protein: {protein:.1f} g | Carbs: {carbs:.1f} g | Fat: {fat:.1f} g")
+        if catalog.extra_nutrients:
+            extras = catalog.nutrients_in(selected_meal, grams, catalog.extra_nutrients)
+            st.caption(" | ".join(f"{name}: {value:.1f}" for name, value in extras.items()))
+
+        # Similar foods with fewer calories / more protein at the same grams
+        preview = pd.DataFrame([dict(macros, Meal=selected_meal.DisplayMeal, Grams=grams)])
+        swap_index = load_swap_index(USDA_FILE)
+        suggestions = []
+        for goal, label in GOALS.items():
+            options = swap_index.swaps(preview, goal)[0]
+            if options:
+                suggestions.append(f"**{label}:** " + " · ".join(swap_label(s) for s in options))
+        if suggestions:
+            st.caption("🔄 Healthier swaps — " + " | ".join(suggestions))
     else:
+        servings = st.number_input("Servings", min_value=0.1, value=1.0, step=0.1)
+        quantity, unit, grams = servings, "serving", None
         calories = st.number_input("Calories", min_value=0.0, value=0.0)
         protein = st.number_input("Protein", min_value=0.0, value=0.0)
         carbs = st.number_input("Carbs", min_value=0.0, value=0.0)
@@ -161,8 +235,11 @@ def food_logging_page():
             st.warning("Please enter a meal name.")
         else:
             # Use selected_meal for autofill or manual values
+            food_id = pd.NA
             if selected_meal is not None:
-                meal_name = selected_meal["DisplayMeal"]
+                meal_name = selected_meal.DisplayMeal
+                if selected_meal.FoodID is not None:
+                    food_id = selected_meal.FoodID
                 calories_val = calories
                 protein_val = protein
                 carbs_val = carbs
@@ -176,6 +253,7 @@ def food_logging_page():
 
             timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")
             row = {
+                "EntryID": new_entry_id(),
                 "DateTime": timestamp,
                 "Date": selected_date_str,
                 "MealType": meal_type,
@@ -184,16 +262,14 @@ def food_logging_page():
                 "Calories": float(calories_val),
                 "Protein": float(protein_val),
                 "Carbs": float(carbs_val),
-                "Fat": float(fat_val)
+                "Fat": float(fat_val),
+                "FoodID": food_id,
+                "Quantity": float(quantity),
+                "Unit": unit,
+                "Grams": float(grams) if grams is not None else pd.NA
             }
 
-            # Add to session-state
-            user_meals_by_date.setdefault(selected_date_str, []).append(row)
-
-            # Write to CSV
-            all_meals_df = read_meals_file()
-            all_meals_df = pd.concat([all_meals_df, pd.DataFrame([row])], ignore_index=True)
-            write_meals_file(all_meals_df)
+            log_meal(row)
 
             st.success(f"{meal_type} - {meal_name} added!")
             st.rerun()
@@ -209,26 +285,50 @@ def food_logging_page():
         order = ["Breakfast", "Lunch", "Dinner", "Snack"]
 
         for m_type in order:
-            meals = [m for m in today_meals if m["MealType"] == m_type]
+            meals = [m for m in today_meals.values() if m["MealType"] == m_type]
             if meals:
                 st.markdown(f"### {m_type}")
-                for idx, row in enumerate(meals):
-                    edit_key = f"edit_{m_type}_{idx}_{selected_date_str}"
-                    save_key = f"save_{m_type}_{idx}_{selected_date_str}"
-                    delete_key = f"delete_{m_type}_{idx}_{selected_date_str}"
-
-                    if st.session_state.get(edit_key, False):
+                for row in meals:
+                    # Widget keys follow the entry, not its position in the list
+                    entry_id = row["EntryID"]
+                    editing_key = f"editing_{entry_id}"
+                    edit_key = f"edit_{entry_id}"
+                    save_key = f"save_{entry_id}"
+                    delete_key = f"delete_{entry_id}"
+
+                    if st.session_state.get(editing_key, False):
                         col1, col2, col3, col4, col5, col6, col7 = st.columns([3,1,1,1,1,1,1])
                         col1.write(row["Meal"])
-                        servings = col2.number_input("Servings", min_value=0.1, value=row["Servings"], step=0.1, key=f"servings_{idx}_{selected_date_str}")
-                        calories = col3.number_input("Calories", min_value=0.0, value=row["Calories"], step=0.1, key=f"cal_{idx}_{selected_date_str}")
-                        protein = col4.number_input("Protein", min_value=0.0, value=row["Protein"], step=0.1, key=f"protein_{idx}_{selected_date_str}")
-                        carbs = col5.number_input("Carbs", min_value=0.0, value=row["Carbs"], step=0.1, key=f"carbs_{idx}_{selected_date_str}")
-                        fat = col6.number_input("Fat", min_value=0.0, value=row["Fat"], step=0.1, key=f"fat_{idx}_{selected_date_str}")
+                        row_unit = row.get("Unit") if isinstance(row.get("Unit"), str) else "serving"
+                        row_quantity = row.get("Quantity", row["Servings"])
+                        if pd.isna(row_quantity):
+                            row_quantity = row["Servings"]
+                        quantity = col2.number_input(f"Qty ({row_unit})", min_value=0.1, value=float(row_quantity), step=0.1, key=f"qty_{entry_id}")
+                        calories = col3.number_input("Calories", min_value=0.0, value=float(row["Calories"]), step=0.1, key=f"cal_{entry_id}")
+                        protein = col4.number_input("Protein", min_value=0.0, value=float(row["Protein"]), step=0.1, key=f"protein_{entry_id}")
+                        carbs = col5.number_input("Carbs", min_value=0.0, value=float(row["Carbs"]), step=0.1, key=f"carbs_{entry_id}")
+                        fat = col6.number_input("Fat", min_value=0.0, value=float(row["Fat"]), step=0.1, key=f"fat_{entry_id}")
 
                         if col7.button("💾 Save", key=save_key):
+                            old_calories = row["Calories"]
+
+                            # Catalog foods: quantity → grams; if macros were left untouched, rescale them
+                            record = catalog.get(row.get("FoodID"), row["Meal"])
+                            grams = row.get("Grams", pd.NA)
+                            servings = quantity
+                            if record is not None and not pd.isna(catalog.to_grams(record, 1, row_unit)):
+                                grams = catalog.to_grams(record, quantity, row_unit)
+                                servings = grams / 100
+                                macros_unchanged = (calories, protein, carbs, fat) == (
+                                    row["Calories"], row["Protein"], row["Carbs"], row["Fat"])
+                                if quantity != row_quantity and macros_unchanged:
+                                    macros = catalog.macros(record, grams)
+                                    calories, protein, carbs, fat = (
+                                        macros["Calories"], macros["Protein"], macros["Carbs"], macros["Fat"])
+
                             # Update session-state
-                            user_meals_by_date[selected_date_str][idx] = {
+                            updated = {
+                                "EntryID": entry_id,
                                 "DateTime": row["DateTime"],
                                 "Date": selected_date_str,
                                 "MealType": m_type,
@@ -237,36 +337,75 @@ def food_logging_page():
                                 "Calories": calories,
                                 "Protein": protein,
                                 "Carbs": carbs,
-                                "Fat": fat
+                                "Fat": fat,
+                                "FoodID": row.get("FoodID", pd.NA),
+                                "Quantity": quantity,
+                                "Unit": row_unit,
+                                "Grams": grams
                             }
-                            # Write updated CSV
-                            updated_df = pd.DataFrame(user_meals_by_date[selected_date_str])
-                            all_meals_df = read_meals_file()
-                            all_meals_df = all_meals_df[all_meals_df["Date"] != selected_date_str]
-                            all_meals_df = pd.concat([all_meals_df, updated_df], ignore_index=True)
-                            write_meals_file(all_meals_df)
-                            st.session_state[edit_key] = False
+                            today_meals[entry_id] = updated
+
+                            # Write the one updated entry
+                            with locked_log(MEALS_FILE):
+                                if not update_meal(MEALS_FILE, entry_id, updated, catalog):
+                                    archive.update_archived_meal(MEALS_FILE, selected_date_str, entry_id, updated)
+                                tracker = load_tracker(username)
+                                tracker.add_calories(selected_date_str, calories - old_calories)
+                                tracker.save()
+                                current_index = load_food_index(username)
+                                current_index.remove(row)
+                                current_index.record(updated)
+                                current_index.save()
+                            st.session_state[editing_key] = False
                             st.rerun()
 
                     else:
                         col1, col2, col3, col4, col5, col6, col7 = st.columns([3,1,1,1,1,1,1])
                         col1.markdown(f"**{row['Meal']}**")
-                        col2.write(row["Servings"])
+                        if isinstance(row.get("Unit"), str) and not pd.isna(row.get("Quantity")):
+                            col2.write(f"{row['Quantity']:g} {row['Unit']}")
+                        else:
+                            col2.write(row["Servings"])
                         col3.write(f"{row['Calories']:.1f}")
                         col4.write(f"{row['Protein']:.1f}")
                         col5.write(f"{row['Carbs']:.1f}")
                         col6.write(f"{row['Fat']:.1f}")
 
                         if col7.button("✏️ Edit", key=edit_key):
-                            st.session_state[edit_key] = True
+                            st.session_state[editing_key] = True
                             st.rerun()
 
                         if col7.button("🗑️ Delete", key=delete_key):
                             # Remove from session-state
-                            user_meals_by_date[selected_date_str].pop(idx)
-                            updated_df = pd.DataFrame(user_meals_by_date[selected_date_str])
-                            all_meals_df = read_meals_file()
-                            all_meals_df = all_meals_df[all_meals_df["Date"] != selected_date_str]
-                            all_meals_df = pd.concat([all_meals_df, updated_df], ignore_index=True)
-                            write_meals_file(all_meals_df)
+                            removed = today_meals.pop(entry_id)
+                            with locked_log(MEALS_FILE):
+                                if not delete_meal(MEALS_FILE, entry_id, catalog):
+                                    archive.delete_archived_meal(MEALS_FILE, selected_date_str, entry_id)
+                                tracker = load_tracker(username)
+                                tracker.add_calories(selected_date_str, -removed["Calories"])
+                                tracker.save()
+                                current_index = load_food_index(username)
+                                current_index.remove(removed)
+                                current_index.save()
                             st.rerun()
+
+        # ---------------------------
+        # Extra Nutrients (only if USDA.csv has more than the four macros)
+        # ---------------------------
+        if catalog.extra_nutrients:
+            with st.expander(f"🔬 Other nutrients on {selected_date_str}"):
+                day_df = pd.DataFrame(list(today_meals.values()))
+                totals = catalog.daily_nutrients(day_df, catalog.extra_nutrients)
+                st.dataframe(totals.T.set_axis(["Total"], axis=1).round(1))
+
+        # ---------------------------
+        # Healthier Swaps (one batched search for the whole day)
+        # ---------------------------
+        with st.expander(f"🔄 Healthier swaps on {selected_date_str}"):
+            goal_of = {label: goal for goal, label in GOALS.items()}
+            goal = goal_of[st.radio("Swap for", list(goal_of), horizontal=True, key="day_swap_goal")]
+            day_df = pd.DataFrame(list(today_meals.values()))
+            for row, options in zip(day_df.to_dict("records"), load_swap_index(USDA_FILE).swaps(day_df, goal)):
+                if options:
+                    st.markdown(f"**{row['Meal']}** ({row['Calories']:.0f} kcal) → "
+                                + " · ".join(swap_label(s) for s in options))
@@ -2,9 +2,18 @@
 import streamlit as st 
 import pandas as pd 
 import os 
+import zlib
 from datetime import datetime 
+from functools import lru_cache
 from dotenv import load_dotenv
 from openai import OpenAI 
+from catalog import is_junk_or_weird, junk_keywords
+from food_index import load_food_index
+from helpers import file_signature
+from profiling import profiled, span
+from quick_answers import quick_answer
+from shared_store import shared_snapshot, frame_arrays, attach_frame
+from swaps import GOALS, load_swap_index
 
 # -----------------------
 # LOAD ENV
@@ -12,20 +21,43 @@ from openai import OpenAI
 load_dotenv()
 client_gpt = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))  
 
-def ai_suggestions_page():
-    # -----------------------
-    # SESSION CHECK
-    # -----------------------
-    if "user" not in st.session_state or st.session_state["user"] is None:
-        st.warning("Please log in first to access this page.")
-        st.stop()  # stops script until login
+# -----------------------
+# USDA DATASET
+# -----------------------
+# Simplify names
+def get_display_name(desc):
+    desc = desc.lower()
+    if "rice" in desc:
+        if "brown" in desc:
+            return "Brown Rice"
+        elif "wild" in desc:
+            return "Wild Rice"
+        return "White Rice"
+    if "chick" in desc:
+        return "Chicken"
+    if "cheese" in desc:
+        return "Cheese"
+    if "butter" in desc:
+        return "Butter"
+    return desc.split(",")[0].title()
+
+
+# Categorize
+def smart_category(row):
+    cal = row["Calories"]
+    protein = row["Protein"]
+    fat = row["Fat"]
+    if cal <= 450 and fat <= 25:
+        return "Breakfast"
+    if 300 <= cal <= 700 and fat <= 40:
+        return "Lunch"
+    if cal >= 350 and protein >= 15:
+        return "Dinner"
+    return "Lunch"
 
-    st.title("💡 AI Nutrition & Calorie Tracker")
 
-    # -----------------------
-    # LOAD USDA DATASET
-    # -----------------------
-    usda_file = "USDA.csv"
+@profiled("ai.load_usda", "load")
+def load_usda_meals(usda_file="USDA.csv"):
     usda_meals = pd.read_csv(usda_file)
 
     usda_meals = usda_meals.rename(columns={
@@ -36,58 +68,15 @@ def ai_suggestions_page():
     for col in ["Calories", "Protein", "Fat", "Carbs"]:
         usda_meals[col] = pd.to_numeric(usda_meals[col], errors="coerce")
 
-    # Remove junk/processed foods
-    junk_keywords = [
-        "candy", "toffee", "syrup", "sugar", "frosting", "gelatin",
-        "powder", "mix", "drink", "beverage", "jelly", "dessert",
-        "cookie", "cake", "brownie", "marshmallow", "gum", "cola",
-        "chewing", "pudding", "cream", "whipped", "ice cream",
-        "liver", "sausage", "paste", "hot dog", "corn syrup",
-        "oil spray", "shortening", "margarine", "oleo", "yeast extract",
-        "gel", "flavoring", "confection", "capsule", "tablet", "supplement"
-    ]
-
-    def is_junk_or_weird(meal_name):
-        meal = meal_name.lower()
-        return any(j in meal for j in junk_keywords)
-
     usda_meals = usda_meals[~usda_meals["Meal"].apply(is_junk_or_weird)]
-
-    # Simplify names
-    def get_display_name(desc):
-        desc = desc.lower()
-        if "rice" in desc:
-            if "brown" in desc:
-                return "Brown Rice"
-            elif "wild" in desc:
-                return "Wild Rice"
-            return "White Rice"
-        if "chick" in desc:
-            return "Chicken"
-        if "cheese" in desc:
-            return "Cheese"
-        if "butter" in desc:
-            return "Butter"
-        return desc.split(",")[0].title()
-
     usda_meals["DisplayMeal"] = usda_meals["Meal"].apply(get_display_name)
-
-    # Categorize
-    def smart_category(row):
-        cal = row["Calories"]
-        protein = row["Protein"]
-        fat = row["Fat"]
-        if cal <= 450 and fat <= 25:
-            return "Breakfast"
-        if 300 <= cal <= 700 and fat <= 40:
-            return "Lunch"
-        if cal >= 350 and protein >= 15:
-            return "Dinner"
-        return "Lunch"
-
     usda_meals["Category"] = usda_meals.apply(smart_category, axis=1)
+    return usda_meals
+
 
-    meal_summary_usda = usda_meals.groupby("DisplayMeal").agg({
+@profiled("ai.summarize_usda", "derive")
+def summarize_usda_meals(usda_meals):
+    return usda_meals.groupby("DisplayMeal").agg({
         "Calories": "mean",
         "Protein": "mean",
         "Carbs": "mean",
@@ -95,10 +84,36 @@ def ai_suggestions_page():
         "Category": "first"
     }).reset_index()
 
-    # -----------------------
-    # LOAD HEALTHY MEALS DATASET
-    # -----------------------
-    healthy_file = "healthy_meals.csv"
+
+# Bump when summarize_usda_meals / load_usda_meals change; the junk list is part of it,
+# so the shared snapshot is rebuilt whenever junk_keywords changes
+USDA_SUMMARY_FORMAT = f"2-{zlib.crc32(' '.join(junk_keywords).encode()):08x}"
+
+
+@lru_cache(maxsize=2)
+def _shared_usda_summary(usda_file, version):
+    arrays, meta = shared_snapshot(
+        "usda_summary", [usda_file],
+        lambda: frame_arrays(summarize_usda_meals(load_usda_meals(usda_file)), "summary"),
+        version=USDA_SUMMARY_FORMAT,
+    )
+    return attach_frame(arrays, meta, "summary")
+
+
+@profiled("ai.usda_summary", "load")
+def load_usda_summary(usda_file="USDA.csv"):
+    """
+    summarize_usda_meals(load_usda_meals()), computed once per USDA.csv
+    version and mapped read-only by every worker. Treat it as read-only.
+    """
+    return _shared_usda_summary(usda_file, tuple(file_signature(usda_file)))
+
+
+# -----------------------
+# HEALTHY MEALS DATASET
+# -----------------------
+@profiled("ai.load_healthy", "load")
+def load_healthy_meals(healthy_file="healthy_meals.csv"):
     healthy = pd.read_csv(healthy_file)
 
     if "DisplayMeal" in healthy.columns and "Meal" not in healthy.columns:
@@ -112,6 +127,78 @@ def ai_suggestions_page():
 
     healthy = healthy.dropna(subset=["Category", "Meal"]).reset_index(drop=True)
     healthy["Category"] = healthy["Category"].str.title().str.strip()
+    return healthy
+
+
+# -----------------------
+# MEAL PLANS
+# -----------------------
+def choose_meal(df, category, condition):
+    df_cat = df[df["Category"] == category]
+    df_cat = df_cat[df_cat.apply(condition, axis=1)]
+    return df_cat.sample(1).iloc[0] if not df_cat.empty else None
+
+
+@profiled("ai.plan.calorie_based", "derive")
+def calorie_based_plan(healthy, target):
+    """Closest healthy meal to each category's share of the target. Returns ([(cat, meal|None)], total)."""
+    categories = ["Breakfast", "Lunch", "Dinner"]
+    total_cal = 0
+    plan = []
+
+    weights = {"Breakfast": 0.30, "Lunch": 0.40, "Dinner": 0.30}
+
+    for cat in categories:
+        allowed_cal = target * weights[cat]
+        df = healthy[healthy["Category"] == cat].copy()
+        df["cal_diff"] = (df["Calories"] - allowed_cal).abs()
+        if df.empty:
+            plan.append((cat, None))
+            continue
+        meal = df.sort_values("cal_diff").iloc[0]
+        total_cal += meal["Calories"]
+        plan.append((cat, meal))
+
+    return plan, total_cal
+
+
+@profiled("ai.plan.weight_loss", "derive")
+def weight_loss_plan(healthy):
+    """Up to two ≤400 kcal healthy meals per category. Returns [(cat, DataFrame|None)]."""
+    plan = []
+    for cat in ["Breakfast", "Lunch", "Dinner"]:
+        df = healthy[(healthy["Category"] == cat) & (healthy["Calories"] <= 400)]
+        if df.empty:
+            df = healthy[healthy["Category"] == cat]
+        if df.empty:
+            plan.append((cat, None))
+            continue
+        plan.append((cat, df.sample(min(2, len(df)))))
+    return plan
+
+
+@profiled("ai.plan.high_protein", "derive")
+def high_protein_plan(healthy):
+    """One ≥20 g protein healthy meal per category. Returns [(cat, meal|None)]."""
+    condition = lambda row: row["Protein"] >= 20
+    return [(cat, choose_meal(healthy, cat, condition)) for cat in ["Breakfast", "Lunch", "Dinner"]]
+
+
+def ai_suggestions_page():
+    # -----------------------
+    # SESSION CHECK
+    # -----------------------
+    if "user" not in st.session_state or st.session_state["user"] is None:
+        st.warning("Please log in first to access this page.")
+        st.stop()  # stops script until login
+
+    st.title("💡 AI Nutrition & Calorie Tracker")
+
+    # -----------------------
+    # LOAD USDA + HEALTHY MEALS DATASETS
+    # -----------------------
+    meal_summary_usda = load_usda_summary()
+    healthy = load_healthy_meals()
 
     # -----------------------
     # GOAL SELECTION BUTTONS
@@ -134,14 +221,6 @@ def ai_suggestions_page():
 
     user_goal = st.session_state.user_goal
 
-    # -----------------------
-    # HELPER FUNCTION
-    # -----------------------
-    def choose_meal(df, category, condition):
-        df_cat = df[df["Category"] == category]
-        df_cat = df_cat[df_cat.apply(condition, axis=1)]
-        return df_cat.sample(1).iloc[0] if not df_cat.empty else None
-
     # -----------------------
     # MEAL PLAN GENERATION
     # -----------------------
@@ -161,21 +240,12 @@ def ai_suggestions_page():
                 st.session_state.generate_plan = True
 
             if st.session_state.generate_plan:
-                categories = ["Breakfast", "Lunch", "Dinner"]
-                total_cal = 0
                 output = []
-
-                weights = {"Breakfast": 0.30, "Lunch": 0.40, "Dinner": 0.30}
-
-                for cat in categories:
-                    allowed_cal = target * weights[cat]
-                    df = healthy[healthy["Category"] == cat].copy()
-                    df["cal_diff"] = (df["Calories"] - allowed_cal).abs()
-                    if df.empty:
+                plan, total_cal = calorie_based_plan(healthy, target)
+                for cat, meal in plan:
+                    if meal is None:
                         st.warning(f"No healthy meals for {cat}.")
                         continue
-                    meal = df.sort_values("cal_diff").iloc[0]
-                    total_cal += meal["Calories"]
                     output.append(
                         f"**{cat}:** {meal['Meal']} — {meal['Calories']:.0f} kcal"
                     )
@@ -184,23 +254,17 @@ def ai_suggestions_page():
                 st.success(f"Total for the day: **{total_cal:.0f} kcal** (Target: {target})")
 
         elif user_goal == "Weight Loss":
-            for cat in ["Breakfast", "Lunch", "Dinner"]:
-                df = healthy[(healthy["Category"] == cat) & (healthy["Calories"] <= 400)]
-                if df.empty:
-                    df = healthy[healthy["Category"] == cat]
-                if df.empty:
+            for cat, selected in weight_loss_plan(healthy):
+                if selected is None:
                     st.warning(f"No healthy meals found for {cat}.")
                     continue
-                selected = df.sample(min(2, len(df)))
                 for _, meal in selected.iterrows():
                     st.markdown(
                         f"**{cat}:** {meal['Meal']} — {meal['Calories']:.0f} kcal, {meal['Protein']:.1f}g protein"
                     )
 
         elif user_goal == "High Protein":
-            condition = lambda row: row["Protein"] >= 20
-            for cat in ["Breakfast", "Lunch", "Dinner"]:
-                meal = choose_meal(healthy, cat, condition)
+            for cat, meal in high_protein_plan(healthy):
                 if meal is not None:
                     st.markdown(
                         f"**{cat}:** {meal['Meal']} — {meal['Calories']:.0f} kcal, {meal['Protein']:.1f}g protein"
@@ -208,6 +272,37 @@ def ai_suggestions_page():
                 else:
                     st.warning(f"No healthy meals found for {cat}.")
 
+    # -----------------------
+    # HEALTHIER SWAPS (for the user's most logged foods)
+    # -----------------------
+    st.markdown("---")
+    st.subheader("🔄 Healthier Swaps")
+
+    food_index = load_food_index(st.session_state["user"])
+    logged = [stats["entry"] for _, stats in food_index.favorite_foods() + food_index.top_foods(n=20)]
+    if not logged:
+        st.info("Log a few meals to get swap ideas for them.")
+    else:
+        by_label = {}
+        for e in logged:
+            label = e["Meal"]
+            if e.get("Unit") and e.get("Quantity") is not None:
+                label += f" · {e['Quantity']:g} {e['Unit']}"
+            by_label.setdefault(label, e)
+        goal_of = {label: goal for goal, label in GOALS.items()}
+
+        col1, col2 = st.columns([2, 1])
+        entry = by_label[col1.selectbox("Swap out", list(by_label), key="ai_swap_meal")]
+        goal = goal_of[col2.radio("For", list(goal_of), key="ai_swap_goal")]
+        options = load_swap_index().swaps(pd.DataFrame([entry]), goal, k=5)[0]
+        if options:
+            st.dataframe(
+                pd.DataFrame(options)[["Meal", "Grams", "Calories", "Protein", "Carbs", "Fat"]],
+                hide_index=True, use_container_width=True
+            )
+        else:
+            st.info(f"No {GOALS[goal].lower()} swaps found for {entry['Meal']}.")
+
     # -----------------------
     # CHATBOT
     # -----------------------
@@ -263,9 +358,21 @@ def ai_suggestions_page():
         st.chat_message(msg["role"]).write(msg["content"])
 
     # USER CHAT INPUT
+    # Questions the catalog / meal log can answer are answered locally; the rest go to the LLM
+    answered = st.session_state.setdefault("chat_answered", {"local": 0, "llm": 0})
     if user_msg := st.chat_input("Ask anything..."):
         st.chat_message("user").write(user_msg)
         st.session_state.chat_history.append({"role":"user","content":user_msg})
-        bot = ask_gpt(user_msg)
+        bot = None if is_unhealthy_prompt(user_msg) else quick_answer(user_msg, st.session_state["user"])
+        if bot is not None:
+            answered["local"] += 1
+        else:
+            with span("ai.ask_gpt", "llm"):
+                bot = ask_gpt(user_msg)
+            answered["llm"] += 1
         st.session_state.chat_history.append({"role":"assistant","content":bot})
         st.chat_message("assistant").write(bot)
+
+    if answered["local"]:
+        total = answered["local"] + answered["llm"]
+        st.caption(f"⚡ {answered['local']} of {total} questions answered instantly from the catalog and your log")
@@ -2,9 +2,273 @@
 import streamlit as st
 import pandas as pd
 import matplotlib.pyplot as plt
+import matplotlib.dates as mdates
 import numpy as np
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+import io
 import os
+import charts
+from adherence import load_tracker
+from helpers import get_meals_file
+from nutrition_stats import get_stats, WINDOWS, MACROS
+from profiling import profiled, span
+from meal_store import MEAL_COLS, read_raw_meals
+from reports import FORMATS, PERIODS, REPORT_POOL, period_label, recent_periods
+import archive
+
+# ---------------------------
+# Chart builders (each returns a matplotlib Figure, or None if there is nothing to draw)
+# ---------------------------
+@profiled("viz.prepare", "derive")
+def prepare_meals_df(df):
+    """Numeric macros, parsed dates, sorted by date."""
+    for col in ["Servings", "Calories", "Protein", "Carbs", "Fat"]:
+        df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0)
+
+    # Ensure datetime columns
+    df["DateTime"] = pd.to_datetime(df["DateTime"])
+    df["Date"] = pd.to_datetime(df["Date"]).dt.date
+
+    # Sort by date to fix graph axis issues
+    return df.sort_values("Date")
+
+
+RANGE_DAYS = {"Week": 7, "Month": 30, "Year": 365}
+
+
+def filter_range(df, range_option, today):
+    days = RANGE_DAYS.get(range_option)
+    if days is None:
+        return df.copy()
+    return df[df["Date"] >= (today - timedelta(days=days))]
+
+
+def add_archived_days(df_range, meals_file, range_option, today):
+    """
+    Year / Max can reach past the hot log: adds the archive's per-day totals
+    in range (one row per day — all the calories chart needs). Week / Month
+    never open the archive.
+    """
+    days = RANGE_DAYS.get(range_option)
+    start = today - timedelta(days=days) if days is not None else None
+    if not archive.covers(meals_file, start or date.min):
+        return df_range
+
+    daily = archive.daily_summary(meals_file)
+    if start is not None:
+        daily = daily[daily["Date"] >= start.isoformat()]
+    if daily.empty:
+        return df_range
+    old = pd.DataFrame({
+        "Date": pd.to_datetime(daily["Date"]).dt.date.to_numpy(),
+        "Calories": daily["Calories"].to_numpy(),
+    })
+    return pd.concat([old, df_range[["Date", "Calories"]]], ignore_index=True) if not df_range.empty else old
+
+
+def plot_calories_over_time(df_range, range_option, goal_for):
+    fig, ax = plt.subplots(figsize=(7, 3))
+    calories_daily = df_range.groupby("Date")["Calories"].sum()
+    dates = pd.to_datetime(calories_daily.index)
+    ax.plot(
+        dates,
+        calories_daily.values,
+        marker="o",
+        linewidth=2,
+        color="#66B3FF"
+    )
+    ax.step(
+        dates,
+        [goal_for(d) for d in calories_daily.index],
+        where="post",
+        linestyle="--",
+        color="#FF9999",
+        label="Goal"
+    )
+    ax.legend(fontsize=7)
+    ax.set_ylabel("Calories")
+    ax.set_xlabel("Date")
+    ax.grid(alpha=0.3)
+
+    if range_option == "Week":
+        ax.xaxis.set_major_locator(mdates.DayLocator(interval=1))
+        ax.xaxis.set_major_formatter(mdates.DateFormatter("%b %d"))
+    elif range_option == "Month":
+        ax.xaxis.set_major_locator(mdates.DayLocator(interval=3))
+        ax.xaxis.set_major_formatter(mdates.DateFormatter("%b %d"))
+    elif range_option == "Year":
+        ax.xaxis.set_major_locator(mdates.MonthLocator())
+        ax.xaxis.set_major_formatter(mdates.DateFormatter("%b"))
+    else:
+        ax.xaxis.set_major_locator(mdates.MonthLocator(interval=2))
+        ax.xaxis.set_major_formatter(mdates.DateFormatter("%b %Y"))
+
+    fig.autofmt_xdate(rotation=45)
+    fig.tight_layout()
+    return fig
+
+
+def plot_rolling_calories(daily):
+    fig6, ax6 = plt.subplots(figsize=(4.5, 3))
+    logged = daily[daily["Logged"]]
+    ax6.scatter(logged.index, logged["Calories"], s=8, alpha=0.3, color="#66B3FF", label="Daily")
+    for window in WINDOWS:
+        ax6.plot(daily.index, daily[f"Calories_{window}d"], linewidth=1.5, label=f"{window}-day mean")
+    ax6.plot(daily.index, daily["Calories_ema7"], linestyle="--", linewidth=1, label="EMA (7)")
+    ax6.set_ylabel("Calories")
+    ax6.set_title("Rolling Calorie Averages")
+    ax6.legend(fontsize=6)
+    ax6.grid(alpha=0.3)
+    fig6.autofmt_xdate(rotation=45)
+    fig6.tight_layout()
+    return fig6
+
+
+def plot_macro_ratio_trend(daily):
+    fig7, ax7 = plt.subplots(figsize=(4.5, 3))
+    shares = daily[[f"{m}Share_7d" for m in MACROS]].fillna(0) * 100
+    ax7.stackplot(daily.index, shares.T.values, labels=MACROS, alpha=0.8)
+    ax7.set_ylim(0, 100)
+    ax7.set_ylabel("% of macro calories")
+    ax7.set_title("Macro Ratio Trend (7-day)")
+    ax7.legend(fontsize=6, loc="upper left")
+    fig7.autofmt_xdate(rotation=45)
+    fig7.tight_layout()
+    return fig7
+
+
+def plot_weekday_calories(weekday):
+    fig8, ax8 = plt.subplots(figsize=(4.5, 3))
+    colors = ["#66B3FF"] * 5 + ["#FF9999"] * 2
+    ax8.bar(weekday.index, weekday["Calories"].fillna(0), color=colors)
+    ax8.set_ylabel("Avg Calories")
+    ax8.set_title("Average Calories by Weekday")
+    fig8.tight_layout()
+    return fig8
+
+
+def plot_macro_pie(total_protein, total_carbs, total_fat):
+    nutrients = pd.Series([total_protein, total_carbs, total_fat], index=["Protein","Carbs","Fat"])
+    if nutrients.sum() <= 0:
+        return None
+    fig1, ax1 = plt.subplots(figsize=(3,3))
+    nutrients.plot(kind="pie", autopct="%1.1f%%", startangle=90, ax=ax1)
+    ax1.set_ylabel("")
+    ax1.set_title("Macronutrient Distribution")
+    fig1.tight_layout()
+    return fig1
+
+
+def plot_calorie_pie(total_calories, remaining_calories, calorie_goal):
+    cal_data = pd.Series([total_calories, remaining_calories], index=["Consumed","Remaining"])
+    if cal_data.sum() <= 0:
+        return None
+    fig2, ax2 = plt.subplots(figsize=(3,3))
+    cal_data.plot(kind="pie", autopct="%1.1f%%", startangle=90, ax=ax2)
+    ax2.set_ylabel("")
+    ax2.set_title(f"Calories (Goal: {calorie_goal} kcal)")
+    fig2.tight_layout()
+    return fig2
+
+
+def plot_macros_by_meal_type(day_df):
+    meal_totals = day_df.groupby("MealType")[["Protein","Carbs","Fat"]].sum().reset_index()
+    if meal_totals.empty:
+        return None
+    fig3, ax3 = plt.subplots(figsize=(4.5,3))
+    meal_totals.set_index("MealType")[["Protein","Carbs","Fat"]].plot(
+        kind="bar", stacked=True, ax=ax3
+    )
+    ax3.set_ylabel("Grams")
+    ax3.set_title("Macros by Meal Type")
+    ax3.legend(fontsize=7)
+    fig3.tight_layout()
+    return fig3
+
+
+def plot_cumulative_macros(day_df):
+    day_df_sorted = day_df.sort_values("DateTime").copy()
+    day_df_sorted["CumulativeProtein"] = day_df_sorted["Protein"].cumsum()
+    day_df_sorted["CumulativeCarbs"] = day_df_sorted["Carbs"].cumsum()
+    day_df_sorted["CumulativeFat"] = day_df_sorted["Fat"].cumsum()
+
+    fig4, ax4 = plt.subplots(figsize=(4.5,3))
+    ax4.plot(day_df_sorted["DateTime"], day_df_sorted["CumulativeProtein"], marker='o', label="Protein")
+    ax4.plot(day_df_sorted["DateTime"], day_df_sorted["CumulativeCarbs"], marker='o', label="Carbs")
+    ax4.plot(day_df_sorted["DateTime"], day_df_sorted["CumulativeFat"], marker='o', label="Fat")
+    ax4.set_ylabel("Grams")
+    ax4.set_title("Cumulative Macronutrients")
+    ax4.legend(fontsize=7)
+    fig4.tight_layout()
+    return fig4
+
+
+def plot_macro_proportions(total_protein, total_carbs, total_fat):
+    fig5, ax5 = plt.subplots(figsize=(5,1.2))
+    macro_props = pd.DataFrame({
+        "Protein":[total_protein],
+        "Carbs":[total_carbs],
+        "Fat":[total_fat]
+    })
+    macro_props.plot(kind="barh", stacked=True, ax=ax5)
+    ax5.set_xlabel("Grams")
+    ax5.set_ylabel("")
+    ax5.set_title("Macro Proportion (Horizontal)")
+    ax5.legend(fontsize=7)
+    fig5.tight_layout()
+    return fig5
+
+
+# Live charts are Vega-Lite specs drawn in the browser; "matplotlib" renders PNGs on the server instead
+CHART_RENDERER = os.environ.get("NUTRITION_CHARTS", "vega")
+
+# name -> (Vega-Lite spec builder, matplotlib builder); both take the same arguments
+CHARTS = {
+    "calories_over_time": (charts.calories_over_time, plot_calories_over_time),
+    "rolling_calories": (charts.rolling_calories, plot_rolling_calories),
+    "macro_ratio_trend": (charts.macro_ratio_trend, plot_macro_ratio_trend),
+    "weekday_calories": (charts.weekday_calories, plot_weekday_calories),
+    "macro_pie": (charts.macro_pie, plot_macro_pie),
+    "calorie_pie": (charts.calorie_pie, plot_calorie_pie),
+    "macros_by_meal_type": (charts.macros_by_meal_type, plot_macros_by_meal_type),
+    "cumulative_macros": (charts.cumulative_macros, plot_cumulative_macros),
+    "macro_proportions": (charts.macro_proportions, plot_macro_proportions),
+}
+
+
+def show_chart(name, *args, drawn=None):
+    """
+    Builds and draws one chart inside a profiling span. Returns False if there
+    was nothing to draw. Drawn charts are recorded in `drawn` (name -> args)
+    so they can be exported as PNGs.
+    """
+    spec_builder, plot_builder = CHARTS[name]
+    with span(f"chart.{name}", "render"):
+        if CHART_RENDERER == "matplotlib":
+            fig = plot_builder(*args)
+            if fig is None:
+                return False
+            st.pyplot(fig)
+            plt.close(fig)
+        else:
+            spec = spec_builder(*args)
+            if spec is None:
+                return False
+            st.vega_lite_chart(spec, use_container_width=True)
+    if drawn is not None:
+        drawn[name] = args
+    return True
+
+
+def render_png(name, *args):
+    """One chart rasterized by matplotlib (for downloads), as PNG bytes."""
+    with span(f"export.{name}", "render"):
+        fig = CHARTS[name][1](*args)
+        buf = io.BytesIO()
+        fig.savefig(buf, format="png", dpi=200, bbox_inches="tight")
+        plt.close(fig)
+        return buf.getvalue()
+
 
 def visualization_page():
     # ---------------------------
@@ -16,33 +280,33 @@ def visualization_page():
 
     username = st.session_state["user"]
 
-    # ---------------------------
-    # CORRECT FILE DETECTION
-    # ---------------------------
-    if username == "demo":
-        meals_file = "data/meals.csv"  # demo user file
-    else:
-        meals_file = f"data/{username}_meals.csv"  # new user file
+    meals_file = get_meals_file(username)
 
     st.title("📊 Nutrition Visualization (Protein, Carbs, Fat Focus)")
 
     # ---------------------------
     # Load Meals File
     # ---------------------------
-    if not os.path.exists(meals_file) or os.stat(meals_file).st_size == 0:
-        st.warning("No saved logs found yet. Please log meals first.")
-        return
-
     try:
-        df = pd.read_csv(meals_file)
+        with span("viz.read_log", "load"):
+            df = read_raw_meals(meals_file)
     except:
         st.error("Could not read your log file.")
         return
 
+    # History older than the hot window is in the archive (opened only for old dates / long ranges)
+    archived_through = archive.last_archived_day(meals_file)
+
+    if df is None and archived_through is None:
+        st.warning("No saved logs found yet. Please log meals first.")
+        return
+
     # ---------------------------
     # CHECK EMPTY DATAFRAME
     # ---------------------------
-    if df.empty:
+    if df is None:
+        df = pd.DataFrame(columns=MEAL_COLS)
+    if df.empty and archived_through is None:
         st.warning("No meal entries found yet. Please log meals first!")
         return
 
@@ -60,30 +324,65 @@ def visualization_page():
     # ---------------------------
     # CLEAN NUMERIC COLUMNS
     # ---------------------------
-    for col in ["Servings", "Calories", "Protein", "Carbs", "Fat"]:
-        df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0)
+    df = prepare_meals_df(df)
 
     # Continue with your visualization plots...
     st.success("Meal data loaded successfully!")
 
-
-    # Ensure datetime columns
-    df["DateTime"] = pd.to_datetime(df["DateTime"])
-    df["Date"] = pd.to_datetime(df["Date"]).dt.date
-
-    # Ensure numeric columns
-    for col in ["Protein", "Carbs", "Fat", "Calories", "Servings"]:
-        df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0)
-
-    # Sort by date to fix graph axis issues
-    df = df.sort_values("Date")
+    # ---------------------------
+    # Weekly / Monthly Reports (rendered by a background worker pool, cached per data version)
+    # ---------------------------
+    report_jobs = st.session_state.setdefault("report_jobs", {}).setdefault(username, {})
+    with st.expander("📄 Weekly & monthly reports"):
+        col1, col2, col3 = st.columns(3)
+        period_names = {label: period for period, label in PERIODS.items()}
+        period = period_names[col1.radio("Report", list(period_names), horizontal=True, key="report_period")]
+        choices = recent_periods(period, date.today())
+        labels = [period_label(period, start, end) for _, start, end in choices]
+        picked = col2.selectbox("Period", labels, key=f"report_when_{period}")
+        fmt = col3.radio("Format", ["HTML", "PDF"], horizontal=True, key="report_format").lower()
+        key, start, _ = choices[labels.index(picked)]
+
+        if st.button("Generate report", key="report_generate"):
+            report_jobs[f"{key}.{fmt}"] = {
+                "label": f"{PERIODS[period]} report for {picked} ({fmt.upper()})",
+                "file_name": f"nutrition_report_{key}.{fmt}",
+                "mime": FORMATS[fmt],
+                "future": REPORT_POOL.submit(username, period, start, fmt),
+                "notified": False,
+            }
+
+        for job_key, job in list(report_jobs.items()):
+            future = job["future"]
+            if not future.done():
+                st.info(f"⏳ {job['label']} is being generated — keep using the app, you'll be notified.")
+            elif future.cancelled() or future.exception() is not None:
+                st.error(f"{job['label']} could not be generated.")
+            else:
+                try:
+                    with open(future.result(), "rb") as f:
+                        content = f.read()
+                except FileNotFoundError:
+                    # Replaced by a report for newer data; generate it again
+                    del report_jobs[job_key]
+                    continue
+                st.download_button(f"⬇️ {job['label']}", content, file_name=job["file_name"],
+                                   mime=job["mime"], key=f"report_download_{job_key}")
+        if any(not job["future"].done() for job in report_jobs.values()):
+            st.button("🔄 Check again", key="report_refresh")
 
     # ---------------------------
     # Date Selection
     # ---------------------------
     st.subheader("Select Date")
-    selected_date = st.date_input("Pick a date", value=df["Date"].max())
+    latest = df["Date"].max() if not df.empty else date.fromisoformat(archived_through)
+    selected_date = st.date_input("Pick a date", value=latest)
     day_df = df[df["Date"] == selected_date]
+    if archive.covers(meals_file, selected_date):
+        archived_day = archive.read_archived(meals_file, str(selected_date), str(selected_date))
+        if not archived_day.empty:
+            archived_day = prepare_meals_df(archived_day)
+            day_df = pd.concat([archived_day, day_df], ignore_index=True) if not day_df.empty else archived_day
 
     if day_df.empty:
         st.info("No meals logged for this date.")
@@ -102,7 +401,10 @@ def visualization_page():
     total_carbs = day_df["Carbs"].sum()
     total_fat = day_df["Fat"].sum()
     total_calories = day_df["Calories"].sum()
-    calorie_goal = st.number_input("Set Daily Calorie Goal", min_value=0, value=2000)
+
+    # Goal in effect on the selected day (set on the Home page, timestamped history)
+    tracker = load_tracker(username)
+    calorie_goal = tracker.goal_for(selected_date)
     remaining_calories = max(calorie_goal - total_calories, 0)
 
     # ---------------------------------------------------------
@@ -114,55 +416,68 @@ def visualization_page():
     range_option = st.selectbox(
         "Select Time Range:",
         ["Week", "Month", "Year", "Max"],
-        index=0
+        index=0,
+        key="viz_range"
     )
 
     today = datetime.now().date()
-
-    if range_option == "Week":
-        df_range = df[df["Date"] >= (today - timedelta(days=7))]
-    elif range_option == "Month":
-        df_range = df[df["Date"] >= (today - timedelta(days=30))]
-    elif range_option == "Year":
-        df_range = df[df["Date"] >= (today - timedelta(days=365))]
-    else:
-        df_range = df.copy()
+    drawn = {}
+    df_range = add_archived_days(filter_range(df, range_option, today), meals_file, range_option, today)
 
     if df_range.empty:
         st.info("No data available for this time range.")
     else:
         st.write("### 🔥 Calories Over Time")
-        fig, ax = plt.subplots(figsize=(7, 3))
-        calories_daily = df_range.groupby("Date")["Calories"].sum()
-        dates = pd.to_datetime(calories_daily.index)
-        ax.plot(
-            dates,
-            calories_daily.values,
-            marker="o",
-            linewidth=2,
-            color="#66B3FF"
-        )
-        ax.set_ylabel("Calories")
-        ax.set_xlabel("Date")
-        ax.grid(alpha=0.3)
-
-        import matplotlib.dates as mdates
-        if range_option == "Week":
-            ax.xaxis.set_major_locator(mdates.DayLocator(interval=1))
-            ax.xaxis.set_major_formatter(mdates.DateFormatter("%b %d"))
-        elif range_option == "Month":
-            ax.xaxis.set_major_locator(mdates.DayLocator(interval=3))
-            ax.xaxis.set_major_formatter(mdates.DateFormatter("%b %d"))
-        elif range_option == "Year":
-            ax.xaxis.set_major_locator(mdates.MonthLocator())
-            ax.xaxis.set_major_formatter(mdates.DateFormatter("%b"))
+        show_chart("calories_over_time", df_range, range_option, tracker.goal_for, drawn=drawn)
+
+    # ---------------------------------------------------------
+    # 📈 ROLLING TRENDS (computed over full history, cached per data version)
+    # ---------------------------------------------------------
+    stats = get_stats(meals_file)
+
+    if stats is not None:
+        st.markdown("---")
+        st.subheader("📈 Rolling Trends")
+
+        trend_days = {"Week": 7, "Month": 30, "Year": 365}.get(range_option)
+        daily = stats["daily"]
+        if trend_days is not None:
+            daily = daily[daily.index >= pd.Timestamp(today - timedelta(days=trend_days))]
+
+        if daily.empty:
+            st.info("No data available for this time range.")
         else:
-            ax.xaxis.set_major_locator(mdates.MonthLocator(interval=2))
-            ax.xaxis.set_major_formatter(mdates.DateFormatter("%b %Y"))
+            col5, col6 = st.columns(2)
+
+            with col5:
+                show_chart("rolling_calories", daily, drawn=drawn)
+
+            with col6:
+                show_chart("macro_ratio_trend", daily, drawn=drawn)
 
-        fig.autofmt_xdate(rotation=45)
-        fig.tight_layout()
-        st.pyplot(fig)
+        # Weekday vs weekend always uses the full history
+        col7, col8 = st.columns(2)
+
+        with col7:
+            show_chart("weekday_calories", stats["weekday"], drawn=drawn)
+
+        with col8:
+            split = stats["weekend_split"]
+            st.write("#### Weekday vs Weekend (daily average)")
+            st.dataframe(split.round(1))
+
+    # ---------------------------
+    # Goal Adherence
+    # ---------------------------
+    st.subheader("🏆 Goal Adherence")
+    week = tracker.rolling(7, today)
+    month = tracker.rolling(30, today)
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Current Streak", f"{tracker.current_streak(today)} days")
+    col2.metric("Best Streak", f"{tracker.best_streak} days")
+    col3.metric("7-Day Adherence", f"{week['adherence']:.0%}", f"{week['deficit']:+.0f} kcal deficit")
+    col4.metric("30-Day Adherence", f"{month['adherence']:.0%}", f"{month['deficit']:+.0f} kcal deficit")
 
     # ---------------------------
     # Pie Charts Side by Side
@@ -171,27 +486,11 @@ def visualization_page():
     col1, col2 = st.columns(2)
 
     with col1:
-        fig1, ax1 = plt.subplots(figsize=(3,3))
-        nutrients = pd.Series([total_protein, total_carbs, total_fat], index=["Protein","Carbs","Fat"])
-        if nutrients.sum() > 0:
-            nutrients.plot(kind="pie", autopct="%1.1f%%", startangle=90, ax=ax1)
-            ax1.set_ylabel("")
-            ax1.set_title("Macronutrient Distribution")
-            fig1.tight_layout()
-            st.pyplot(fig1)
-        else:
+        if not show_chart("macro_pie", total_protein, total_carbs, total_fat, drawn=drawn):
             st.info("No macronutrients recorded for this day.")
 
     with col2:
-        fig2, ax2 = plt.subplots(figsize=(3,3))
-        cal_data = pd.Series([total_calories, remaining_calories], index=["Consumed","Remaining"])
-        if cal_data.sum() > 0:
-            cal_data.plot(kind="pie", autopct="%1.1f%%", startangle=90, ax=ax2)
-            ax2.set_ylabel("")
-            ax2.set_title(f"Calories (Goal: {calorie_goal} kcal)")
-            fig2.tight_layout()
-            st.pyplot(fig2)
-        else:
+        if not show_chart("calorie_pie", total_calories, remaining_calories, calorie_goal, drawn=drawn):
             st.info("No calories recorded for this day.")
 
     # ---------------------------
@@ -201,48 +500,27 @@ def visualization_page():
     col3, col4 = st.columns(2)
 
     with col3:
-        meal_totals = day_df.groupby("MealType")[["Protein","Carbs","Fat"]].sum().reset_index()
-        if not meal_totals.empty:
-            fig3, ax3 = plt.subplots(figsize=(4.5,3))
-            meal_totals.set_index("MealType")[["Protein","Carbs","Fat"]].plot(
-                kind="bar", stacked=True, ax=ax3
-            )
-            ax3.set_ylabel("Grams")
-            ax3.set_title("Macros by Meal Type")
-            ax3.legend(fontsize=7)
-            fig3.tight_layout()
-            st.pyplot(fig3)
+        show_chart("macros_by_meal_type", day_df, drawn=drawn)
 
     with col4:
-        day_df_sorted = day_df.sort_values("DateTime").copy()
-        day_df_sorted["CumulativeProtein"] = day_df_sorted["Protein"].cumsum()
-        day_df_sorted["CumulativeCarbs"] = day_df_sorted["Carbs"].cumsum()
-        day_df_sorted["CumulativeFat"] = day_df_sorted["Fat"].cumsum()
-
-        fig4, ax4 = plt.subplots(figsize=(4.5,3))
-        ax4.plot(day_df_sorted["DateTime"], day_df_sorted["CumulativeProtein"], marker='o', label="Protein")
-        ax4.plot(day_df_sorted["DateTime"], day_df_sorted["CumulativeCarbs"], marker='o', label="Carbs")
-        ax4.plot(day_df_sorted["DateTime"], day_df_sorted["CumulativeFat"], marker='o', label="Fat")
-        ax4.set_ylabel("Grams")
-        ax4.set_title("Cumulative Macronutrients")
-        ax4.legend(fontsize=7)
-        fig4.tight_layout()
-        st.pyplot(fig4)
+        show_chart("cumulative_macros", day_df, drawn=drawn)
 
     # ---------------------------
     # Horizontal Stacked Bar
     # ---------------------------
     st.subheader("📊 Macro Proportions")
-    fig5, ax5 = plt.subplots(figsize=(5,1.2))
-    macro_props = pd.DataFrame({
-        "Protein":[total_protein],
-        "Carbs":[total_carbs],
-        "Fat":[total_fat]
-    })
-    macro_props.plot(kind="barh", stacked=True, ax=ax5)
-    ax5.set_xlabel("Grams")
-    ax5.set_ylabel("")
-    ax5.set_title("Macro Proportion (Horizontal)")
-    ax5.legend(fontsize=7)
-    fig5.tight_layout()
-    st.pyplot(fig5)
+    show_chart("macro_proportions", total_protein, total_carbs, total_fat, drawn=drawn)
+
+    # ---------------------------
+    # PNG Export (rendered on demand, server-side)
+    # ---------------------------
+    with st.expander("⬇️ Export charts as PNG"):
+        if st.checkbox("Prepare PNG downloads", key="viz_export_png"):
+            for name, args in drawn.items():
+                st.download_button(
+                    f"{name.replace('_', ' ').title()}.png",
+                    render_png(name, *args),
+                    file_name=f"{name}_{selected_date}.png",
+                    mime="image/png",
+                    key=f"viz_png_{name}",
+                )
@@ -0,0 +1,362 @@
+# adherence.py
+import json
+import os
+from bisect import bisect_right
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+import archive
+from helpers import (
+    file_signature, get_meals_file, get_goal_file,
+    get_goal_history_file, get_adherence_file
+)
+from meal_store import locked_log, read_raw_meals
+from profiling import profiled
+from write_queue import WRITE_QUEUE, write_csv, write_text, json_state_writer
+
+DEFAULT_GOAL = 2000
+GOAL_HISTORY_COLS = ["DateTime", "Date", "Goal"]
+
+
+def _day_str(day):
+    if isinstance(day, (date, datetime)):
+        return day.strftime("%Y-%m-%d")
+    return str(day)
+
+
+# -------------------------------------
+# Goal file + timestamped goal history
+# -------------------------------------
+def read_goal(username):
+    goal_file = get_goal_file(username)
+
+    staged = WRITE_QUEUE.pending(goal_file)
+    if staged is not None:
+        return int(staged)
+
+    if not os.path.exists(goal_file):
+        with open(goal_file, "w") as f:
+            f.write(str(DEFAULT_GOAL))
+
+    try:
+        with open(goal_file, "r") as f:
+            return int(f.read().strip())
+    except ValueError:
+        return DEFAULT_GOAL
+
+
+def load_goal_history(username):
+    """
+    Returns the goal changes as a list of (date_str, goal) sorted by date.
+    Users created before goal history existed are seeded with their current goal.
+    """
+    df = _read_goal_history(username)
+    df["Goal"] = pd.to_numeric(df["Goal"], errors="coerce")
+    df = df.dropna(subset=["Date", "Goal"]).sort_values("DateTime")
+
+    # Last change of each day wins
+    latest = df.groupby("Date")["Goal"].last()
+    return [(d, int(g)) for d, g in latest.sort_index().items()]
+
+
+def _read_goal_history(username):
+    history_file = get_goal_history_file(username)
+
+    staged = WRITE_QUEUE.pending(history_file)
+    if staged is not None:
+        return staged.copy()
+
+    if not os.path.exists(history_file) or os.stat(history_file).st_size == 0:
+        now = datetime.now()
+        pd.DataFrame([{
+            "DateTime": now.strftime("%Y-%m-%d %H:%M:%S.%f"),
+            "Date": now.strftime("%Y-%m-%d"),
+            "Goal": read_goal(username)
+        }], columns=GOAL_HISTORY_COLS).to_csv(history_file, index=False)
+
+    return pd.read_csv(history_file, dtype={"Date": str})
+
+
+@profiled("goal.set", "write")
+def set_goal(username, goal, tracker=None):
+    """
+    Saves a new daily goal, timestamps it in the goal history and updates the
+    adherence tracker so days from today onwards are scored against it.
+    Returns the updated tracker (None if none was given).
+    """
+    goal = int(goal)
+    now = datetime.now()
+
+    row = pd.DataFrame([{
+        "DateTime": now.strftime("%Y-%m-%d %H:%M:%S.%f"),
+        "Date": now.strftime("%Y-%m-%d"),
+        "Goal": goal
+    }], columns=GOAL_HISTORY_COLS)
+    history = pd.concat([_read_goal_history(username), row], ignore_index=True)
+
+    # Under the log's lock: the tracker state saved here is stamped with the log's signature
+    with locked_log(get_meals_file(username)):
+        WRITE_QUEUE.stage(get_goal_file(username), str(goal), write_text)
+        WRITE_QUEUE.stage(get_goal_history_file(username), history, write_csv)
+
+        if tracker is not None:
+            # Re-scored from the saved state; the caller's copy may predate meals logged elsewhere
+            tracker = load_tracker(username)
+            tracker.change_goal(now.strftime("%Y-%m-%d"), goal)
+            tracker.save()
+    return tracker
+
+
+# -------------------------------------
+# Adherence tracker
+# -------------------------------------
+class AdherenceTracker:
+    """
+    Per-day calorie totals scored against the goal in effect on each day.
+
+    Totals are updated in place as meals are added, edited or deleted, so the
+    dashboard never has to rescan the meal log. A full rebuild only happens
+    when the meals file was changed by something other than the tracker.
+    """
+
+    def __init__(self, username):
+        self.username = username
+        self.daily = {}           # "YYYY-MM-DD" -> calories consumed
+        self.goal_dates = []      # sorted dates of goal changes
+        self.goal_values = []
+        self.total_deficit = 0.0  # sum of (goal - consumed) over logged days
+        self.days_logged = 0
+        self.days_met = 0
+        self.best_streak = 0
+        self.meals_signature = None
+        self.goals_signature = None
+
+    # ---------------------------
+    # Goals
+    # ---------------------------
+    def _set_goal_history(self, history):
+        self.goal_dates = [d for d, _ in history]
+        self.goal_values = [g for _, g in history]
+
+    def goal_for(self, day):
+        if not self.goal_dates:
+            return DEFAULT_GOAL
+        i = bisect_right(self.goal_dates, _day_str(day)) - 1
+        # Days before the first recorded change use the earliest goal
+        return self.goal_values[max(i, 0)]
+
+    def change_goal(self, day, goal):
+        day = _day_str(day)
+        i = bisect_right(self.goal_dates, day)
+        if i > 0 and self.goal_dates[i - 1] == day:
+            self.goal_values[i - 1] = goal
+        else:
+            self.goal_dates.insert(i, day)
+            self.goal_values.insert(i, goal)
+
+        # Only days on/after the change can be scored differently
+        if any(d >= day for d in self.daily):
+            self._recompute_totals()
+
+    # ---------------------------
+    # Scoring
+    # ---------------------------
+    def consumed(self, day):
+        return self.daily.get(_day_str(day), 0.0)
+
+    def is_met(self, day):
+        day = _day_str(day)
+        calories = self.daily.get(day, 0.0)
+        return calories > 0 and calories <= self.goal_for(day)
+
+    def _contribution(self, day, calories):
+        if calories <= 0:
+            return 0.0, 0, 0
+        goal = self.goal_for(day)
+        return goal - calories, 1, int(calories <= goal)
+
+    def _recompute_totals(self):
+        self.total_deficit = 0.0
+        self.days_logged = 0
+        self.days_met = 0
+        for day, calories in self.daily.items():
+            deficit, logged, met = self._contribution(day, calories)
+            self.total_deficit += deficit
+            self.days_logged += logged
+            self.days_met += met
+        self.best_streak = self._longest_streak()
+
+    def _longest_streak(self):
+        best = 0
+        for day in self.daily:
+            if not self.is_met(day):
+                continue
+            prev_day = _day_str(date.fromisoformat(day) - timedelta(days=1))
+            if self.is_met(prev_day):
+                continue  # not the start of a run
+            best = max(best, self._run_forward(day))
+        return best
+
+    def _run_forward(self, day):
+        length = 0
+        current = date.fromisoformat(day)
+        while self.is_met(current):
+            length += 1
+            current += timedelta(days=1)
+        return length
+
+    def _run_containing(self, day):
+        current = date.fromisoformat(day)
+        while self.is_met(current - timedelta(days=1)):
+            current -= timedelta(days=1)
+        return self._run_forward(_day_str(current))
+
+    def add_calories(self, day, delta):
+        """Applies a logged/edited/deleted meal's calorie change to one day."""
+        day = _day_str(day)
+        was_met = self.is_met(day)
+        old = self.daily.get(day, 0.0)
+        new = old + float(delta)
+        if new < 1e-6:
+            new = 0.0  # float drift after deleting the day's last meal
+
+        old_deficit, old_logged, old_met = self._contribution(day, old)
+        new_deficit, new_logged, new_met = self._contribution(day, new)
+        self.total_deficit += new_deficit - old_deficit
+        self.days_logged += new_logged - old_logged
+        self.days_met += new_met - old_met
+
+        if new > 0:
+            self.daily[day] = new
+        else:
+            self.daily.pop(day, None)
+
+        if self.is_met(day):
+            self.best_streak = max(self.best_streak, self._run_containing(day))
+        elif was_met:
+            # A broken run may have been the best one
+            self.best_streak = self._longest_streak()
+
+    def current_streak(self, today=None):
+        """Consecutive days meeting the goal, ending today (or yesterday if today isn't met yet)."""
+        current = today or date.today()
+        if not self.is_met(current):
+            current -= timedelta(days=1)
+        streak = 0
+        while self.is_met(current):
+            streak += 1
+            current -= timedelta(days=1)
+        return streak
+
+    def rolling(self, window, today=None):
+        """Adherence and deficit over the last `window` days, including today."""
+        today = today or date.today()
+        met = logged = 0
+        deficit = 0.0
+        for offset in range(window):
+            day = _day_str(today - timedelta(days=offset))
+            d, l, m = self._contribution(day, self.daily.get(day, 0.0))
+            deficit += d
+            logged += l
+            met += m
+        return {
+            "days_met": met,
+            "days_logged": logged,
+            "adherence": met / window,
+            "deficit": deficit,
+        }
+
+    # ---------------------------
+    # Persistence
+    # ---------------------------
+    @profiled("adherence.rebuild", "derive")
+    def rebuild(self):
+        """Full rescan of the meals file (+ archive summary) — only used when the cached state is stale."""
+        self.daily = {}
+        meals_file = get_meals_file(self.username)
+
+        # Archived days come pre-summed; only the hot log is scanned per meal
+        frames = [archive.daily_summary(meals_file)[["Date", "Calories"]]]
+        df = read_raw_meals(meals_file)
+        if df is not None:
+            if not df.empty and {"Date", "Calories"}.issubset(df.columns):
+                frames.append(df[["Date", "Calories"]])
+        frames = [f for f in frames if not f.empty]
+        if frames:
+            df = pd.concat(frames, ignore_index=True)
+            df["Date"] = pd.to_datetime(df["Date"], errors="coerce").dt.strftime("%Y-%m-%d")
+            df["Calories"] = pd.to_numeric(df["Calories"], errors="coerce").fillna(0)
+            daily = df.dropna(subset=["Date"]).groupby("Date")["Calories"].sum()
+            self.daily = {d: float(c) for d, c in daily.items() if c > 0}
+
+        self._recompute_totals()
+
+    def _load_state(self, state):
+        self.daily = state["daily"]
+        self.total_deficit = state["total_deficit"]
+        self.days_logged = state["days_logged"]
+        self.days_met = state["days_met"]
+        self.best_streak = state["best_streak"]
+
+    @profiled("adherence.save", "write")
+    def save(self):
+        state = {
+            "daily": self.daily,
+            "total_deficit": self.total_deficit,
+            "days_logged": self.days_logged,
+            "days_met": self.days_met,
+            "best_streak": self.best_streak,
+        }
+        # Signatures are stamped when the state reaches disk, after the files they describe
+        WRITE_QUEUE.stage(get_adherence_file(self.username), json.dumps(state), json_state_writer(
+            meals_signature=get_meals_file(self.username),
+            goals_signature=get_goal_history_file(self.username),
+        ))
+
+
+@profiled("adherence.load", "load")
+def load_tracker(username):
+    """
+    Loads the cached adherence state for a user, rebuilding it from the meals
+    file only if the log or goal history changed outside the tracker.
+    """
+    tracker = AdherenceTracker(username)
+    tracker._set_goal_history(load_goal_history(username))
+
+    adherence_file = get_adherence_file(username)
+    staged = WRITE_QUEUE.pending(adherence_file)
+    if staged is not None:
+        # Not flushed yet, so newer than anything on disk
+        tracker._load_state(json.loads(staged))
+        return tracker
+
+    state = None
+    if os.path.exists(adherence_file):
+        try:
+            with open(adherence_file, "r") as f:
+                state = json.load(f)
+        except (ValueError, OSError):
+            state = None
+
+    meals_signature = file_signature(get_meals_file(username))
+    goals_signature = file_signature(get_goal_history_file(username))
+
+    if state is None or state.get("meals_signature") != meals_signature:
+        # Under the log's lock, so the rebuilt state is flushed before anyone else changes the log
+        with locked_log(get_meals_file(username)):
+            tracker.rebuild()
+            tracker.save()
+        return tracker
+
+    tracker._load_state(state)
+    tracker.meals_signature = meals_signature
+    tracker.goals_signature = state.get("goals_signature")
+
+    if tracker.goals_signature != goals_signature:
+        # Goal history edited elsewhere → re-score cached days, no log rescan needed
+        with locked_log(get_meals_file(username)):
+            tracker._recompute_totals()
+            tracker.save()
+
+    return tracker
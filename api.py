@@ -0,0 +1,414 @@
+# api.py
+"""
+Local HTTP JSON API over the app's meal storage and the USDA catalog (endpoints in README.md).
+
+    python api.py [--host 127.0.0.1] [--port 8502]
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import secrets
+import threading
+import time
+from datetime import date, datetime
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+import pandas as pd
+
+import archive
+import changes
+from adherence import load_tracker
+from catalog import load_catalog, NUTRIENTS
+from food_index import load_food_index
+from helpers import file_signature, find_user, get_meals_file
+from meal_store import MEAL_COLS, append_meals, ensure_meals_file, locked_log, new_entry_id, read_meals_file
+from write_queue import WRITE_QUEUE
+
+MEAL_TYPES = ["Breakfast", "Lunch", "Dinner", "Snack"]
+MAX_BATCH = 500        # meals per POST /api/meals
+MAX_PAGE = 1000        # entries per GET /api/meals page
+DEFAULT_PAGE = 100
+MAX_BODY = 1 << 20     # bytes
+TOKEN_TTL = float(os.environ.get("NUTRITION_API_TOKEN_HOURS", "12")) * 3600  # seconds
+
+logger = logging.getLogger("nutrition.api")
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# -------------------------------------
+# Sessions
+# -------------------------------------
+_tokens = {}           # token -> (username, expiry as time.monotonic())
+_tokens_guard = threading.Lock()
+_parse_locks = {}      # meals file -> lock: one thread parses a new log version, the rest wait for it
+_parse_guard = threading.Lock()
+
+
+def login(username, password):
+    if find_user(username, password) is None:
+        raise ApiError(401, "invalid username or password")
+    ensure_meals_file(get_meals_file(username))
+    token = secrets.token_urlsafe(32)
+    now = time.monotonic()
+    with _tokens_guard:
+        for expired in [t for t, (_, expires) in _tokens.items() if expires <= now]:
+            del _tokens[expired]
+        _tokens[token] = (username, now + TOKEN_TTL)
+    return token
+
+
+def token_user(token):
+    """The username a token was issued to, or None if it is unknown or expired."""
+    with _tokens_guard:
+        username, expires = _tokens.get(token, (None, 0))
+        if expires <= time.monotonic():
+            _tokens.pop(token, None)
+            return None
+    return username
+
+
+def parse_lock(meals_file):
+    with _parse_guard:
+        return _parse_locks.setdefault(meals_file, threading.Lock())
+
+
+# -------------------------------------
+# Reads
+# -------------------------------------
+@lru_cache(maxsize=64)
+def _cached_meals(meals_file, version):
+    return read_meals_file(meals_file, load_catalog())
+
+
+def user_meals(username):
+    """
+    The user's normalized meals log (MEAL_COLS), shared read-only between
+    requests: the staged frame while a write is pending, else parsed once
+    per file version.
+    """
+    meals_file = get_meals_file(username)
+    staged = WRITE_QUEUE.pending(meals_file)
+    if staged is not None:
+        return staged
+    version = file_signature(meals_file)
+    if version is None:
+        return pd.DataFrame(columns=MEAL_COLS)
+    with parse_lock(meals_file):
+        return _cached_meals(meals_file, tuple(version))
+
+
+def parse_day(value, name):
+    try:
+        return date.fromisoformat(value).isoformat()
+    except (TypeError, ValueError):
+        raise ApiError(400, f"{name} must be a YYYY-MM-DD date")
+
+
+def parse_limit(value, default, maximum):
+    try:
+        limit = int(value) if value is not None else default
+    except ValueError:
+        raise ApiError(400, "limit must be an integer")
+    return max(1, min(limit, maximum))
+
+
+def parse_cursor(value):
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ApiError(400, "cursor must be an integer")
+
+
+def date_range(df, start, end):
+    # ISO dates compare correctly as strings
+    mask = pd.Series(True, index=df.index)
+    if start:
+        mask &= df["Date"] >= start
+    if end:
+        mask &= df["Date"] <= end
+    return df[mask]
+
+
+def meals_in_range(username, start, end):
+    """Entries in [start, end]; the user's archive is only opened when the range reaches into it."""
+    df = date_range(user_meals(username), start, end)
+    meals_file = get_meals_file(username)
+    if archive.covers(meals_file, start or date.min):
+        archived = archive.read_archived(meals_file, start, end)
+        if not archived.empty:
+            df = pd.concat([archived, df], ignore_index=True) if not df.empty else archived
+    return df
+
+
+def records(df):
+    """Rows as JSON-ready dicts (NaN / NA -> null)."""
+    return json.loads(df.to_json(orient="records"))
+
+
+def search_foods(text, limit):
+    catalog = load_catalog()
+    if catalog is None:
+        raise ApiError(503, "USDA catalog is missing")
+    foods = []
+    for display, *macros in catalog.search(text)[["DisplayMeal"] + NUTRIENTS].head(limit).itertuples(index=False):
+        foods.append({
+            "Meal": display,
+            "per100g": dict(zip(NUTRIENTS, macros)),
+            "variants": list(catalog.variants.get(display, ())),
+            "units": catalog.portions.available_units(display),
+            "default_unit": catalog.portions.default_unit(display),
+        })
+    return foods
+
+
+def list_meals(username, start, end, limit, cursor):
+    """
+    Entries in [start, end] ordered by (DateTime, EntryID). The cursor is the
+    last entry of the previous page, so pages stay stable while meals are
+    being added.
+    """
+    df = meals_in_range(username, start, end).sort_values(["DateTime", "EntryID"])
+    if cursor:
+        after_time, _, after_id = cursor.partition("|")
+        later = (df["DateTime"] > after_time) | ((df["DateTime"] == after_time) & (df["EntryID"] > after_id))
+        df = df[later]
+    page = df.head(limit)
+    next_cursor = None
+    if len(df) > limit:
+        last = page.iloc[-1]
+        next_cursor = f"{last['DateTime']}|{last['EntryID']}"
+    return {"meals": records(page), "next": next_cursor}
+
+
+def daily_totals(username, start, end):
+    df = meals_in_range(username, start, end)
+    totals = df.groupby("Date")[NUTRIENTS].sum().reset_index()
+    tracker = load_tracker(username)
+    totals["Goal"] = [tracker.goal_for(d) for d in totals["Date"]]
+    return records(totals)
+
+
+# -------------------------------------
+# Writes
+# -------------------------------------
+def build_entry(catalog, item, now):
+    """
+    A log row for one API meal, the way the Food Logging page builds it:
+    catalog foods (by "FoodID" or DisplayMeal "Meal") get grams and macros
+    from Quantity + Unit; anything else needs its own Calories etc.
+    """
+    if not isinstance(item, dict) or (not item.get("Meal") and item.get("FoodID") is None):
+        raise ApiError(400, "each meal needs a Meal name or a FoodID")
+
+    meal_type = item.get("MealType", "Snack")
+    if meal_type not in MEAL_TYPES:
+        raise ApiError(400, f"MealType must be one of {MEAL_TYPES}")
+    logged_at = now
+    if item.get("DateTime"):
+        try:
+            logged_at = datetime.fromisoformat(str(item["DateTime"]))
+        except ValueError:
+            raise ApiError(400, "DateTime must be an ISO timestamp")
+    day = parse_day(item.get("Date", logged_at.date().isoformat()), "Date")
+    try:
+        quantity = float(item.get("Quantity", 1.0))
+    except (TypeError, ValueError):
+        raise ApiError(400, "Quantity must be a number")
+    if not math.isfinite(quantity) or quantity <= 0:
+        raise ApiError(400, "Quantity must be greater than 0")
+
+    row = {
+        "EntryID": new_entry_id(),
+        "DateTime": logged_at.strftime("%Y-%m-%d %H:%M:%S.%f"),
+        "Date": day,
+        "MealType": meal_type,
+        "FoodID": pd.NA,
+        "Quantity": quantity,
+    }
+
+    try:
+        record = catalog.get(item.get("FoodID"), item.get("Meal")) if catalog is not None else None
+    except (TypeError, ValueError):
+        raise ApiError(400, "FoodID must be a USDA ID")
+    if record is not None:
+        unit = item.get("Unit") or catalog.portions.default_unit(record.DisplayMeal)
+        grams = catalog.to_grams(record, quantity, unit)
+        if pd.isna(grams):
+            raise ApiError(400, f"unit {unit!r} doesn't apply to {record.DisplayMeal}")
+        row.update(catalog.macros(record, grams))
+        row.update({
+            "Meal": record.DisplayMeal,
+            "Servings": grams / 100,  # USDA basis
+            "FoodID": record.FoodID if record.FoodID is not None else pd.NA,
+            "Unit": unit,
+            "Grams": float(grams),
+        })
+    elif item.get("Meal") and "Calories" in item:
+        try:
+            row.update({col: float(item.get(col, 0.0)) for col in NUTRIENTS})
+        except (TypeError, ValueError):
+            raise ApiError(400, "Calories, Protein, Carbs and Fat must be numbers")
+        if not all(math.isfinite(row[col]) and row[col] >= 0 for col in NUTRIENTS):
+            raise ApiError(400, "Calories, Protein, Carbs and Fat must be 0 or more")
+        row.update({
+            "Meal": str(item["Meal"]).strip().title(),
+            "Servings": quantity,
+            "Unit": "serving",
+            "Grams": pd.NA,
+        })
+    else:
+        raise ApiError(400, f"unknown food {item.get('Meal') or item.get('FoodID')!r} (give Calories to log it manually)")
+    return row
+
+
+def add_meals(username, items):
+    if not isinstance(items, list) or not items:
+        raise ApiError(400, "meals must be a non-empty list")
+    if len(items) > MAX_BATCH:
+        raise ApiError(413, f"at most {MAX_BATCH} meals per request")
+
+    catalog = load_catalog()
+    now = datetime.now()
+    rows = [build_entry(catalog, item, now) for item in items]
+
+    # One read + one staged write for the whole batch, flushed with its derived state under the
+    # user's file lock; the tracker and index are loaded inside it so another process's writes are kept
+    with locked_log(get_meals_file(username)):
+        append_meals(get_meals_file(username), rows, catalog)
+        tracker = load_tracker(username)
+        index = load_food_index(username)
+        for row in rows:
+            tracker.add_calories(row["Date"], row["Calories"])
+            index.record(row)
+        tracker.save()
+        index.save()
+    return records(pd.DataFrame(rows, columns=MEAL_COLS))
+
+
+# -------------------------------------
+# HTTP
+# -------------------------------------
+class ApiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive: clients reuse one connection
+    # Headers and body are separate writes; with Nagle on, the body waits out the client's delayed ACK
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def _dispatch(self, method):
+        url = urlsplit(self.path)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        try:
+            body = self._read_body() if method == "POST" else None
+            if (method, url.path) == ("POST", "/api/login"):
+                status, payload = 200, {"token": login(body.get("username"), body.get("password"))}
+            else:
+                status, payload = self._route(method, url.path, query, body)
+        except ApiError as e:
+            status, payload = e.status, {"error": str(e)}
+        except Exception:
+            logger.exception("%s %s failed", method, self.path)
+            status, payload = 500, {"error": "internal error"}
+        self._send(status, payload)
+
+    def _route(self, method, path, query, body):
+        username = self._user()
+        if (method, path) == ("GET", "/api/foods"):
+            q = query.get("q", "").strip()
+            if not q:
+                raise ApiError(400, "q is required")
+            return 200, {"foods": search_foods(q, parse_limit(query.get("limit"), 20, 100))}
+        if (method, path) == ("POST", "/api/meals"):
+            return 201, {"meals": add_meals(username, body.get("meals"))}
+
+        start = parse_day(query["start"], "start") if "start" in query else None
+        end = parse_day(query["end"], "end") if "end" in query else None
+        if (method, path) == ("GET", "/api/meals"):
+            limit = parse_limit(query.get("limit"), DEFAULT_PAGE, MAX_PAGE)
+            return 200, list_meals(username, start, end, limit, query.get("cursor"))
+        if (method, path) == ("GET", "/api/totals"):
+            return 200, {"days": daily_totals(username, start, end)}
+        if (method, path) == ("GET", "/api/changes"):
+            limit = parse_limit(query.get("limit"), DEFAULT_PAGE, MAX_PAGE)
+            return 200, changes.changes_since(get_meals_file(username), parse_cursor(query.get("cursor")), limit)
+        raise ApiError(404, f"no route for {method} {path}")
+
+    def _user(self):
+        auth = self.headers.get("Authorization", "")
+        username = token_user(auth[len("Bearer "):]) if auth.startswith("Bearer ") else None
+        if username is None:
+            raise ApiError(401, "missing, unknown or expired bearer token")
+        return username
+
+    def _read_body(self):
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0 or length > MAX_BODY:
+            self.close_connection = True  # the unread body can't be skipped to reach the next request
+            if length < 0:
+                raise ApiError(400, "Content-Length must be a non-negative integer")
+            raise ApiError(413, "request body too large")
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            raise ApiError(400, "body must be JSON")
+        if not isinstance(body, dict):
+            raise ApiError(400, "body must be a JSON object")
+        return body
+
+    def _send(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        logger.debug("%s - " + format, self.address_string(), *args)
+
+
+def make_server(host="127.0.0.1", port=8502):
+    server = ThreadingHTTPServer((host, port), ApiHandler)
+    server.daemon_threads = True
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python api.py")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8502)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    load_catalog()  # parse / attach before the first request
+    server = make_server(args.host, args.port)
+    logger.info("serving on http://%s:%d/api", args.host, server.server_port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        WRITE_QUEUE.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+# archive.py
+"""
+Tiered retention: old meal history moves from the hot CSV into monthly gzip'd partitions.
+
+    python -m archive [--hot-days 90] [--users a,b]   # compact everyone (nightly)
+"""
+import argparse
+import json
+import logging
+import os
+import threading
+from datetime import date, timedelta
+from functools import lru_cache
+
+import pandas as pd
+
+import changes
+from helpers import file_signature, get_meals_file, load_users
+from meal_store import MEAL_COLS, _coerce_columns, ensure_meals_file, locked_log, read_meals_file, write_meals_file
+from profiling import profiled
+from write_queue import WRITE_QUEUE, atomic_write, write_csv, write_csv_gz, write_text
+
+# Days of history kept in the hot meals CSV
+HOT_DAYS = int(os.environ.get("NUTRITION_HOT_DAYS", "90"))
+NUTRIENTS = ["Calories", "Protein", "Carbs", "Fat"]
+DAILY_COLS = ["Date", "Meals"] + NUTRIENTS
+MONTHLY_COLS = ["Month", "Days", "Meals"] + NUTRIENTS
+
+logger = logging.getLogger("nutrition.archive")
+
+
+# -------------------------------------
+# Layout
+# -------------------------------------
+def archive_dir(meals_file):
+    return os.path.splitext(meals_file)[0] + "_archive"
+
+
+def _partition_file(meals_file, month):
+    return os.path.join(archive_dir(meals_file), f"{month}.csv.gz")
+
+
+def _daily_file(meals_file):
+    return os.path.join(archive_dir(meals_file), "daily.csv")
+
+
+def _monthly_file(meals_file):
+    return os.path.join(archive_dir(meals_file), "monthly.csv")
+
+
+def _manifest_file(meals_file):
+    return os.path.join(archive_dir(meals_file), "manifest.json")
+
+
+def hot_cutoff(today=None, hot_days=HOT_DAYS):
+    """First day kept hot: the start of the month `hot_days` before today, so whole months are archived."""
+    day = (today or date.today()) - timedelta(days=hot_days)
+    return day.replace(day=1).isoformat()
+
+
+# -------------------------------------
+# Cached reads (parsed once per file version)
+# -------------------------------------
+@lru_cache(maxsize=64)
+def _cached_manifest(path, version):
+    with open(path) as f:
+        return json.load(f)
+
+
+@lru_cache(maxsize=64)
+def _cached_partition(path, version):
+    df = pd.read_csv(path, dtype={"EntryID": str, "Date": str})
+    _coerce_columns(df)
+    return df[MEAL_COLS]
+
+
+@lru_cache(maxsize=32)
+def _cached_summary(path, version):
+    return pd.read_csv(path, dtype={"Date": str, "Month": str})
+
+
+def read_manifest(meals_file):
+    path = _manifest_file(meals_file)
+    version = file_signature(path)
+    if version is None:
+        return None
+    try:
+        return _cached_manifest(path, tuple(version))
+    except (OSError, ValueError):
+        return None
+
+
+def last_archived_day(meals_file):
+    """Latest day with archived entries ("YYYY-MM-DD"), or None if nothing is archived."""
+    manifest = read_manifest(meals_file)
+    return manifest.get("last") if manifest else None
+
+
+def covers(meals_file, day):
+    """True if entries on or before `day` (date or ISO string) may live in the archive."""
+    last = last_archived_day(meals_file)
+    return last is not None and str(day) <= last
+
+
+def archive_version(meals_file):
+    """Signature that changes whenever archived entries do (the daily summary is rewritten with them)."""
+    return file_signature(_daily_file(meals_file))
+
+
+def _read_partition(meals_file, month):
+    path = _partition_file(meals_file, month)
+    version = file_signature(path)
+    if version is None:
+        return pd.DataFrame(columns=MEAL_COLS)
+    return _cached_partition(path, tuple(version))
+
+
+def _read_summary(path, columns):
+    version = file_signature(path)
+    if version is None:
+        return pd.DataFrame(columns=columns)
+    return _cached_summary(path, tuple(version))
+
+
+def daily_summary(meals_file):
+    """Per-day totals of the archived entries (DAILY_COLS). Shared between reruns — treat as read-only."""
+    return _read_summary(_daily_file(meals_file), DAILY_COLS)
+
+
+def monthly_summary(meals_file):
+    """Per-month totals of the archived entries (MONTHLY_COLS). Shared between reruns — treat as read-only."""
+    return _read_summary(_monthly_file(meals_file), MONTHLY_COLS)
+
+
+@profiled("archive.read", "load")
+def read_archived(meals_file, start=None, end=None):
+    """
+    Archived entries dated in [start, end] (ISO strings, inclusive; None for
+    open-ended), opening only the partitions of the months in range.
+    Returns a new frame (MEAL_COLS).
+    """
+    manifest = read_manifest(meals_file)
+    months = [
+        m for m in (manifest or {}).get("months", [])
+        if (start is None or m >= start[:7]) and (end is None or m <= end[:7])
+    ]
+    frames = [df for df in (_read_partition(meals_file, m) for m in months) if not df.empty]
+    if not frames:
+        return pd.DataFrame(columns=MEAL_COLS)
+    df = pd.concat(frames, ignore_index=True)
+    if start is not None:
+        df = df[df["Date"] >= start]
+    if end is not None:
+        df = df[df["Date"] <= end]
+    return df.reset_index(drop=True)
+
+
+# -------------------------------------
+# Writes
+# -------------------------------------
+def _summarize(df):
+    grouped = df.groupby("Date")
+    daily = grouped[NUTRIENTS].sum()
+    daily.insert(0, "Meals", grouped.size())
+    return daily.reset_index()[DAILY_COLS]
+
+
+def _rewrite_months(meals_file, partitions):
+    """
+    Writes the given {month: entries} partitions (removing empty ones), then
+    the summaries and manifest derived from them. Each file is replaced
+    atomically, partitions first, so a crash never loses archived entries.
+    """
+    os.makedirs(archive_dir(meals_file), exist_ok=True)
+    for month, df in partitions.items():
+        path = _partition_file(meals_file, month)
+        if df.empty:
+            if os.path.exists(path):
+                os.remove(path)
+        else:
+            atomic_write(path, df.sort_values(["DateTime", "EntryID"]), write_csv_gz, binary=True)
+
+    daily = daily_summary(meals_file)
+    daily = daily[~daily["Date"].str[:7].isin(list(partitions))]
+    frames = [d for d in [daily] + [_summarize(df) for df in partitions.values()] if not d.empty]
+    daily = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=DAILY_COLS)
+    daily = daily.sort_values("Date").reset_index(drop=True)
+    atomic_write(_daily_file(meals_file), daily, write_csv)
+
+    grouped = daily.groupby(daily["Date"].str[:7].rename("Month"))
+    monthly = grouped[["Meals"] + NUTRIENTS].sum()
+    monthly.insert(0, "Days", grouped.size())
+    atomic_write(_monthly_file(meals_file), monthly.reset_index()[MONTHLY_COLS], write_csv)
+
+    manifest = {
+        "months": list(monthly.index),
+        "first": daily["Date"].iloc[0] if len(daily) else None,
+        "last": daily["Date"].iloc[-1] if len(daily) else None,
+        "entries": int(daily["Meals"].sum()),
+        "compacted_on": (read_manifest(meals_file) or {}).get("compacted_on"),
+    }
+    atomic_write(_manifest_file(meals_file), json.dumps(manifest), write_text)
+
+
+def _mark_compacted(meals_file, today):
+    manifest = dict(read_manifest(meals_file) or {"months": [], "first": None, "last": None, "entries": 0})
+    manifest["compacted_on"] = today.isoformat()
+    os.makedirs(archive_dir(meals_file), exist_ok=True)
+    atomic_write(_manifest_file(meals_file), json.dumps(manifest), write_text)
+
+
+@profiled("archive.compact", "write")
+def compact(meals_file, cutoff, catalog=None):
+    """
+    Moves entries dated before `cutoff` from the hot log into their monthly
+    partitions (merged by EntryID, so re-running after a crash between the two
+    writes is harmless). The partitions are written first and synchronously;
+    the shrunk hot log is staged on the write-behind queue. Callers hold
+    locked_log(meals_file) (compact_user does). Returns the number of
+    entries moved.
+    """
+    df = read_meals_file(meals_file, catalog)
+    old = df["Date"].astype(str) < cutoff
+    if not old.any():
+        return 0
+
+    moved = df[old]
+    partitions = {}
+    for month, rows in moved.groupby(moved["Date"].str[:7]):
+        existing = _read_partition(meals_file, month)
+        merged = pd.concat([existing, rows], ignore_index=True) if not existing.empty else rows
+        partitions[month] = merged.drop_duplicates("EntryID", keep="last")
+    _rewrite_months(meals_file, partitions)
+
+    write_meals_file(df[~old].reset_index(drop=True), meals_file)
+    return int(old.sum())
+
+
+def compact_user(username, today=None, hot_days=HOT_DAYS):
+    """
+    Compacts one user's log under its lock. The adherence tracker and food
+    index are loaded before the log shrinks and re-saved with it, so they
+    stay valid (and complete) without a rebuild.
+    """
+    # Imported here: both rebuild from the archive, so they import this module
+    from adherence import load_tracker
+    from food_index import load_food_index
+
+    today = today or date.today()
+    meals_file = get_meals_file(username)
+    if file_signature(meals_file) is None and WRITE_QUEUE.pending(meals_file) is None:
+        return 0
+    with locked_log(meals_file):
+        ensure_meals_file(meals_file)  # archived entries need their IDs
+        tracker = load_tracker(username)
+        index = load_food_index(username)
+        moved = compact(meals_file, hot_cutoff(today, hot_days))
+        if moved:
+            tracker.save()
+            index.save()
+            changes.touch(meals_file)  # entries only moved, so no events
+        _mark_compacted(meals_file, today)
+    if moved:
+        logger.info("archived %d entries of %s before %s", moved, username, hot_cutoff(today, hot_days))
+    return moved
+
+
+def compact_if_due(username, today=None):
+    """Compacts at most once a day per user."""
+    today = today or date.today()
+    manifest = read_manifest(get_meals_file(username))
+    if manifest is not None and manifest.get("compacted_on") == today.isoformat():
+        return 0
+    return compact_user(username, today)
+
+
+_compacting = set()  # usernames with a background compaction running
+_compacting_lock = threading.Lock()
+
+
+def compact_in_background(username, today=None):
+    """Runs compact_if_due on a daemon thread (at login), so the first page load doesn't wait for it."""
+    with _compacting_lock:
+        if username in _compacting:
+            return
+        _compacting.add(username)
+    threading.Thread(target=_compact_quietly, args=(username, today),
+                     name=f"compact-{username}", daemon=True).start()
+
+
+def _compact_quietly(username, today):
+    try:
+        compact_if_due(username, today)
+    except Exception:
+        logger.exception("compacting %s failed", username)
+    finally:
+        with _compacting_lock:
+            _compacting.discard(username)
+
+
+# -------------------------------------
+# Editing archived entries
+# -------------------------------------
+def _update_partition(meals_file, day, entry_id, change, op):
+    month = str(day)[:7]
+    with locked_log(meals_file):
+        df = _read_partition(meals_file, month)
+        hit = df["EntryID"] == entry_id
+        if not hit.any():
+            return False
+        updated, changed = change(df, hit)
+        _rewrite_months(meals_file, {month: updated})
+        changes.record(meals_file, op, changed)
+    return True
+
+
+def update_archived_meal(meals_file, day, entry_id, row):
+    """Replaces the archived entry with this EntryID on `day`; returns False if it isn't there."""
+    def change(df, hit):
+        replacement = pd.DataFrame([{col: row.get(col, pd.NA) for col in MEAL_COLS}], columns=MEAL_COLS)
+        _coerce_columns(replacement)
+        return pd.concat([df[~hit], replacement], ignore_index=True), replacement
+    return _update_partition(meals_file, day, entry_id, change, "edit")
+
+
+def delete_archived_meal(meals_file, day, entry_id):
+    """Removes the archived entry with this EntryID on `day`; returns False if it isn't there."""
+    return _update_partition(meals_file, day, entry_id, lambda df, hit: (df[~hit], df[hit]), "delete")
+
+
+# -------------------------------------
+# Nightly job
+# -------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m archive")
+    parser.add_argument("--hot-days", type=int, default=HOT_DAYS)
+    parser.add_argument("--users", help="comma-separated usernames (default: everyone with a meal log)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    usernames = args.users.split(",") if args.users else ["demo"] + [u["username"] for u in load_users()]
+    total = 0
+    for username in dict.fromkeys(usernames):
+        if file_signature(get_meals_file(username)):
+            total += compact_user(username, hot_days=args.hot_days)
+    WRITE_QUEUE.flush()
+    print(json.dumps({"users": len(usernames), "archived": total}))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,68 @@
+# benchmarks/__main__.py
+"""
+Usage (from the repo root):
+
+    python -m benchmarks                         # quick scale, print timings
+    python -m benchmarks --scale full -o new.json
+    python -m benchmarks --compare old.json      # flag >10% regressions
+
+The app is run against a generated workspace (temp dir by default) so the
+real data/ directory is never touched.
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.generate import SCALES, build_workspace
+from benchmarks.harness import (
+    run_benchmarks, run_metadata, save_results, compare_results
+)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    parser.add_argument("--scale", choices=list(SCALES), default="quick")
+    parser.add_argument("--workdir", help="where to generate data (default: temp dir)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--filter", help="only run benchmarks whose name contains this")
+    parser.add_argument("-o", "--output", help="write results JSON here")
+    parser.add_argument("--compare", help="baseline results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=1.10)
+    args = parser.parse_args(argv)
+
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = os.path.abspath(args.compare) if args.compare else None
+    workdir = os.path.abspath(args.workdir) if args.workdir else tempfile.mkdtemp(prefix="nutrition-bench-")
+
+    print(f"Generating '{args.scale}' workspace in {workdir} ...")
+    build_workspace(workdir, args.scale, args.seed)
+    os.chdir(workdir)
+
+    # Imported after chdir so module-level paths resolve inside the workspace
+    from benchmarks.suites import make_context, restore_meals
+    ctx = make_context()
+    try:
+        results = run_benchmarks(ctx, repeat=args.repeat, name_filter=args.filter)
+    finally:
+        restore_meals(ctx)
+
+    if output:
+        save_results(output, run_metadata(args.scale, REPO_ROOT), results)
+        print(f"\nResults written to {output}")
+
+    if baseline:
+        regressions = compare_results(baseline, results, args.threshold, args.scale)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) slower than {args.threshold:.2f}x baseline")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,199 @@
+# benchmarks/api_load.py
+"""
+Local load test for the HTTP JSON API (api.py).
+
+    python -m benchmarks.api_load [--clients 8] [--seconds 10] [--scale quick]
+
+Starts the API (python api.py) on a free port against a generated
+workspace, then runs N client threads. Each client keeps one connection open
+(keep-alive) and sends a mix of range queries, daily totals, food searches
+and batch inserts. Prints throughput and latency percentiles per endpoint,
+then checks that:
+  - paging through the whole log with the cursor returns each entry once
+  - every inserted meal is in the CSV once the server has shut down
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from urllib.parse import quote
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.generate import BENCH_USER, SCALES, build_workspace
+
+BATCH_SIZE = 10
+# (weight, endpoint) — reads dominate, as they would for a mobile client
+MIX = [(50, "GET /api/meals"), (20, "GET /api/totals"), (20, "GET /api/foods"), (10, "POST /api/meals")]
+QUERIES = ["chick", "rice", "milk", "apple", "bread", "egg", "beef", "cheese"]
+
+
+class Client:
+    def __init__(self, port, token=None):
+        self.conn = http.client.HTTPConnection("127.0.0.1", port)
+        self.headers = {"Content-Type": "application/json"}
+        if token:
+            self.headers["Authorization"] = f"Bearer {token}"
+
+    def request(self, method, path, body=None):
+        data = json.dumps(body) if body is not None else None
+        self.conn.request(method, path, body=data, headers=self.headers)
+        response = self.conn.getresponse()
+        return response.status, json.loads(response.read())
+
+
+def login(port, username, password):
+    status, payload = Client(port).request("POST", "/api/login", {"username": username, "password": password})
+    assert status == 200, payload
+    return payload["token"]
+
+
+def run_client(port, token, days, foods, deadline, seed, results):
+    rng = random.Random(seed)
+    client = Client(port, token)
+    weights, endpoints = zip(*MIX)
+    latencies = {name: [] for name in endpoints}
+    inserted = errors = 0
+
+    while time.perf_counter() < deadline:
+        endpoint = rng.choices(endpoints, weights)[0]
+        day = rng.choice(days)
+        if endpoint == "GET /api/meals":
+            args = ("GET", f"/api/meals?start={day - timedelta(days=30)}&end={day}&limit=100")
+        elif endpoint == "GET /api/totals":
+            args = ("GET", f"/api/totals?start={day - timedelta(days=90)}&end={day}")
+        elif endpoint == "GET /api/foods":
+            args = ("GET", f"/api/foods?q={rng.choice(QUERIES)}&limit=20")
+        else:
+            meals = [{"Meal": rng.choice(foods), "MealType": rng.choice(["Breakfast", "Lunch", "Dinner", "Snack"]),
+                      "Quantity": rng.choice([0.5, 1, 2]), "Date": str(day)} for _ in range(BATCH_SIZE)]
+            args = ("POST", "/api/meals", {"meals": meals})
+
+        start = time.perf_counter()
+        status, _ = client.request(*args)
+        latencies[endpoint].append(time.perf_counter() - start)
+        if status >= 400:
+            errors += 1
+        elif endpoint == "POST /api/meals":
+            inserted += BATCH_SIZE
+    results.append((latencies, inserted, errors))
+
+
+def start_server(workdir):
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    proc = subprocess.Popen([sys.executable, os.path.join(REPO_ROOT, "api.py"), "--port", str(port)], cwd=workdir)
+    for _ in range(300):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return proc, port
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("API server did not start")
+
+
+def page_through(port, token, limit=500):
+    """EntryIDs of the whole log, fetched page by page with the cursor."""
+    client = Client(port, token)
+    ids, cursor = [], None
+    while True:
+        path = f"/api/meals?limit={limit}" + (f"&cursor={quote(cursor)}" if cursor else "")
+        status, payload = client.request("GET", path)
+        assert status == 200, payload
+        ids += [m["EntryID"] for m in payload["meals"]]
+        cursor = payload["next"]
+        if cursor is None:
+            return ids
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.api_load")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--scale", choices=list(SCALES), default="quick")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir")
+    args = parser.parse_args(argv)
+
+    workdir = os.path.abspath(args.workdir) if args.workdir else tempfile.mkdtemp(prefix="nutrition-api-")
+    print(f"Generating '{args.scale}' workspace in {workdir} ...")
+    build_workspace(workdir, args.scale, args.seed)
+    os.chdir(workdir)
+
+    import pandas as pd
+    from catalog import load_catalog
+    from helpers import get_meals_file, load_users
+
+    proc, port = start_server(workdir)
+    password = next(u["password"] for u in load_users() if u["username"] == BENCH_USER)
+    token = login(port, BENCH_USER, password)
+    meals_file = get_meals_file(BENCH_USER)
+    rows_before = len(pd.read_csv(meals_file))
+    dates = pd.read_csv(meals_file, usecols=["Date"])["Date"]
+    first, last = date.fromisoformat(dates.min()), date.fromisoformat(dates.max())
+    days = [first + timedelta(days=i) for i in range((last - first).days + 1)]
+    foods = list(load_catalog().by_display)[:200]
+
+    print(f"{args.clients} clients for {args.seconds:.0f} s against :{port} ({rows_before} logged meals) ...")
+    results = []
+    deadline = time.perf_counter() + args.seconds
+    threads = [
+        threading.Thread(target=run_client, args=(port, token, days, foods, deadline, args.seed + i, results))
+        for i in range(args.clients)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    print(f"\n{'endpoint':<18} {'requests':>9} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    total = 0
+    for _, name in MIX:
+        samples = np.array([s for latencies, _, _ in results for s in latencies[name]]) * 1000
+        total += len(samples)
+        if len(samples):
+            p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+            print(f"{name:<18} {len(samples):>9} {len(samples) / args.seconds:>8.0f} "
+                  f"{p50:>8.2f} {p95:>8.2f} {p99:>8.2f}")
+    inserted = sum(r[1] for r in results)
+    errors = sum(r[2] for r in results)
+    print(f"{'all':<18} {total:>9} {total / args.seconds:>8.0f}    ({errors} errors)")
+
+    problems = []
+    if errors:
+        problems.append(f"{errors} requests failed")
+    ids = page_through(port, token)
+    if len(ids) != len(set(ids)):
+        problems.append(f"cursor paging returned {len(ids) - len(set(ids))} duplicate entries")
+    if len(ids) != rows_before + inserted:
+        problems.append(f"cursor paging returned {len(ids)} of {rows_before + inserted} entries")
+
+    # Ctrl-C: the server flushes its write-behind queue on the way out
+    proc.send_signal(signal.SIGINT)
+    proc.wait()
+    rows_after = len(pd.read_csv(meals_file))
+    if rows_after != rows_before + inserted:
+        problems.append(f"expected {rows_before + inserted} rows after {inserted} inserts, found {rows_after}")
+
+    print(f"\n{inserted} meals inserted, {rows_after} in the log; "
+          + ("all checks passed" if not problems else "FAILED: " + "; ".join(problems)))
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,202 @@
+# benchmarks/changes.py
+"""
+Change feed: what a mirroring client pays to stay in sync, incrementally
+versus re-reading the log, and that its copy always ends up right.
+
+    python -m benchmarks.changes [--scale full] [--rounds 50] [--mutations 5]
+
+Generates a workspace and compacts the benchmark user's log, so there is an
+archive. A mirror syncs once from scratch, then each round applies a few
+random adds / edits / deletes (some on archived entries) and syncs again
+with changes_since(). Prints sync time and payload per round against a full
+reload of the log (hot CSV + archive). Then checks that:
+  - after every sync the mirror holds exactly the log's entries
+  - a mirror that falls more than COMPACT_EVENTS behind gets "reset", and
+    converges after reloading
+  - a log changed outside the app resets every mirror
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.generate import BENCH_USER, SCALES, build_workspace
+
+COMPARED = ["Date", "MealType", "Meal", "Calories"]
+
+
+def full_log(meals_file):
+    """Every entry, hot and archived, as JSON-ready dicts by EntryID."""
+    import archive
+    from meal_store import read_meals_file
+
+    df = pd.concat([archive.read_archived(meals_file), read_meals_file(meals_file)], ignore_index=True)
+    return {row["EntryID"]: row for row in json.loads(df.to_json(orient="records"))}
+
+
+class Mirror:
+    """A client's copy of the log, kept current from the change feed."""
+
+    def __init__(self, meals_file, page=500):
+        self.meals_file = meals_file
+        self.page = page
+        self.entries = {}
+        self.cursor = None
+        self.resets = 0
+
+    def sync(self):
+        """Pulls every change since the cursor; returns the bytes a client would have downloaded."""
+        import changes
+
+        received = 0
+        while True:
+            feed = changes.changes_since(self.meals_file, self.cursor, self.page)
+            received += len(json.dumps(feed))
+            if feed["reset"]:
+                self.resets += 1
+                self.entries = full_log(self.meals_file)
+                received += len(json.dumps(list(self.entries.values())))
+            for event in feed["changes"]:
+                if event["entry"] is None:
+                    self.entries.pop(event["EntryID"], None)
+                else:
+                    self.entries[event["EntryID"]] = event["entry"]
+            self.cursor = feed["cursor"]
+            if not feed["more"]:
+                return received
+
+
+def differences(mirror, truth):
+    if mirror.keys() != truth.keys():
+        return f"{len(mirror.keys() - truth.keys())} extra, {len(truth.keys() - mirror.keys())} missing entries"
+    wrong = [k for k in truth if any(mirror[k][c] != truth[k][c] for c in COMPARED)]
+    return f"{len(wrong)} entries differ" if wrong else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.changes")
+    parser.add_argument("--scale", choices=list(SCALES), default="quick")
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--mutations", type=int, default=5, help="adds / edits / deletes per round")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir")
+    args = parser.parse_args(argv)
+
+    workdir = os.path.abspath(args.workdir) if args.workdir else tempfile.mkdtemp(prefix="nutrition-changes-")
+    print(f"Generating '{args.scale}' workspace in {workdir} ...")
+    build_workspace(workdir, args.scale, args.seed)
+    os.chdir(workdir)
+
+    import archive
+    import changes
+    from helpers import get_meals_file
+    from meal_store import append_meals, delete_meal, new_entry_id, read_meals_file, update_meal
+    from write_queue import WRITE_QUEUE
+
+    meals_file = get_meals_file(BENCH_USER)
+    archive.compact_user(BENCH_USER)
+    rng = np.random.default_rng(args.seed)
+    templates = read_meals_file(meals_file).to_dict("records")
+
+    def mutate():
+        hot = read_meals_file(meals_file)
+        kind = rng.choice(["add", "edit", "delete", "archived"], p=[0.5, 0.25, 0.15, 0.1])
+        if kind == "add":
+            row = dict(templates[rng.integers(len(templates))], EntryID=new_entry_id(),
+                       Date=(date.today() - timedelta(days=int(rng.integers(7)))).isoformat())
+            append_meals(meals_file, [row])
+        elif kind == "edit":
+            row = hot.iloc[rng.integers(len(hot))].to_dict()
+            update_meal(meals_file, row["EntryID"], dict(row, Calories=row["Calories"] + 10))
+        elif kind == "delete":
+            delete_meal(meals_file, hot["EntryID"].iloc[rng.integers(len(hot))])
+        else:
+            month = rng.choice(archive.read_manifest(meals_file)["months"])
+            old = archive.read_archived(meals_file, f"{month}-01", f"{month}-31")
+            row = old.iloc[rng.integers(len(old))].to_dict()
+            if rng.random() < 0.5:
+                archive.update_archived_meal(meals_file, row["Date"], row["EntryID"], dict(row, Calories=row["Calories"] + 10))
+            else:
+                archive.delete_archived_meal(meals_file, row["Date"], row["EntryID"])
+
+    problems = []
+    mirror = Mirror(meals_file)
+    start = time.perf_counter()
+    first_bytes = mirror.sync()
+    print(f"initial sync: {len(mirror.entries)} entries, {first_bytes / 1024:.0f} KiB, "
+          f"{(time.perf_counter() - start) * 1000:.0f} ms")
+
+    sync_ms, sync_bytes, reload_ms, reload_bytes = [], [], [], []
+    for _ in range(args.rounds):
+        for _ in range(args.mutations):
+            mutate()
+        start = time.perf_counter()
+        sync_bytes.append(mirror.sync())
+        sync_ms.append((time.perf_counter() - start) * 1000)
+        start = time.perf_counter()
+        truth = full_log(meals_file)
+        reload_ms.append((time.perf_counter() - start) * 1000)
+        reload_bytes.append(len(json.dumps(list(truth.values()))))
+        problem = differences(mirror.entries, truth)
+        if problem:
+            problems.append(f"after an incremental sync: {problem}")
+            break
+
+    print(f"\n{args.rounds} rounds of {args.mutations} changes, {len(truth)} entries in the log")
+    print(f"{'':<18} {'p50 ms':>8} {'p95 ms':>8} {'KiB/sync':>9}")
+    for name, ms, size in [("changes_since", sync_ms, sync_bytes), ("full reload", reload_ms, reload_bytes)]:
+        p50, p95 = np.percentile(ms, [50, 95])
+        print(f"{name:<18} {p50:>8.2f} {p95:>8.2f} {np.mean(size) / 1024:>9.1f}")
+    if mirror.resets != 1:
+        problems.append(f"the up-to-date mirror was reset {mirror.resets - 1} extra times")
+
+    # A mirror that falls behind past compaction
+    lagging = Mirror(meals_file)
+    lagging.sync()
+    behind = changes.COMPACT_EVENTS + 100
+    rows = [dict(templates[rng.integers(len(templates))], EntryID=new_entry_id(), Date=date.today().isoformat())
+            for _ in range(behind)]
+    for i in range(0, behind, 100):
+        append_meals(meals_file, rows[i:i + 100])
+    mirror.sync()
+    lagging.sync()
+    WRITE_QUEUE.flush()
+    feed = changes.load_feed(meals_file)
+    print(f"\nafter {behind} more adds: feed keeps seq {feed['base'] + 1}..{feed['seq']} "
+          f"({os.path.getsize(changes.changes_file(meals_file)) / 1024:.0f} KiB on disk); "
+          f"lagging mirror reset {lagging.resets - 1} time(s)")
+    truth = full_log(meals_file)
+    if lagging.resets != 2:
+        problems.append("a mirror behind the compacted feed wasn't reset")
+    for name, m in [("up-to-date", mirror), ("lagging", lagging)]:
+        problem = differences(m.entries, truth)
+        if problem:
+            problems.append(f"{name} mirror after compaction: {problem}")
+
+    # The log edited outside the app
+    df = pd.read_csv(meals_file, dtype={"EntryID": str})
+    df.iloc[1:].to_csv(meals_file, index=False)
+    resets = mirror.resets
+    mirror.sync()
+    if mirror.resets != resets + 1:
+        problems.append("an outside edit of the log didn't reset the mirror")
+    problem = differences(mirror.entries, full_log(meals_file))
+    if problem:
+        problems.append(f"mirror after an outside edit: {problem}")
+
+    print("\n" + ("all checks passed" if not problems else "FAILED:\n  " + "\n  ".join(problems)))
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+# benchmarks/chart_render.py
+"""
+Server cost of drawing the Visualization page's charts: matplotlib PNGs vs
+Vega-Lite specs.
+
+    python -m benchmarks.chart_render [--sessions 50] [--renders 1] [--scale quick]
+
+Generates a workspace and computes the page's inputs once (log, Max range,
+stats, the latest day), then runs `sessions` threads that each render every
+chart of the page `renders` times, as one rerun would:
+  - matplotlib: build the figure, savefig PNG (dpi 200, bbox tight, as st.pyplot does), close
+  - vega: build the spec, json.dumps it (what st.vega_lite_chart ships)
+Prints process CPU ms per page render, wall latency percentiles and payload
+size per mode. Then checks that the specs carry the same numbers the figures
+plot (daily calories, weekday means, per-meal-type macros).
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import date
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+from benchmarks.generate import BENCH_USER, SCALES, build_workspace
+
+
+def page_charts(viz_page, meals_file, username):
+    """(name, args) for every chart the page draws on its default view, range set to Max."""
+    from adherence import load_tracker
+    from meal_store import read_raw_meals
+    from nutrition_stats import get_stats
+
+    today = date.today()
+    df = viz_page.prepare_meals_df(read_raw_meals(meals_file))
+    day_df = df[df["Date"] == df["Date"].max()]
+    tracker = load_tracker(username)
+    goal = tracker.goal_for(day_df["Date"].iloc[0])
+    stats = get_stats(meals_file)
+    p, c, f, cal = (day_df[col].sum() for col in ["Protein", "Carbs", "Fat", "Calories"])
+    df_range = viz_page.add_archived_days(viz_page.filter_range(df, "Max", today), meals_file, "Max", today)
+    return [
+        ("calories_over_time", (df_range, "Max", tracker.goal_for)),
+        ("rolling_calories", (stats["daily"],)),
+        ("macro_ratio_trend", (stats["daily"],)),
+        ("weekday_calories", (stats["weekday"],)),
+        ("macro_pie", (p, c, f)),
+        ("calorie_pie", (cal, max(goal - cal, 0), goal)),
+        ("macros_by_meal_type", (day_df,)),
+        ("cumulative_macros", (day_df,)),
+        ("macro_proportions", (p, c, f)),
+    ]
+
+
+def render_matplotlib(viz_page, name, args):
+    import matplotlib.pyplot as plt
+
+    fig = viz_page.CHARTS[name][1](*args)
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", dpi=200, bbox_inches="tight")
+    plt.close(fig)
+    return len(buf.getvalue())
+
+
+def render_vega(viz_page, name, args):
+    return len(json.dumps(viz_page.CHARTS[name][0](*args)))
+
+
+def run_sessions(render, viz_page, charts, sessions, renders):
+    """Process CPU seconds, per-render wall latencies and bytes per page, with `sessions` threads."""
+    latencies, payload = [], []
+    lock = threading.Lock()
+    barrier = threading.Barrier(sessions)
+
+    def session():
+        barrier.wait()
+        for _ in range(renders):
+            start = time.perf_counter()
+            size = sum(render(viz_page, name, args) for name, args in charts)
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                payload.append(size)
+
+    threads = [threading.Thread(target=session) for _ in range(sessions)]
+    cpu = time.process_time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.process_time() - cpu, latencies, payload[0]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.chart_render")
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--renders", type=int, default=1, help="page renders per session")
+    parser.add_argument("--scale", choices=list(SCALES), default="quick")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir")
+    args = parser.parse_args(argv)
+
+    workdir = os.path.abspath(args.workdir) if args.workdir else tempfile.mkdtemp(prefix="nutrition-charts-")
+    print(f"Generating '{args.scale}' workspace in {workdir} ...")
+    build_workspace(workdir, args.scale, args.seed)
+    os.chdir(workdir)
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+    import matplotlib
+    import pandas as pd
+    from helpers import get_meals_file
+    from _pages import _3_Visualization as viz_page
+
+    meals_file = get_meals_file(BENCH_USER)
+    charts = page_charts(viz_page, meals_file, BENCH_USER)
+    matplotlib.rcParams["figure.max_open_warning"] = 0  # every session holds a figure open at once
+    total = args.sessions * args.renders
+
+    print(f"\n{args.sessions} sessions x {args.renders} renders of {len(charts)} charts")
+    print(f"{'renderer':<12} {'CPU ms/render':>14} {'wall p50 ms':>12} {'wall p95 ms':>12} {'KB/render':>10}")
+    results = {}
+    for mode, render in [("matplotlib", render_matplotlib), ("vega", render_vega)]:
+        render(viz_page, charts[0][0], charts[0][1])  # warm imports and font caches
+        cpu, latencies, size = run_sessions(render, viz_page, charts, args.sessions, args.renders)
+        results[mode] = cpu / total * 1000
+        p50, p95 = np.percentile(latencies, [50, 95]) * 1000
+        print(f"{mode:<12} {results[mode]:>14.1f} {p50:>12.0f} {p95:>12.0f} {size / 1024:>10.1f}")
+    print(f"\nVega-Lite specs use {results['matplotlib'] / results['vega']:.0f}x less server CPU per render")
+
+    # ---------------------------
+    # Checks: the specs plot the same aggregates as the figures
+    # ---------------------------
+    problems = []
+    specs = {name: viz_page.CHARTS[name][0](*chart_args) for name, chart_args in charts}
+    for name, spec in specs.items():
+        if spec is None:
+            problems.append(f"{name}: no spec for a day with data")
+    args_of = dict(charts)
+
+    values = pd.DataFrame(specs["calories_over_time"]["data"]["values"])
+    expected = args_of["calories_over_time"][0].groupby("Date")["Calories"].sum()
+    if len(values) != len(expected) or not np.allclose(values["Calories"], expected.to_numpy(float), atol=0.05):
+        problems.append("calories_over_time: daily totals differ from the log")
+
+    values = pd.DataFrame(specs["weekday_calories"]["data"]["values"]).set_index("Day")["Calories"]
+    expected = args_of["weekday_calories"][0]["Calories"].fillna(0)
+    if not np.allclose(values.loc[expected.index], expected.to_numpy(float), atol=0.05):
+        problems.append("weekday_calories: weekday means differ from stats")
+
+    values = pd.DataFrame(specs["macros_by_meal_type"]["data"]["values"]).set_index("MealType")
+    expected = args_of["macros_by_meal_type"][0].groupby("MealType")[["Protein", "Carbs", "Fat"]].sum()
+    if not np.allclose(values.loc[expected.index, expected.columns], expected.to_numpy(float), atol=0.05):
+        problems.append("macros_by_meal_type: per-meal-type macros differ from the day's log")
+
+    if len(specs["rolling_calories"]["data"]["values"]) != len(args_of["rolling_calories"][0]):
+        problems.append("rolling_calories: spec has a different number of days than stats")
+
+    print("\n" + ("all checks passed" if not problems else "FAILED:\n  " + "\n  ".join(problems)))
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,186 @@
+# benchmarks/crash_safety.py
+"""
+Crash-safety harness for the write-behind queue.
+
+    python -m benchmarks.crash_safety [--trials 20]
+
+Each trial starts a child process that logs meals as fast as it can (meals
+CSV + adherence state + food index, staged together under the log's file
+lock, flushed continuously), SIGKILLs it at a random moment and then checks that:
+  - the meals CSV parses, has every column and no torn rows
+  - the adherence state and food index load and agree with a full rebuild
+A final trial exits the child cleanly without flushing and checks the
+atexit flush made every staged meal durable.
+"""
+import argparse
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.generate import BENCH_USER, build_workspace
+
+
+# ---------------------------
+# Child: mutate until killed
+# ---------------------------
+def run_child(workdir, count):
+    os.chdir(workdir)
+    import write_queue
+    write_queue.WRITE_QUEUE.flush_delay = 0.01
+
+    from adherence import load_tracker
+    from catalog import load_catalog
+    from food_index import load_food_index
+    from helpers import get_meals_file
+    from meal_store import read_meals_file, append_meal, locked_log, new_entry_id
+
+    meals_file = get_meals_file(BENCH_USER)
+    catalog = load_catalog()
+    tracker = load_tracker(BENCH_USER)
+    index = load_food_index(BENCH_USER)
+    row = read_meals_file(meals_file, catalog).iloc[-1].to_dict()
+
+    print("ready", flush=True)
+    i = 0
+    while count is None or i < count:
+        with locked_log(meals_file):
+            append_meal(meals_file, dict(row, EntryID=new_entry_id()), catalog)
+            tracker.add_calories(row["Date"], row["Calories"])
+            tracker.save()
+            index.record(row)
+            index.save()
+        i += 1
+    print(f"staged {i}", flush=True)
+    # Clean exit without an explicit flush: atexit must make it durable
+
+
+# ---------------------------
+# Parent: kill and verify
+# ---------------------------
+def check_workspace(workdir):
+    """Returns a list of problems found in the workspace's files (empty if consistent)."""
+    import pandas as pd
+
+    from adherence import AdherenceTracker, load_goal_history, load_tracker
+    from food_index import FoodFrequencyIndex, load_food_index
+    from helpers import get_meals_file
+    from meal_store import MEAL_COLS
+
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    problems = []
+    try:
+        meals_file = get_meals_file(BENCH_USER)
+        try:
+            df = pd.read_csv(meals_file)
+        except Exception as e:
+            return [f"meals CSV unreadable: {e!r}"], 0
+
+        missing = [c for c in MEAL_COLS if c not in df.columns]
+        if missing:
+            problems.append(f"meals CSV missing columns {missing}")
+        torn = df[["EntryID", "DateTime", "Date", "Meal", "Calories", "Unit"]].isna().any(axis=1)
+        if torn.any():
+            problems.append(f"{int(torn.sum())} incomplete rows in meals CSV")
+
+        tracker = load_tracker(BENCH_USER)
+        fresh = AdherenceTracker(BENCH_USER)
+        fresh._set_goal_history(load_goal_history(BENCH_USER))
+        fresh.rebuild()
+        if tracker.daily.keys() != fresh.daily.keys() or any(
+                abs(tracker.daily[d] - fresh.daily[d]) > 1e-6 for d in fresh.daily):
+            problems.append("adherence state disagrees with the meals log")
+
+        index = load_food_index(BENCH_USER)
+        rebuilt = FoodFrequencyIndex(BENCH_USER)
+        rebuilt.rebuild()
+        counts = {k: s["count"] for k, s in index.foods.items()}
+        if counts != {k: s["count"] for k, s in rebuilt.foods.items()}:
+            problems.append("food index disagrees with the meals log")
+
+        return problems, len(df)
+    finally:
+        os.chdir(cwd)
+
+
+def spawn_child(workdir, count=None):
+    args = [sys.executable, "-m", "benchmarks.crash_safety", "--child", workdir]
+    if count is not None:
+        args += ["--count", str(count)]
+    proc = subprocess.Popen(args, cwd=REPO_ROOT, stdout=subprocess.PIPE, text=True)
+    assert proc.stdout.readline().strip() == "ready"
+    return proc
+
+
+def leftover_temp_files(workdir):
+    data_dir = os.path.join(workdir, "data")
+    return [f for f in os.listdir(data_dir) if f.endswith(".tmp")]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.crash_safety")
+    parser.add_argument("--trials", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--count", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        run_child(args.child, args.count)
+        return 0
+
+    # The checks below may rebuild state; write it straight through, not behind
+    import write_queue
+    write_queue.WRITE_QUEUE.enabled = False
+
+    rng = random.Random(args.seed)
+    workdir = os.path.abspath(args.workdir) if args.workdir else tempfile.mkdtemp(prefix="nutrition-crash-")
+    print(f"Generating workspace in {workdir} ...")
+    build_workspace(workdir, "quick", args.seed)
+
+    failures = 0
+    mid_write = 0
+    for trial in range(args.trials):
+        proc = spawn_child(workdir)
+        time.sleep(rng.uniform(0.05, 1.0))
+        proc.send_signal(signal.SIGKILL)
+        proc.wait()
+
+        # A leftover temp file means the kill landed inside a write
+        temps = leftover_temp_files(workdir)
+        mid_write += bool(temps)
+        for name in temps:
+            os.remove(os.path.join(workdir, "data", name))
+
+        problems, rows = check_workspace(workdir)
+        status = "ok" if not problems else "CORRUPT: " + "; ".join(problems)
+        print(f"trial {trial + 1:3d}: killed {'mid-write' if temps else 'between writes'}, "
+              f"{rows} rows, {status}")
+        failures += bool(problems)
+
+    # Clean shutdown: staged-but-unflushed meals must survive interpreter exit
+    _, before = check_workspace(workdir)
+    proc = spawn_child(workdir, count=25)
+    proc.wait()
+    problems, after = check_workspace(workdir)
+    if after != before + 25:
+        problems.append(f"expected {before + 25} rows after clean exit, found {after}")
+    print(f"clean exit: {after - before} of 25 staged meals persisted, "
+          f"{'ok' if not problems else 'FAILED: ' + '; '.join(problems)}")
+    failures += bool(problems)
+
+    print(f"\n{args.trials} kills ({mid_write} mid-write), {failures} failure(s)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
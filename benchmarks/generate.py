@@ -0,0 +1,182 @@
+# benchmarks/generate.py
+"""
+Deterministic synthetic data for benchmarks: users.json, multi-year meal
+logs, goal files and scaled-up USDA / healthy-meal catalogs.
+
+Everything is derived from a numpy Generator seeded per artifact, so the same
+scale + seed always produces byte-identical files.
+"""
+import json
+import os
+import shutil
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from catalog import build_catalog
+from helpers import get_meals_file, get_goal_file, get_goal_history_file
+from meal_store import MEAL_COLS
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCALES = {
+    # users in users.json, users with a log, years of log per user, USDA copies
+    "quick": {"users": 1_000, "log_users": 1, "years": 1, "usda_scale": 1, "healthy_scale": 1},
+    "full": {"users": 100_000, "log_users": 3, "years": 10, "usda_scale": 4, "healthy_scale": 20},
+}
+
+BENCH_USER = "bench0"
+MEAL_TYPES = ["Breakfast", "Lunch", "Dinner", "Snack"]
+MEAL_HOURS = {"Breakfast": 8, "Lunch": 13, "Dinner": 19, "Snack": 16}
+
+
+def generate_users(n, seed=0):
+    rng = np.random.default_rng(seed)
+    passwords = rng.integers(100_000, 999_999, size=n)
+    users = [{"username": "demo", "password": "demo123"}]
+    users += [{"username": f"bench{i}", "password": str(p)} for i, p in enumerate(passwords)]
+    return users
+
+
+def generate_usda(base_file, scale, seed=0):
+    """The real USDA.csv plus `scale - 1` jittered copies with fresh IDs."""
+    base = pd.read_csv(base_file)
+    if scale <= 1:
+        return base
+
+    rng = np.random.default_rng(seed)
+    copies = [base]
+    for k in range(1, scale):
+        copy = base.copy()
+        copy["ID"] = copy["ID"] + 100_000 * k
+        copy["Description"] = copy["Description"] + f",VARIANT {k}"
+        for col in ["Calories", "Protein", "Fat", "Carbohydrate"]:
+            jitter = rng.uniform(0.95, 1.05, size=len(copy))
+            copy[col] = (pd.to_numeric(copy[col], errors="coerce") * jitter).round(2)
+        copies.append(copy)
+    return pd.concat(copies, ignore_index=True)
+
+
+def add_extra_nutrients(usda, n, seed=0):
+    """USDA rows plus `n` synthetic nutrient columns (a few missing values each, like real micronutrient data)."""
+    rng = np.random.default_rng(seed)
+    extra = pd.DataFrame(
+        rng.gamma(1.5, 20.0, size=(len(usda), n)).round(2),
+        columns=[f"Nutrient{i:02d}" for i in range(n)], index=usda.index,
+    )
+    extra = extra.mask(rng.random(extra.shape) < 0.05)
+    return pd.concat([usda, extra], axis=1)
+
+
+def generate_healthy(base_file, scale):
+    base = pd.read_csv(base_file).dropna(subset=["Meal", "Category"])
+    if scale <= 1:
+        return base
+    copies = [base] + [base.assign(Meal=base["Meal"] + f" #{k}") for k in range(1, scale)]
+    return pd.concat(copies, ignore_index=True)
+
+
+def generate_meals_log(catalog, years, seed=0, end=None, meals_per_day=(3, 5)):
+    """
+    A multi-year log in the app's meals CSV format. Each user favors a small
+    set of foods (Zipf-like), as real logs do, and logs 3–5 meals a day.
+    """
+    rng = np.random.default_rng(seed)
+    end = end or date.today()
+    n_days = int(365 * years)
+    start = end - timedelta(days=n_days - 1)
+
+    per_day = rng.integers(meals_per_day[0], meals_per_day[1] + 1, size=n_days)
+    day_offsets = np.repeat(np.arange(n_days), per_day)
+    n = len(day_offsets)
+
+    # Favorite foods: 60 IDs weighted 1/rank, plus occasional random catalog foods
+    food_ids = np.array(list(catalog.id_rows))
+    favorites = rng.choice(food_ids, size=min(60, len(food_ids)), replace=False)
+    weights = 1.0 / np.arange(1, len(favorites) + 1)
+    picks = rng.choice(favorites, size=n, p=weights / weights.sum())
+    random_pick = rng.random(n) < 0.1
+    picks[random_pick] = rng.choice(food_ids, size=random_pick.sum())
+
+    slot = np.concatenate([np.arange(k) for k in per_day])
+    meal_type = np.array(MEAL_TYPES)[np.minimum(slot, 3)]
+    hours = np.vectorize(MEAL_HOURS.get)(meal_type)
+    minutes = rng.integers(0, 60, size=n)
+
+    quantity = rng.choice([0.5, 1.0, 1.0, 1.5, 2.0], size=n)
+    grams = quantity * 100.0
+    rows = np.array([catalog.id_rows[i] for i in picks])
+    values = np.round(catalog.per_gram[rows, :4] * grams[:, None], 4)
+
+    days = pd.to_datetime(start) + pd.to_timedelta(day_offsets, unit="D")
+    stamps = days + pd.to_timedelta(hours, unit="h") + pd.to_timedelta(minutes, unit="m")
+
+    df = pd.DataFrame({
+        "EntryID": [f"{x:032x}" for x in rng.integers(0, 2**63, size=n)],
+        "DateTime": stamps.strftime("%Y-%m-%d %H:%M:%S.%f"),
+        "Date": days.strftime("%Y-%m-%d"),
+        "MealType": meal_type,
+        "Meal": [catalog.by_id[i].DisplayMeal for i in picks],
+        "Servings": quantity,
+        "Calories": values[:, 0],
+        "Protein": values[:, 1],
+        "Carbs": values[:, 2],
+        "Fat": values[:, 3],
+        "FoodID": picks,
+        "Quantity": quantity,
+        "Unit": "100 g",
+        "Grams": grams,
+    })
+    return df[MEAL_COLS]
+
+
+def write_goal_history(username, years, seed=0, end=None):
+    """Goal file plus a goal change roughly every six months."""
+    rng = np.random.default_rng(seed)
+    end = end or date.today()
+    changes = max(1, int(years * 2))
+    start = end - timedelta(days=int(365 * years))
+    days = sorted(start + timedelta(days=int(d)) for d in rng.integers(0, int(365 * years), changes))
+    goals = rng.choice(np.arange(1600, 2800, 50), size=changes)
+
+    pd.DataFrame({
+        "DateTime": [datetime.combine(d, datetime.min.time()).strftime("%Y-%m-%d %H:%M:%S.%f") for d in days],
+        "Date": [d.strftime("%Y-%m-%d") for d in days],
+        "Goal": goals,
+    }).to_csv(get_goal_history_file(username), index=False)
+
+    with open(get_goal_file(username), "w") as f:
+        f.write(str(int(goals[-1])))
+
+
+def build_workspace(workdir, scale="quick", seed=0):
+    """
+    Creates a self-contained app directory (data/, USDA.csv, healthy_meals.csv,
+    portions.csv) under `workdir`. Must be called with the app's relative paths
+    resolving inside `workdir`, i.e. after os.chdir(workdir).
+    """
+    params = SCALES[scale]
+    os.makedirs(os.path.join(workdir, "data"), exist_ok=True)
+
+    with open(os.path.join(workdir, "data", "users.json"), "w") as f:
+        json.dump(generate_users(params["users"], seed), f)
+
+    generate_usda(os.path.join(REPO_ROOT, "USDA.csv"), params["usda_scale"], seed).to_csv(
+        os.path.join(workdir, "USDA.csv"), index=False)
+    generate_healthy(os.path.join(REPO_ROOT, "healthy_meals.csv"), params["healthy_scale"]).to_csv(
+        os.path.join(workdir, "healthy_meals.csv"), index=False)
+    shutil.copy(os.path.join(REPO_ROOT, "portions.csv"), os.path.join(workdir, "portions.csv"))
+
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        catalog = build_catalog("USDA.csv")
+        for i in range(params["log_users"]):
+            username = f"bench{i}"
+            generate_meals_log(catalog, params["years"], seed + i).to_csv(get_meals_file(username), index=False)
+            write_goal_history(username, params["years"], seed + i)
+    finally:
+        os.chdir(cwd)
+
+    return params
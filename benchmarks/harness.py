@@ -0,0 +1,113 @@
+# benchmarks/harness.py
+"""
+Minimal timing harness: registered benchmarks run `repeat` times after one
+warm-up call, results are stored as JSON and compared against a baseline.
+"""
+import json
+import platform
+import statistics
+import subprocess
+import time
+from datetime import datetime
+
+BENCHMARKS = []
+
+
+def benchmark(name, repeat=None, setup=None):
+    """
+    Registers `fn(ctx)` as a benchmark. `setup(ctx)` runs untimed before every
+    call (e.g. to restore a file a mutation benchmark rewrote).
+    """
+    def register(fn):
+        BENCHMARKS.append({"name": name, "fn": fn, "repeat": repeat, "setup": setup})
+        return fn
+    return register
+
+
+def time_call(fn, ctx, repeat, setup=None):
+    if setup:
+        setup(ctx)
+    fn(ctx)  # warm-up
+
+    samples = []
+    for _ in range(repeat):
+        if setup:
+            setup(ctx)
+        start = time.perf_counter()
+        fn(ctx)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def summarize(name, samples):
+    return {
+        "name": name,
+        "repeat": len(samples),
+        "min": min(samples),
+        "median": statistics.median(samples),
+        "mean": statistics.fmean(samples),
+        "max": max(samples),
+    }
+
+
+def run_benchmarks(ctx, repeat=5, name_filter=None, log=print):
+    results = []
+    for bench in BENCHMARKS:
+        if name_filter and name_filter not in bench["name"]:
+            continue
+        samples = time_call(bench["fn"], ctx, bench["repeat"] or repeat, bench["setup"])
+        result = summarize(bench["name"], samples)
+        results.append(result)
+        log(f"{result['name']:<45} median {result['median'] * 1000:10.2f} ms"
+            f"   min {result['min'] * 1000:10.2f} ms")
+    return results
+
+
+def run_metadata(scale, root):
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=root, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "scale": scale,
+    }
+
+
+def save_results(path, meta, results):
+    with open(path, "w") as f:
+        json.dump({"meta": meta, "results": results}, f, indent=2)
+
+
+def compare_results(baseline_path, results, threshold=1.10, scale=None, log=print):
+    """
+    Prints current / baseline median ratios. Returns the names of benchmarks
+    slower than `threshold` × baseline.
+    """
+    with open(baseline_path, "r") as f:
+        saved = json.load(f)
+    baseline = {r["name"]: r for r in saved["results"]}
+
+    if scale and saved["meta"].get("scale") != scale:
+        log(f"warning: baseline was run at scale '{saved['meta'].get('scale')}', this run is '{scale}'")
+
+    regressions = []
+    log(f"\n{'benchmark':<45} {'baseline':>12} {'current':>12} {'ratio':>8}")
+    for result in results:
+        old = baseline.get(result["name"])
+        if old is None:
+            log(f"{result['name']:<45} {'-':>12} {result['median'] * 1000:10.2f}ms {'new':>8}")
+            continue
+        ratio = result["median"] / old["median"] if old["median"] else float("inf")
+        flag = "  SLOWER" if ratio > threshold else ""
+        log(f"{result['name']:<45} {old['median'] * 1000:10.2f}ms {result['median'] * 1000:10.2f}ms "
+            f"{ratio:7.2f}x{flag}")
+        if ratio > threshold:
+            regressions.append(result["name"])
+    return regressions
@@ -0,0 +1,151 @@
+# benchmarks/insights_batch.py
+"""
+End-to-end run of the nightly insights job against the local mock LLM.
+
+    python -m benchmarks.insights_batch [--users 300] [--concurrency 8] [--rate 20]
+                                        [--latency 0.2] [--fail-rate 0.1]
+
+Generates a workspace with `users` short (3 week) meal logs, starts
+benchmarks/mock_llm.py in-process and runs `python insights.py` three times:
+killed (SIGKILL) once a third of the users are done, then to completion, then once more.
+Checks that:
+  - the vectorized weekly stats match a per-user pandas computation
+  - the mock never saw more than `concurrency` requests in flight, nor more
+    than `rate` (+1 burst) started in any one second
+  - injected 429/500s were retried, so every user ends up with an insight
+  - the second run only requested the users the killed run hadn't finished,
+    and the third run requested nothing
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from benchmarks import mock_llm
+from benchmarks.generate import build_workspace, generate_meals_log, write_goal_history
+
+
+def run_job(server, args, as_of, kill_when=None):
+    command = [sys.executable, os.path.join(REPO_ROOT, "insights.py"),
+               "--as-of", as_of.isoformat(), "--concurrency", str(args.concurrency),
+               "--rate", str(args.rate), "--base-url", f"http://127.0.0.1:{server.server_port}/v1"]
+    env = dict(os.environ, OPENAI_API_KEY="mock")
+    time.sleep(args.latency * 2)  # let requests of a killed run drain first
+    server.reset_stats()
+    start = time.perf_counter()
+    proc = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    if kill_when is not None:
+        while proc.poll() is None and not kill_when():
+            time.sleep(0.05)
+        proc.send_signal(signal.SIGKILL)
+    code = proc.wait()
+    return code, time.perf_counter() - start, server.stats()
+
+
+def reference_stats(username, as_of):
+    """The week's numbers for one user, the slow obvious way."""
+    import pandas as pd
+    from helpers import get_meals_file
+
+    df = pd.read_csv(get_meals_file(username))
+    start = (as_of - timedelta(days=6)).isoformat()
+    daily = df[(df["Date"] >= start) & (df["Date"] <= as_of.isoformat())].groupby("Date")[
+        ["Calories", "Protein"]].sum()
+    return {
+        "days_logged": len(daily),
+        "avg_calories": round(float(daily["Calories"].mean()), 1),
+        "low_protein_days": int((daily["Protein"] * 4 / daily["Calories"] < 0.15).sum()),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.insights_batch")
+    parser.add_argument("--users", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=20.0)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--fail-rate", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir")
+    args = parser.parse_args(argv)
+
+    workdir = os.path.abspath(args.workdir) if args.workdir else tempfile.mkdtemp(prefix="nutrition-insights-")
+    print(f"Generating {args.users} three-week logs in {workdir} ...")
+    build_workspace(workdir, "quick", args.seed)
+    os.chdir(workdir)
+
+    from catalog import build_catalog
+    from helpers import get_insights_file, get_meals_file
+    import insights
+
+    catalog = build_catalog("USDA.csv")
+    as_of = date.today() - timedelta(days=1)
+    usernames = [f"bench{i}" for i in range(args.users)]
+    for i, username in enumerate(usernames[1:], start=1):
+        # Short logs that end on different days, so some users skip part of the week
+        end = as_of - timedelta(days=i % 5)
+        generate_meals_log(catalog, 21 / 365, args.seed + i, end=end).to_csv(get_meals_file(username), index=False)
+        write_goal_history(username, 0.5, args.seed + i, end=end)
+
+    problems = []
+    start = time.perf_counter()
+    stats = insights.weekly_stats(usernames, as_of)
+    print(f"weekly stats for {len(usernames)} users: {(time.perf_counter() - start) * 1000:.0f} ms")
+    for username in usernames[:20]:
+        record = insights._stats_record(stats.loc[username])
+        expected = reference_stats(username, as_of)
+        if any(record[key] != value for key, value in expected.items()):
+            problems.append(f"stats for {username}: {record} != {expected}")
+
+    server = mock_llm.start(latency=args.latency, fail_rate=args.fail_rate, seed=args.seed)
+
+    def done():
+        return sum(
+            (insights.load_insight(u) or {}).get("as_of") == as_of.isoformat() for u in usernames
+        )
+
+    print(f"\n{'run':<12} {'exit':>5} {'seconds':>8} {'requests':>9} {'failed':>7} "
+          f"{'in flight':>10} {'max/s':>6} {'done':>6}")
+    runs = [("killed", lambda: done() >= args.users // 3), ("resumed", None), ("rerun", None)]
+    results = {}
+    for name, kill_when in runs:
+        code, seconds, calls = run_job(server, args, as_of, kill_when)
+        results[name] = (code, calls, done())
+        print(f"{name:<12} {code:>5} {seconds:>8.1f} {calls['requests']:>9} {calls['failures']:>7} "
+              f"{calls['max_in_flight']:>10} {calls['max_per_second']:>6} {results[name][2]:>6}")
+
+        if calls["max_in_flight"] > args.concurrency:
+            problems.append(f"{name}: {calls['max_in_flight']} requests in flight (cap {args.concurrency})")
+        if args.rate and calls["max_per_second"] > args.rate + 1:
+            problems.append(f"{name}: {calls['max_per_second']} requests in one second (rate {args.rate})")
+
+    killed_done = results["killed"][2]
+    if not 0 < killed_done < args.users:
+        problems.append(f"killed run finished {killed_done} users; expected part of the batch")
+    code, calls, finished = results["resumed"]
+    if code != 0 or finished != args.users:
+        problems.append(f"resumed run: exit {code}, {finished} of {args.users} users have an insight")
+    if calls["requests"] - calls["failures"] != args.users - killed_done:
+        problems.append(f"resumed run answered {calls['requests'] - calls['failures']} requests; "
+                        f"{args.users - killed_done} users were left")
+    if results["rerun"][1]["requests"]:
+        problems.append(f"rerun sent {results['rerun'][1]['requests']} requests; everything was current")
+
+    with open(get_insights_file(usernames[0])) as f:
+        print(f"\nbench0: {json.load(f)['text']}")
+    server.shutdown()
+    print("\n" + ("all checks passed" if not problems else "FAILED:\n  " + "\n  ".join(problems)))
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,305 @@
+# benchmarks/load_test.py
+"""
+How many concurrent users one Streamlit worker carries.
+
+    python -m benchmarks.load_test [--users 20] [--rounds 3] [--think 0] [--scale quick] [--verbose]
+
+Generates a workspace with a year of log for each simulated user, starts
+benchmarks/mock_llm.py in-process (the AI page's OpenAI client is pointed
+at it through OPENAI_BASE_URL) and drives main.py headlessly with
+streamlit.testing.v1.AppTest: one session per user, all in this process
+(like one worker), each on its own thread. Every session logs in through
+the login form, then for `rounds` rounds searches a food and adds it,
+opens Visualization and switches its range, asks the AI assistant a
+question and goes back Home. Prints p50/p95/p99 latency per step (the
+time until the page is drawn again) and overall, throughput and how much
+resident memory grew. Then checks that:
+  - no rerun raised
+  - every added meal is in its user's log once the write-behind queue is flushed
+  - the LLM stub got one request per question asked
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from collections import defaultdict
+from unittest.mock import MagicMock
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from benchmarks import mock_llm
+from benchmarks.generate import SCALES, build_workspace, generate_meals_log, write_goal_history
+from benchmarks.workers import memory_kb
+
+QUERIES = ["rice", "chick", "milk", "apple", "bread", "egg", "cheese", "beef"]
+QUESTIONS = ["What should I eat for dinner?", "Is my protein intake ok?", "Ideas for a high fiber snack?"]
+
+
+def session_app_test():
+    """
+    AppTest whose runs may overlap. AppTest.run() installs a fresh global
+    mock Runtime per run and clears it when done, which breaks any other
+    session still running; here one mock Runtime is installed for all of
+    them and each run only drives its own script runner. Runs also return
+    as soon as the script finishes (AppTest polls every 100 ms), so
+    latencies are not rounded up.
+
+    A script that calls st.rerun() is stopped there and flagged
+    (rerun_requested): the runner would replay the same widget triggers,
+    i.e. click "Add Meal" again, forever. Session.step() reruns it afresh,
+    as the browser would.
+    """
+    from streamlit import config
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+    from streamlit.runtime.scriptrunner import RerunData, ScriptRunnerEvent
+    from streamlit.testing.v1 import AppTest
+    from streamlit.testing.v1.element_tree import parse_tree_from_messages
+    from streamlit.testing.v1.local_script_runner import LocalScriptRunner
+
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime._instance = runtime
+    config.set_option("runner.postScriptGC", False)
+    finished = (ScriptRunnerEvent.SCRIPT_STOPPED_WITH_SUCCESS, ScriptRunnerEvent.SCRIPT_STOPPED_WITH_COMPILE_ERROR)
+
+    class SessionAppTest(AppTest):
+        rerun_requested = False
+        runs = 0
+
+        def _run(self, widget_state=None, timeout=None):
+            self.runs += 1
+            runner = LocalScriptRunner(self._script_path, self.session_state)
+            done = threading.Event()
+            self.rerun_requested = False
+
+            def on_event(sender, event, **kwargs):
+                # Called on the script thread, before it would start the rerun
+                if event == ScriptRunnerEvent.SCRIPT_STOPPED_FOR_RERUN:
+                    self.rerun_requested = True
+                    runner.request_stop()
+                    done.set()
+                elif event in finished:
+                    done.set()
+
+            runner.on_event.connect(on_event, weak=False)
+            runner.request_rerun(RerunData(widget_states=widget_state))
+            runner.start()
+            if not done.wait(timeout or self.default_timeout):
+                runner.request_stop()
+                runner.join()
+                raise RuntimeError(f"script run timed out after {timeout or self.default_timeout}s")
+            runner.join()
+            self._tree = parse_tree_from_messages(runner.forward_msgs())
+            self._tree._runner = self
+            return self
+
+    return SessionAppTest
+
+
+class Session:
+    """One simulated user: an AppTest driving main.py, timing every rerun."""
+
+    def __init__(self, app_test, username, password, timeout, verbose=False):
+        # Not AppTest.from_file(), which always builds a plain AppTest
+        self.at = app_test(os.path.join(REPO_ROOT, "main.py"), default_timeout=timeout)
+        self.username = username
+        self.password = password
+        self.verbose = verbose
+        self.timings = defaultdict(list)
+        self.errors = []
+        self.added = 0
+        self.asked = 0
+
+    def step(self, name, action):
+        """One user action, timed until the page is drawn again (including a rerun it asked for)."""
+        start = time.perf_counter()
+        action()
+        while self.at.rerun_requested:
+            self.at.run()
+        self.timings[name].append(time.perf_counter() - start)
+        for e in self.at.exception:
+            self.errors.append(f"{self.username} {name}: {e.value}")
+            if self.verbose:
+                print("\n".join(e.stack_trace), flush=True)
+
+    def navigate(self, page):
+        """
+        Picks a page in the sidebar. The radio's widget ID changes with its
+        index (the current page), so a click sometimes only re-renders the
+        page it was on; like a user, click again.
+        """
+        at = self.at
+        for _ in range(3):
+            at.sidebar.radio[0].set_value(page).run()
+            if at.sidebar.radio[0].value == page:
+                return
+        raise RuntimeError(f"could not navigate to {page}")
+
+    def button(self, label):
+        return next(b for b in self.at.button if b.label == label)
+
+    def login(self):
+        at = self.at
+        self.step("welcome", lambda: at.run())
+        at.text_input(key="login_user").input(self.username)
+        at.text_input(key="login_pass").input(self.password)
+        self.step("login", lambda: self.button("Login").click().run())
+        self.step("home", lambda: at.run())
+
+    def round(self, i, think):
+        at = self.at
+        self.step("food logging", lambda: self.navigate("Food Logging"))
+        self.step("search", lambda: at.text_input[0].input(QUERIES[i % len(QUERIES)]).run())
+        if at.selectbox and at.selectbox[0].value:
+            self.step("add meal", lambda: self.button("➕ Add Meal").click().run())
+            self.added += 1
+        time.sleep(think)
+        self.step("visualization", lambda: self.navigate("Visualization"))
+        self.step("viz range", lambda: at.selectbox(key="viz_range").set_value("Month").run())
+        time.sleep(think)
+        self.step("ai suggestions", lambda: self.navigate("AI Suggestions"))
+        self.step("ask ai", lambda: at.chat_input[0].set_value(QUESTIONS[i % len(QUESTIONS)]).run())
+        self.asked += 1
+        time.sleep(think)
+        self.step("home", lambda: self.navigate("Home"))
+
+    def run(self, rounds, think, barrier):
+        try:
+            barrier.wait()
+            self.login()
+            for i in range(rounds):
+                self.round(i, think)
+        except Exception as e:  # a missing widget means the page didn't render as expected
+            self.errors.append(f"{self.username}: {type(e).__name__}: {e}")
+            if self.verbose:
+                traceback.print_exc()
+
+
+def percentiles(seconds):
+    return np.percentile(np.asarray(seconds) * 1000, [50, 95, 99])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.load_test")
+    parser.add_argument("--users", type=int, default=20, help="concurrent sessions")
+    parser.add_argument("--rounds", type=int, default=3, help="search/add/visualize/ask rounds per session")
+    parser.add_argument("--think", type=float, default=0.0, help="seconds between steps")
+    parser.add_argument("--years", type=float, default=1.0, help="years of log per user")
+    parser.add_argument("--latency", type=float, default=0.5, help="LLM stub latency (s)")
+    parser.add_argument("--timeout", type=float, default=600.0, help="per-rerun timeout (s)")
+    parser.add_argument("--scale", choices=list(SCALES), default="quick")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir")
+    parser.add_argument("--verbose", action="store_true", help="print stack traces of failed reruns")
+    args = parser.parse_args(argv)
+
+    workdir = os.path.abspath(args.workdir) if args.workdir else tempfile.mkdtemp(prefix="nutrition-load-")
+    print(f"Generating '{args.scale}' workspace with {args.users} users in {workdir} ...")
+    build_workspace(workdir, args.scale, args.seed)
+    os.chdir(workdir)
+
+    server = mock_llm.start(latency=args.latency, seed=args.seed)
+    # Read when the AI page builds its client at import, i.e. on the first session's first visit
+    os.environ["OPENAI_API_KEY"] = "mock"
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_port}/v1"
+
+    import archive
+    from catalog import build_catalog
+    from helpers import get_meals_file, load_users
+    from meal_store import read_meals_file
+    from write_queue import WRITE_QUEUE
+
+    catalog = build_catalog()
+    users = load_users()[1:args.users + 1]
+    for i, user in enumerate(users[1:], start=1):
+        generate_meals_log(catalog, args.years, args.seed + i).to_csv(get_meals_file(user["username"]), index=False)
+        write_goal_history(user["username"], args.years, args.seed + i)
+
+    def entries(username):
+        """Entries in the user's log, hot and archived (logging in compacts it)."""
+        meals_file = get_meals_file(username)
+        return len(read_meals_file(meals_file, catalog)) + len(archive.read_archived(meals_file))
+
+    logged = {u["username"]: entries(u["username"]) for u in users}
+
+    # AppTest runs each script on its own thread, nested deeper than the defaults allow for this app
+    threading.stack_size(256 * 1024 * 1024)
+    sys.setrecursionlimit(20_000)
+    app_test = session_app_test()
+    sessions = [Session(app_test, u["username"], u["password"], args.timeout, args.verbose)
+                for u in users]
+    barrier = threading.Barrier(len(sessions))
+    threads = [threading.Thread(target=s.run, args=(args.rounds, args.think, barrier)) for s in sessions]
+
+    rss = [memory_kb()["Rss"]]
+    running = threading.Event()
+    running.set()
+
+    def sample_memory():
+        while running.is_set():
+            rss.append(memory_kb()["Rss"])
+            time.sleep(0.5)
+
+    sampler = threading.Thread(target=sample_memory, daemon=True)
+    start = time.perf_counter()
+    sampler.start()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    seconds = time.perf_counter() - start
+    running.clear()
+    sampler.join()
+    WRITE_QUEUE.flush()
+    rss_before, rss_peak, rss_after = rss[0], max(rss), memory_kb()["Rss"]
+
+    # ---------------------------
+    # Report
+    # ---------------------------
+    steps = defaultdict(list)
+    for s in sessions:
+        for name, timings in s.timings.items():
+            steps[name] += timings
+    actions = [t for timings in steps.values() for t in timings]
+    runs = sum(s.at.runs for s in sessions)
+
+    print(f"\n{len(sessions)} sessions x {args.rounds} rounds: {len(actions)} actions, "
+          f"{runs} script runs in {seconds:.1f} s")
+    print(f"{'step':<16} {'actions':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, timings in list(steps.items()) + [("all", actions)]:
+        p50, p95, p99 = percentiles(timings)
+        print(f"{name:<16} {len(timings):>8} {p50:>9.0f} {p95:>9.0f} {p99:>9.0f}")
+    print(f"\nthroughput {len(actions) / seconds:.1f} actions/s ({runs / seconds:.1f} script runs/s)")
+    print(f"resident memory {rss_before / 1024:.0f} MB -> peak {rss_peak / 1024:.0f} MB, "
+          f"{rss_after / 1024:.0f} MB after ({(rss_after - rss_before) / 1024 / len(sessions):.1f} MB per session)")
+
+    # ---------------------------
+    # Checks
+    # ---------------------------
+    problems = [e for s in sessions for e in s.errors][:20]
+    for s in sessions:
+        count = entries(s.username)
+        if count != logged[s.username] + s.added:
+            problems.append(f"{s.username}: {count} entries after adding {s.added} to {logged[s.username]}")
+    asked = sum(s.asked for s in sessions)
+    if server.stats()["requests"] != asked:
+        problems.append(f"LLM stub got {server.stats()['requests']} requests for {asked} questions")
+    server.shutdown()
+
+    print("\n" + ("all checks passed" if not problems else "FAILED:\n  " + "\n  ".join(problems)))
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+# benchmarks/mock_llm.py
+"""
+Local stand-in for the OpenAI chat completions endpoint, for running the
+insights job (or the AI page) without an API key.
+
+    python -m benchmarks.mock_llm [--port 8700] [--latency 0.2] [--fail-rate 0.1]
+
+POST /v1/chat/completions answers in the OpenAI response shape after
+`latency` seconds (±50%); a `fail-rate` share of requests get a 429 (with
+Retry-After) or a 500 instead. GET /stats reports how many requests came in,
+how many failed, the most that were in flight at once and the busiest
+one-second window, so callers can check their concurrency and rate limits.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.2, fail_rate=0.0, seed=0):
+        super().__init__(address, MockHandler)
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self.lock:
+            self.requests = 0
+            self.failures = 0
+            self.in_flight = 0
+            self.max_in_flight = 0
+            self.started = []
+
+    def stats(self):
+        with self.lock:
+            started = sorted(self.started)
+            busiest, lo = 0, 0
+            for hi, t in enumerate(started):
+                while t - started[lo] >= 1.0:
+                    lo += 1
+                busiest = max(busiest, hi - lo + 1)
+            return {"requests": self.requests, "failures": self.failures,
+                    "max_in_flight": self.max_in_flight, "max_per_second": busiest}
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def send_json(self, status, payload, headers=()):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client gave up (or was killed) while we were "thinking"
+
+    def do_GET(self):
+        if self.path == "/stats":
+            self.send_json(200, self.server.stats())
+        else:
+            self.send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if not self.path.endswith("/chat/completions"):
+            self.send_json(404, {"error": {"message": "not found"}})
+            return
+
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            server.started.append(time.monotonic())
+            roll = server.rng.random()
+            server.failures += roll < server.fail_rate
+            delay = server.latency * server.rng.uniform(0.5, 1.5)
+        try:
+            time.sleep(delay)
+            if roll < server.fail_rate / 2:
+                self.send_json(429, {"error": {"message": "rate limited", "type": "rate_limit_error"}},
+                               [("Retry-After", "0.2")])
+                return
+            if roll < server.fail_rate:
+                self.send_json(500, {"error": {"message": "internal error", "type": "server_error"}})
+                return
+
+            prompt = request["messages"][-1]["content"]
+            text = "Mock insight. " + " ".join(line.rstrip(".") + "." for line in prompt.splitlines()[:3])
+            self.send_json(200, {
+                "id": f"chatcmpl-{uuid.uuid4().hex}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", "mock"),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": text}}],
+                "usage": {"prompt_tokens": len(prompt.split()), "completion_tokens": len(text.split()),
+                          "total_tokens": len(prompt.split()) + len(text.split())},
+            })
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start(port=0, latency=0.2, fail_rate=0.0, seed=0):
+    """Runs a mock server on a background thread; returns it (base URL: http://127.0.0.1:<port>/v1)."""
+    server = MockLLMServer(("127.0.0.1", port), latency, fail_rate, seed)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.mock_llm")
+    parser.add_argument("--port", type=int, default=8700)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    server = MockLLMServer(("127.0.0.1", args.port), args.latency, args.fail_rate, args.seed)
+    print(f"mock LLM on http://127.0.0.1:{server.server_port}/v1 (stats: /stats)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,108 @@
+# benchmarks/nutrient_matrix.py
+"""
+Wide nutrient catalogs: memory and latency as nutrient columns grow.
+
+    python -m benchmarks.nutrient_matrix [--scale full] [--widths 0,12,48,96]
+
+For each width, writes the workspace's USDA.csv plus that many synthetic
+nutrient columns, builds the catalog from it and times the nutrient math
+the app does: one food's nutrients (the Food Logging preview), recomputing
+the macros of the whole log, and per-day totals of every nutrient over the
+whole log (catalog.daily_nutrients), next to the same totals done the
+obvious pandas way (join the log to a float64 food table, multiply,
+groupby). Then checks that the matrix totals match the pandas ones.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.generate import BENCH_USER, SCALES, add_extra_nutrients, build_workspace
+
+
+def timed(fn, repeat=5):
+    """Best-of-`repeat` wall time in ms, and the last result."""
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def pandas_daily(usda, log, nutrients):
+    """Per-day totals via a float64 food table: logged macros as they are, other nutrients from FoodID x Grams."""
+    import pandas as pd
+
+    foods = usda.set_index("ID")[nutrients].apply(pd.to_numeric, errors="coerce").fillna(0)
+    per_entry = foods.loc[log["FoodID"].astype(int)].to_numpy() * (log["Grams"].to_numpy() / 100.0)[:, None]
+    totals = pd.DataFrame(per_entry, columns=nutrients, index=log.index)
+    totals["Date"] = log["Date"].astype(str)
+    return totals.groupby("Date")[nutrients].sum()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.nutrient_matrix")
+    parser.add_argument("--scale", choices=list(SCALES), default="quick")
+    parser.add_argument("--widths", default="0,12,48,96", help="extra nutrient columns to try")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir")
+    args = parser.parse_args(argv)
+
+    workdir = os.path.abspath(args.workdir) if args.workdir else tempfile.mkdtemp(prefix="nutrition-nutrients-")
+    print(f"Generating '{args.scale}' workspace in {workdir} ...")
+    build_workspace(workdir, args.scale, args.seed)
+    os.chdir(workdir)
+
+    import pandas as pd
+    from catalog import NUTRIENTS, build_catalog
+    from helpers import get_meals_file
+    from meal_store import read_meals_file
+
+    usda = pd.read_csv("USDA.csv")
+    base = build_catalog()
+    log = read_meals_file(get_meals_file(BENCH_USER), base)
+    food = base.by_id[int(log["FoodID"].iloc[0])]
+    print(f"{len(usda)} foods, {len(log)} log entries over {log['Date'].nunique()} days")
+
+    print(f"\n{'nutrients':>9} {'matrix MB':>10} {'frames MB':>10} {'one food us':>12} "
+          f"{'macros ms':>10} {'daily ms':>9} {'pandas ms':>10}")
+    problems = []
+    for width in [int(w) for w in args.widths.split(",")]:
+        wide = add_extra_nutrients(usda, width, args.seed)
+        path = f"USDA_{width}.csv"
+        wide.to_csv(path, index=False)
+        catalog = build_catalog(path)
+        nutrients = catalog.nutrients
+
+        frames_mb = (catalog.foods.memory_usage(index=True).sum() +
+                     catalog.friendly_df.memory_usage(index=True).sum()) / 1e6
+        one_ms = timed(lambda: [catalog.nutrients_in(food, 150.0) for _ in range(1000)])[0]
+        macros_ms = timed(lambda: catalog.recompute_macros(log))[0]
+        daily_ms, daily = timed(lambda: catalog.daily_nutrients(log))
+        pandas_ms, reference = timed(
+            lambda: pandas_daily(wide.rename(columns={"Carbohydrate": "Carbs"}), log, nutrients[len(NUTRIENTS):]))
+        print(f"{len(nutrients):>9} {catalog.per_gram.nbytes / 1e6:>10.2f} {frames_mb:>10.2f} {one_ms:>12.1f} "
+              f"{macros_ms:>10.2f} {daily_ms:>9.2f} {pandas_ms:>10.2f}")
+
+        if catalog.per_gram.dtype != np.float32 or catalog.per_gram.shape[1] != len(NUTRIENTS) + width:
+            problems.append(f"{width}: per_gram is {catalog.per_gram.dtype} {catalog.per_gram.shape}")
+        logged = log.groupby(log["Date"].astype(str))[NUTRIENTS].sum()
+        if not np.allclose(daily[NUTRIENTS].to_numpy(), logged.to_numpy(), rtol=1e-5, atol=0.01):
+            problems.append(f"{width}: daily macro totals differ from the logged values")
+        if width and not np.allclose(daily[reference.columns].to_numpy(), reference.to_numpy(), rtol=1e-4, atol=0.01):
+            problems.append(f"{width}: daily nutrient totals differ from the pandas reference")
+
+    print("\n" + ("all checks passed" if not problems else "FAILED:\n  " + "\n  ".join(problems)))
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
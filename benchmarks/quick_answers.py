@@ -0,0 +1,151 @@
+# benchmarks/quick_answers.py
+"""
+Local chat answers: which questions skip the LLM, how fast, and whether the
+numbers are right.
+
+    python -m benchmarks.quick_answers [--scale quick] [--repeat 20]
+
+Generates a workspace and asks a labelled set of chat questions as bench0,
+with "today" set to the last day of its log. Prints the local hit rate, the
+latency of local answers per intent and the Prometheus counters. Then checks
+that:
+  - every question went where its label says (local intent or the LLM)
+  - food answers match catalog.nutrients_in for the same food and grams
+  - "what did I eat" / "what's left" answers match the log and the tracker
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.generate import BENCH_USER, SCALES, build_workspace
+
+# (question, intent answered locally or None for the LLM)
+QUESTIONS = [
+    ("How much protein in chicken?", "nutrients_in_food"),
+    ("how many calories in 2 eggs", "nutrients_in_food"),
+    ("Calories in a cup of rice", "nutrients_in_food"),
+    ("carbs in 100g brown rice", "nutrients_in_food"),
+    ("how much fat does a banana have", "nutrients_in_food"),
+    ("macros for an apple", "nutrients_in_food"),
+    ("nutrition facts for tofu", "nutrients_in_food"),
+    ("protein in 3 oz of salmon", "nutrients_in_food"),
+    ("how many calories in 3 slices of bread", "nutrients_in_food"),
+    ("How many calories did I eat today?", "eaten_on_day"),
+    ("how much protein have I had today", "eaten_on_day"),
+    ("what did I eat yesterday", "eaten_on_day"),
+    ("my totals so far", "eaten_on_day"),
+    ("How many calories do I have left?", "goal_remaining"),
+    ("what's left of my goal", "goal_remaining"),
+    ("am I over my goal yesterday", "goal_remaining"),
+    ("how much more can I eat today", "goal_remaining"),
+    ("What should I eat for dinner?", None),
+    ("Is my protein intake ok?", None),
+    ("Ideas for a high fiber snack?", None),
+    ("how many calories in a big mac", None),
+    ("how much protein do I need", None),
+    ("Give me a vegetarian meal plan for tomorrow", None),
+    ("Is it bad to eat late at night?", None),
+    # Not food questions, or no food the catalog knows by that name
+    ("How many calories in a run?", None),
+    ("calories in a beer", None),
+    ("protein in the", None),
+    ("calories of 100g", None),
+    ("calories for today", None),
+    ("calories in please", None),
+]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.quick_answers")
+    parser.add_argument("--scale", choices=list(SCALES), default="quick")
+    parser.add_argument("--repeat", type=int, default=20, help="timed passes over the questions")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir")
+    args = parser.parse_args(argv)
+
+    workdir = os.path.abspath(args.workdir) if args.workdir else tempfile.mkdtemp(prefix="nutrition-answers-")
+    print(f"Generating '{args.scale}' workspace in {workdir} ...")
+    build_workspace(workdir, args.scale, args.seed)
+    os.chdir(workdir)
+
+    import profiling
+    import quick_answers
+    from adherence import load_tracker
+    from catalog import load_catalog
+    from helpers import get_meals_file
+    from meal_store import read_meals_file
+
+    catalog = load_catalog()
+    log = read_meals_file(get_meals_file(BENCH_USER), catalog)
+    today = date.fromisoformat(log["Date"].max())
+    quick_answers.quick_answer("warm up", BENCH_USER, catalog, today)
+
+    latencies, answers, problems = {}, {}, []
+    for question, expected in QUESTIONS:
+        intent, _ = quick_answers.classify(question)
+        times = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            answer = quick_answers.quick_answer(question, BENCH_USER, catalog, today)
+            times.append(time.perf_counter() - start)
+        answers[question] = answer
+        got = intent if answer is not None else None
+        if got != expected:
+            problems.append(f"{question!r}: answered by {got or 'the LLM'}, expected {expected or 'the LLM'}")
+        latencies.setdefault(got or "llm (not answered)", []).extend(times)
+
+    local = sum(a is not None for a in answers.values())
+    print(f"\n{local} of {len(QUESTIONS)} questions answered locally ({local / len(QUESTIONS):.0%})")
+    print(f"{'intent':<22} {'p50 ms':>8} {'p95 ms':>8}")
+    for intent, times in latencies.items():
+        p50, p95 = np.percentile(np.asarray(times) * 1000, [50, 95])
+        print(f"{intent:<22} {p50:>8.2f} {p95:>8.2f}")
+    print("\n" + "\n".join(line for line in profiling.METRICS.to_prometheus().splitlines()
+                           if "nutrition_chat_questions_total" in line))
+
+    # ---------------------------
+    # Checks: the numbers match the catalog, log and tracker
+    # ---------------------------
+    def bold_number(answer):
+        return float(re.search(r"\*\*([\d.]+)", answer).group(1))
+
+    for question, display, grams, nutrient in [
+        ("carbs in 100g brown rice", "Brown Rice", 100, "Carbs"),
+        ("Calories in a cup of rice", "White Rice", catalog.portions.grams_per_unit("White Rice", "cup"), "Calories"),
+    ]:
+        expected = catalog.nutrients_in(catalog.by_display[display], grams)[nutrient]
+        if abs(bold_number(answers[question]) - expected) > 0.5:
+            problems.append(f"{question!r}: {answers[question]!r}, expected {expected:.1f}")
+
+    day_df = log[log["Date"] == today.isoformat()]
+    for question, expected in [
+        ("How many calories did I eat today?", day_df["Calories"].sum()),
+        ("how much protein have I had today", day_df["Protein"].sum()),
+    ]:
+        if abs(bold_number(answers[question]) - expected) > 0.5:
+            problems.append(f"{question!r}: {answers[question]!r}, expected {expected:.0f}")
+
+    tracker = load_tracker(BENCH_USER)
+    yesterday = today - timedelta(days=1)
+    for question, day in [("How many calories do I have left?", today), ("am I over my goal yesterday", yesterday)]:
+        left = tracker.goal_for(day) - tracker.consumed(day)
+        signed = bold_number(answers[question]) * (-1 if "over" in answers[question].split("**")[2] else 1)
+        if abs(signed - left) > 0.5:
+            problems.append(f"{question!r}: {answers[question]!r}, expected {left:.0f} kcal left")
+
+    print("\n" + ("all checks passed" if not problems else "FAILED:\n  " + "\n  ".join(problems)))
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+# benchmarks/reports.py
+"""
+Bulk weekly / monthly report generation: throughput of the worker pool and
+that the report cache only re-renders what changed.
+
+    python -m benchmarks.reports [--users 16] [--workers 1,2,4] [--period week] [--format html]
+
+Generates a workspace with `users` two-month meal logs and renders every
+user's report for last week (or month) with reports.run(), once per worker
+count, starting from an empty cache each time. Prints reports/s per count
+(it can only scale up to the machine's cores). Then checks that:
+  - every report rendered, and a second run finds them all cached
+  - adding a meal for one user re-renders only that user's report
+  - the report's days logged and average calories match a direct pandas sum
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.generate import build_workspace, generate_meals_log, write_goal_history
+
+
+def reference_summary(username, start, end):
+    """Days logged and average calories, the slow obvious way."""
+    import pandas as pd
+    from helpers import get_meals_file
+
+    df = pd.read_csv(get_meals_file(username))
+    daily = df[(df["Date"] >= start.isoformat()) & (df["Date"] <= end.isoformat())].groupby("Date")["Calories"].sum()
+    daily = daily[daily > 0]
+    return len(daily), float(daily.mean()) if len(daily) else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.reports")
+    parser.add_argument("--users", type=int, default=16)
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker counts to time")
+    parser.add_argument("--period", choices=["week", "month"], default="week")
+    parser.add_argument("--format", choices=["html", "pdf"], default="html")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir")
+    args = parser.parse_args(argv)
+
+    workdir = os.path.abspath(args.workdir) if args.workdir else tempfile.mkdtemp(prefix="nutrition-reports-")
+    print(f"Generating {args.users} two-month logs in {workdir} ...")
+    build_workspace(workdir, "quick", args.seed)
+    os.chdir(workdir)
+
+    from catalog import build_catalog
+    from helpers import get_meals_file, get_reports_dir
+    from meal_store import append_meals, new_entry_id, read_meals_file
+    import reports
+
+    catalog = build_catalog("USDA.csv")
+    as_of = date.today() - timedelta(days=1)
+    usernames = [f"bench{i}" for i in range(args.users)]
+    for i, username in enumerate(usernames[1:], start=1):
+        generate_meals_log(catalog, 60 / 365, args.seed + i, end=as_of).to_csv(get_meals_file(username), index=False)
+        write_goal_history(username, 0.5, args.seed + i, end=as_of)
+
+    def clear_cache():
+        for username in usernames:
+            shutil.rmtree(get_reports_dir(username), ignore_errors=True)
+
+    problems = []
+    print(f"\n{args.period}ly {args.format.upper()} reports for {len(usernames)} users "
+          f"({os.cpu_count()} CPU(s) on this machine)")
+    print(f"{'workers':>8} {'seconds':>8} {'reports/s':>10} {'failed':>7}")
+    for workers in [int(w) for w in args.workers.split(",")]:
+        clear_cache()
+        result = reports.run(args.period, as_of, usernames, args.format, workers)
+        print(f"{workers:>8} {result['seconds']:>8.1f} {result['per_second']:>10.2f} {result['failed']:>7}")
+        if result["rendered"] != len(usernames):
+            problems.append(f"{workers} workers rendered {result['rendered']} of {len(usernames)} reports")
+
+    start = time.perf_counter()
+    again = reports.run(args.period, as_of, usernames, args.format)
+    print(f"\nsecond run: {again['cached']} cached, {again['rendered']} rendered in "
+          f"{(time.perf_counter() - start) * 1000:.0f} ms")
+    if again["cached"] != len(usernames):
+        problems.append(f"second run re-rendered {again['rendered']} reports; nothing had changed")
+
+    # A new meal invalidates exactly one user's report
+    changed = usernames[1]
+    row = dict(read_meals_file(get_meals_file(changed)).iloc[-1], EntryID=new_entry_id(), Date=as_of.isoformat())
+    append_meals(get_meals_file(changed), [row])
+    after = reports.run(args.period, as_of, usernames, args.format)
+    print(f"after a meal for {changed}: {after['rendered']} rendered, {after['cached']} cached")
+    if after["rendered"] != 1 or after["cached"] != len(usernames) - 1:
+        problems.append(f"one new meal re-rendered {after['rendered']} reports; expected 1")
+
+    for username in usernames[:5]:
+        data = reports.report_data(username, args.period, as_of)
+        summary = data["summary"]
+        days_logged, avg = reference_summary(username, data["start"], data["end"])
+        got = summary["averages"]["Calories"] if summary["averages"] else None
+        if summary["days_logged"] != days_logged or (avg is None) != (got is None) or (avg and abs(got - avg) > 0.01):
+            problems.append(f"{username}: report says {summary['days_logged']} days / {got} kcal, "
+                            f"log says {days_logged} days / {avg} kcal")
+
+    path = reports.cached_report(changed, args.period, as_of, args.format)
+    print(f"\n{changed}'s report: {path} ({os.path.getsize(path) / 1024:.0f} KiB)")
+    print("\n" + ("all checks passed" if not problems else "FAILED:\n  " + "\n  ".join(problems)))
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+# benchmarks/retention.py
+"""
+Hot/cold retention: what compaction saves the page reads, and that nothing
+is lost or double-counted on the way.
+
+    python -m benchmarks.retention [--scale full] [--hot-days 90]
+
+Generates a workspace, times the reads each page does on the full log,
+compacts the benchmark user's log (archive.compact_user) and times them
+again, plus the cold paths that now open the archive (an old day, the
+Year/Max chart). Then checks that:
+  - archive + hot log hold every entry exactly once
+  - the archive's daily summary + hot log give the original daily totals,
+    and get_stats() over them matches the stats of the full log
+  - the adherence tracker and food index survive compaction without a
+    rebuild, and a forced rebuild from the archive gives the same result
+  - editing / deleting an archived entry updates its partition and summary
+  - compacting again moves nothing
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.generate import BENCH_USER, SCALES, build_workspace
+
+
+def timed(fn, repeat=5):
+    """Best-of-`repeat` wall time in ms, and the last result."""
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def dir_size(path):
+    return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path)) if os.path.isdir(path) else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.retention")
+    parser.add_argument("--scale", choices=list(SCALES), default="quick")
+    parser.add_argument("--hot-days", type=int, default=90)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir")
+    args = parser.parse_args(argv)
+
+    workdir = os.path.abspath(args.workdir) if args.workdir else tempfile.mkdtemp(prefix="nutrition-retention-")
+    print(f"Generating '{args.scale}' workspace in {workdir} ...")
+    build_workspace(workdir, args.scale, args.seed)
+    os.chdir(workdir)
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+    import pandas as pd
+    import adherence
+    import archive
+    import food_index
+    import nutrition_stats
+    from catalog import load_catalog
+    from helpers import get_adherence_file, get_food_index_file, get_meals_file
+    from meal_store import read_meals_file, read_raw_meals
+    from write_queue import WRITE_QUEUE
+    from _pages import _3_Visualization as viz_page
+
+    catalog = load_catalog()
+    meals_file = get_meals_file(BENCH_USER)
+    today = date.today()
+    old_day = (today - timedelta(days=400)).isoformat()
+
+    def page_reads():
+        """The log reads behind Food Logging (one day), Visualization (Week) and the stats."""
+        return {
+            "food logging: read log": lambda: read_meals_file(meals_file, catalog),
+            "viz: read + prepare log": lambda: viz_page.prepare_meals_df(read_raw_meals(meals_file)),
+            "stats: compute (cold)": lambda: (nutrition_stats._cached_stats.cache_clear(),
+                                              nutrition_stats.get_stats(meals_file))[1],
+            "tracker: rebuild": lambda: adherence.load_tracker(BENCH_USER).rebuild(),
+        }
+
+    # ---------------------------
+    # Before: everything in the hot log
+    # ---------------------------
+    full = read_meals_file(meals_file, catalog)
+    reference_daily = full.groupby("Date")["Calories"].sum()
+    reference_stats = nutrition_stats.compute_stats(full[["Date"] + nutrition_stats.NUTRIENTS].copy())
+    reference_tracker = adherence.load_tracker(BENCH_USER)
+    reference_foods = {k: v["count"] for k, v in food_index.load_food_index(BENCH_USER).foods.items()}
+    hot_bytes = os.path.getsize(meals_file)
+
+    before = {name: timed(fn)[0] for name, fn in page_reads().items()}
+
+    # ---------------------------
+    # Compact
+    # ---------------------------
+    start = time.perf_counter()
+    moved = archive.compact_user(BENCH_USER, today, args.hot_days)
+    WRITE_QUEUE.flush()
+    compact_ms = (time.perf_counter() - start) * 1000
+
+    after = {name: timed(fn)[0] for name, fn in page_reads().items()}
+    cold = {
+        "archive: one old day": timed(lambda: archive.read_archived(meals_file, old_day, old_day))[0],
+        "viz: Year range (summary)": timed(lambda: viz_page.add_archived_days(
+            viz_page.filter_range(viz_page.prepare_meals_df(read_raw_meals(meals_file)), "Year", today),
+            meals_file, "Year", today))[0],
+        "viz: Max range (summary)": timed(lambda: viz_page.add_archived_days(
+            viz_page.prepare_meals_df(read_raw_meals(meals_file)), meals_file, "Max", today))[0],
+    }
+
+    hot = read_meals_file(meals_file, catalog)
+    print(f"\nmoved {moved} of {len(full)} entries to {len(archive.read_manifest(meals_file)['months'])} "
+          f"monthly partitions in {compact_ms:.0f} ms; hot log {hot_bytes / 1e6:.2f} MB -> "
+          f"{os.path.getsize(meals_file) / 1e6:.2f} MB, archive {dir_size(archive.archive_dir(meals_file)) / 1e6:.2f} MB")
+    print(f"\n{'read':<28} {'full log ms':>12} {'hot only ms':>12}")
+    for name in before:
+        print(f"{name:<28} {before[name]:>12.2f} {after[name]:>12.2f}")
+    for name, ms in cold.items():
+        print(f"{name:<28} {'':>12} {ms:>12.2f}")
+
+    # ---------------------------
+    # Checks
+    # ---------------------------
+    problems = []
+    archived = archive.read_archived(meals_file)
+    ids = pd.concat([archived["EntryID"], hot["EntryID"]])
+    if len(ids) != len(full) or set(ids) != set(full["EntryID"]):
+        problems.append(f"archive + hot hold {len(ids)} entries ({ids.nunique()} unique) of {len(full)}")
+
+    summary = archive.daily_summary(meals_file).set_index("Date")["Calories"]
+    combined = pd.concat([summary, hot.groupby("Date")["Calories"].sum()]).groupby(level=0).sum()
+    if not combined.index.equals(reference_daily.index) or not np.allclose(combined, reference_daily):
+        problems.append("daily totals from summary + hot log differ from the full log")
+
+    nutrition_stats._cached_stats.cache_clear()
+    stats = nutrition_stats.get_stats(meals_file)
+    for key in ("daily", "weekday", "weekend_split"):
+        if not np.allclose(stats[key].to_numpy(float), reference_stats[key].to_numpy(float), equal_nan=True):
+            problems.append(f"get_stats()['{key}'] differs after compaction")
+
+    tracker = adherence.load_tracker(BENCH_USER)
+    if tracker.daily != reference_tracker.daily or tracker.best_streak != reference_tracker.best_streak:
+        problems.append("tracker state changed across compaction")
+    os.remove(get_adherence_file(BENCH_USER))
+    rebuilt = adherence.load_tracker(BENCH_USER)
+    if set(rebuilt.daily) != set(reference_tracker.daily) or not np.allclose(
+            [rebuilt.daily[d] for d in reference_tracker.daily], list(reference_tracker.daily.values())):
+        problems.append("tracker rebuilt from archive + hot log differs")
+    os.remove(get_food_index_file(BENCH_USER))
+    foods = {k: v["count"] for k, v in food_index.load_food_index(BENCH_USER).foods.items()}
+    if foods != reference_foods:
+        problems.append("food index rebuilt from archive + hot log differs")
+
+    entry = archived.iloc[len(archived) // 2].to_dict()
+    day_total = summary[entry["Date"]]
+    archive.update_archived_meal(meals_file, entry["Date"], entry["EntryID"], dict(entry, Calories=entry["Calories"] + 100))
+    if not np.isclose(archive.daily_summary(meals_file).set_index("Date")["Calories"][entry["Date"]], day_total + 100):
+        problems.append("editing an archived entry did not update the daily summary")
+    archive.delete_archived_meal(meals_file, entry["Date"], entry["EntryID"])
+    if entry["EntryID"] in set(archive.read_archived(meals_file, entry["Date"], entry["Date"])["EntryID"]):
+        problems.append("deleted archived entry is still there")
+
+    if archive.compact_user(BENCH_USER, today, args.hot_days):
+        problems.append("compacting again moved entries")
+
+    print("\n" + ("all checks passed" if not problems else "FAILED:\n  " + "\n  ".join(problems)))
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
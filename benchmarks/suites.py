@@ -0,0 +1,350 @@
+# benchmarks/suites.py
+"""
+Benchmarks for every hot path of the app: login, catalog parse/search,
+meal logging (add / edit / delete), dashboard, food index, stats + charts,
+the AI Suggestions meal plans and healthier swaps.
+
+Every benchmark takes the shared `ctx` dict built by `make_context()`; the
+working directory is the generated workspace, so the app's relative paths
+(data/, USDA.csv, ...) resolve to synthetic data.
+"""
+import io
+import os
+import shutil
+from datetime import date
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import pandas as pd
+
+from benchmarks.generate import BENCH_USER
+from benchmarks.harness import benchmark
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")  # page 2 builds its client at import
+
+import adherence
+import catalog as catalog_mod
+import food_index
+import helpers
+import meal_store
+import nutrition_stats
+import profiling
+import swaps
+from write_queue import WRITE_QUEUE
+from helpers import get_meals_file, get_adherence_file, get_food_index_file
+from Home import dashboard_summary
+from _pages import _2_AI_Suggestions as ai_page
+from _pages import _3_Visualization as viz_page
+
+
+def make_context(username=BENCH_USER):
+    meals_file = get_meals_file(username)
+    backup = meals_file + ".bench"
+    shutil.copy(meals_file, backup)
+
+    catalog = catalog_mod.load_catalog()
+    df = meal_store.read_meals_file(meals_file, catalog)
+    day = df["Date"].iloc[-1]
+    return {
+        "last_user": helpers.load_users()[-1],
+        "username": username,
+        "meals_file": meals_file,
+        "meals_backup": backup,
+        "catalog": catalog,
+        "today": date.fromisoformat(day),
+        "day_str": day,
+        "day_rows": df[df["Date"] == day].to_dict("records"),
+        "healthy": ai_page.load_healthy_meals(),
+        "queries": ["chick", "rice", "milk", "apple", "bread", "xyz-not-a-food"],
+    }
+
+
+def restore_meals(ctx):
+    WRITE_QUEUE.flush()  # a pending write-behind flush would overwrite the restored file
+    shutil.copy(ctx["meals_backup"], ctx["meals_file"])
+
+
+def render(fig):
+    """Draws a figure the way st.pyplot does (PNG) and releases it."""
+    if fig is None:
+        return
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png")
+    plt.close(fig)
+
+
+# ---------------------------
+# Instrumentation overhead
+# ---------------------------
+@profiling.profiled("bench.noop", "other")
+def _noop():
+    pass
+
+
+@benchmark("profiling: 10k spans (disabled)")
+def bench_spans_disabled(ctx):
+    for _ in range(10_000):
+        _noop()
+
+
+# ---------------------------
+# Login
+# ---------------------------
+@benchmark("login: find user (cold)")
+def bench_login_cold(ctx):
+    helpers._users_by_name.cache_clear()
+    helpers.find_user(ctx["last_user"]["username"], ctx["last_user"]["password"])
+
+
+@benchmark("login: find user (cached)", repeat=50)
+def bench_login(ctx):
+    helpers.find_user(ctx["last_user"]["username"], ctx["last_user"]["password"])
+
+
+# ---------------------------
+# Catalog
+# ---------------------------
+@benchmark("catalog: build (cold)")
+def bench_catalog_build(ctx):
+    catalog_mod.build_catalog()
+
+
+@benchmark("catalog: load (cached)", repeat=50)
+def bench_catalog_load(ctx):
+    catalog_mod.load_catalog()
+
+
+@benchmark("catalog: attach shared snapshot")
+def bench_catalog_attach(ctx):
+    # A fresh worker: nothing cached in-process, snapshot already published
+    catalog_mod._cached_catalog.cache_clear()
+    catalog_mod.load_catalog()
+
+
+@benchmark("catalog: search", repeat=20)
+def bench_catalog_search(ctx):
+    catalog = ctx["catalog"]
+    for text in ctx["queries"]:
+        for display in catalog.search(text)["DisplayMeal"].head(5):
+            catalog.variants.get(display)
+            catalog.portions.available_units(display)
+
+
+@benchmark("ai: load + summarize USDA meals")
+def bench_ai_usda(ctx):
+    ai_page.summarize_usda_meals(ai_page.load_usda_meals())
+
+
+@benchmark("ai: attach shared USDA summary")
+def bench_ai_usda_attach(ctx):
+    ai_page._shared_usda_summary.cache_clear()
+    ai_page.load_usda_summary()
+
+
+# ---------------------------
+# Meal logging
+# ---------------------------
+@benchmark("meals: read log")
+def bench_read_meals(ctx):
+    meal_store.read_meals_file(ctx["meals_file"], ctx["catalog"])
+
+
+@benchmark("meals: add entry", setup=restore_meals)
+def bench_add_meal(ctx):
+    row = dict(ctx["day_rows"][0], EntryID=meal_store.new_entry_id())
+    meal_store.append_meal(ctx["meals_file"], row, ctx["catalog"])
+
+
+@benchmark("meals: add entry + flush", setup=restore_meals)
+def bench_add_meal_flushed(ctx):
+    row = dict(ctx["day_rows"][0], EntryID=meal_store.new_entry_id())
+    meal_store.append_meal(ctx["meals_file"], row, ctx["catalog"])
+    WRITE_QUEUE.flush()
+
+
+def log_meal_handler(ctx):
+    # What Food Logging's "Add" does: the entry and its derived state, staged under the log's lock
+    row = dict(ctx["day_rows"][0], EntryID=meal_store.new_entry_id())
+    with meal_store.locked_log(ctx["meals_file"]):
+        meal_store.append_meal(ctx["meals_file"], row, ctx["catalog"])
+        tracker = adherence.load_tracker(ctx["username"])
+        tracker.add_calories(row["Date"], row["Calories"])
+        tracker.save()
+        index = food_index.load_food_index(ctx["username"])
+        index.record(row)
+        index.save()
+
+
+def restore_meals_derived(ctx):
+    # The tracker and food index rebuilt for the restored log, as they are between adds in a session
+    restore_meals(ctx)
+    adherence.load_tracker(ctx["username"])
+    food_index.load_food_index(ctx["username"])
+    WRITE_QUEUE.flush()
+
+
+@benchmark("meals: log entry (page handler)", setup=restore_meals_derived)
+def bench_log_meal_handler(ctx):
+    log_meal_handler(ctx)
+
+
+@benchmark("meals: log entry (page handler) + flush", setup=restore_meals_derived)
+def bench_log_meal_handler_flushed(ctx):
+    log_meal_handler(ctx)
+    WRITE_QUEUE.flush()
+
+
+@benchmark("meals: edit entry", setup=restore_meals)
+def bench_edit_meal(ctx):
+    row = dict(ctx["day_rows"][0])
+    row["Quantity"] = row["Quantity"] * 2
+    meal_store.update_meal(ctx["meals_file"], row["EntryID"], row, ctx["catalog"])
+
+
+@benchmark("meals: delete entry", setup=restore_meals)
+def bench_delete_meal(ctx):
+    meal_store.delete_meal(ctx["meals_file"], ctx["day_rows"][0]["EntryID"], ctx["catalog"])
+
+
+def restore_meals_cached(ctx):
+    # The log parsed once, as it is between edits in a session
+    restore_meals(ctx)
+    meal_store.read_meals_file(ctx["meals_file"], ctx["catalog"])
+
+
+@benchmark("meals: edit entry (parsed log)", setup=restore_meals_cached)
+def bench_edit_meal_cached(ctx):
+    bench_edit_meal(ctx)
+
+
+@benchmark("meals: delete entry (parsed log)", setup=restore_meals_cached)
+def bench_delete_meal_cached(ctx):
+    bench_delete_meal(ctx)
+
+
+@benchmark("meals: recompute macros")
+def bench_recompute_macros(ctx):
+    ctx["catalog"].recompute_macros(meal_store.read_meals_file(ctx["meals_file"], ctx["catalog"]))
+
+
+@benchmark("meals: daily nutrient totals")
+def bench_daily_nutrients(ctx):
+    ctx["catalog"].daily_nutrients(meal_store.read_meals_file(ctx["meals_file"], ctx["catalog"]))
+
+
+# ---------------------------
+# Dashboard / adherence
+# ---------------------------
+def _drop_adherence_state(ctx):
+    restore_meals(ctx)
+    if os.path.exists(get_adherence_file(ctx["username"])):
+        os.remove(get_adherence_file(ctx["username"]))
+
+
+@benchmark("home: load tracker (rebuild)", setup=_drop_adherence_state)
+def bench_tracker_cold(ctx):
+    adherence.load_tracker(ctx["username"]).save()
+
+
+@benchmark("home: load tracker (cached)", repeat=20)
+def bench_tracker_warm(ctx):
+    adherence.load_tracker(ctx["username"])
+
+
+@benchmark("home: dashboard summary", repeat=20)
+def bench_dashboard(ctx):
+    tracker = adherence.load_tracker(ctx["username"])
+    dashboard_summary(tracker, adherence.read_goal(ctx["username"]), ctx["today"])
+
+
+# ---------------------------
+# Food index (Quick Add)
+# ---------------------------
+def _drop_food_index(ctx):
+    restore_meals(ctx)
+    if os.path.exists(get_food_index_file(ctx["username"])):
+        os.remove(get_food_index_file(ctx["username"]))
+
+
+@benchmark("food index: rebuild", setup=_drop_food_index)
+def bench_food_index_cold(ctx):
+    food_index.load_food_index(ctx["username"])
+
+
+@benchmark("food index: top foods", repeat=20)
+def bench_food_index_top(ctx):
+    index = food_index.load_food_index(ctx["username"])
+    for meal_type in food_index.MEAL_TYPES:
+        index.top_foods(meal_type, "Morning")
+
+
+# ---------------------------
+# Visualization
+# ---------------------------
+@benchmark("stats: compute")
+def bench_compute_stats(ctx):
+    nutrition_stats._cached_stats.cache_clear()
+    nutrition_stats.get_stats(ctx["meals_file"])
+
+
+@benchmark("viz: calories over time (All)")
+def bench_viz_over_time(ctx):
+    df = viz_page.prepare_meals_df(pd.read_csv(ctx["meals_file"]))
+    tracker = adherence.load_tracker(ctx["username"])
+    df_range = viz_page.filter_range(df, "All", ctx["today"])
+    render(viz_page.plot_calories_over_time(df_range, "All", tracker.goal_for))
+
+
+@benchmark("viz: rolling trend charts")
+def bench_viz_rolling(ctx):
+    stats = nutrition_stats.get_stats(ctx["meals_file"])
+    render(viz_page.plot_rolling_calories(stats["daily"]))
+    render(viz_page.plot_macro_ratio_trend(stats["daily"]))
+    render(viz_page.plot_weekday_calories(stats["weekday"]))
+
+
+@benchmark("viz: daily breakdown charts")
+def bench_viz_day(ctx):
+    day_df = viz_page.prepare_meals_df(pd.DataFrame(ctx["day_rows"]))
+    p, c, f = day_df["Protein"].sum(), day_df["Carbs"].sum(), day_df["Fat"].sum()
+    total = day_df["Calories"].sum()
+    render(viz_page.plot_macro_pie(p, c, f))
+    render(viz_page.plot_calorie_pie(total, max(2000 - total, 0), 2000))
+    render(viz_page.plot_macros_by_meal_type(day_df))
+    render(viz_page.plot_cumulative_macros(day_df))
+    render(viz_page.plot_macro_proportions(p, c, f))
+
+
+# ---------------------------
+# AI Suggestions meal plans
+# ---------------------------
+@benchmark("ai: calorie based plan", repeat=20)
+def bench_plan_calorie(ctx):
+    ai_page.calorie_based_plan(ctx["healthy"], 2000)
+
+
+@benchmark("ai: weight loss plan", repeat=20)
+def bench_plan_weight_loss(ctx):
+    ai_page.weight_loss_plan(ctx["healthy"])
+
+
+@benchmark("ai: high protein plan", repeat=20)
+def bench_plan_high_protein(ctx):
+    ai_page.high_protein_plan(ctx["healthy"])
+
+
+# ---------------------------
+# Healthier swaps
+# ---------------------------
+@benchmark("swaps: build index")
+def bench_swaps_build(ctx):
+    swaps.build_swap_index(ctx["catalog"])
+
+
+@benchmark("swaps: one day of entries", repeat=20)
+def bench_swaps_day(ctx):
+    day = pd.DataFrame(ctx["day_rows"])
+    index = swaps.load_swap_index()
+    for goal in swaps.GOALS:
+        index.swaps(day, goal)
@@ -0,0 +1,127 @@
+# benchmarks/swaps.py
+"""
+Healthier-swap search: index build and query latency, checked against a
+pandas brute force.
+
+    python -m benchmarks.swaps [--scale full] [--queries 1000]
+
+Generates a workspace, builds the swap index over its USDA foods and
+healthy meals, then times for both goals: one entry at a time (the Food
+Logging preview), one day of entries in a batch (the day's swap list) and
+`queries` log entries in one batch. The same entries are answered by the
+obvious pandas way (every candidate scored, filtered, best per name, sorted)
+and the two must agree, up to ties in distance.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.generate import BENCH_USER, SCALES, build_workspace
+
+
+def timed(fn, repeat=5):
+    """Best-of-`repeat` wall time in ms, and the last result."""
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def pandas_swaps(index, entry, goal):
+    """Reference answer for one entry: every allowed name's best candidate, closest first."""
+    import pandas as pd
+    import swaps
+
+    macros = pd.to_numeric(pd.Series([entry[c] for c in ["Calories", "Protein", "Carbs", "Fat"]]), errors="coerce")
+    query = swaps.macro_shares(macros.to_numpy()[None, 1:])[0]
+    grams = entry["Grams"]
+    amount = np.where(index.fixed, 1.0, index.default_grams if pd.isna(grams) else grams)
+    df = pd.DataFrame({
+        "item": np.arange(len(index)),
+        "group": index.groups,
+        "dist": ((index.shares.astype(float) - query) ** 2).sum(axis=1),
+        "calories": index.per_unit[:, 0] * amount,
+        "protein": index.per_unit[:, 1] * amount,
+    })
+    if goal == "lower_calorie":
+        df = df[(df["calories"] <= macros[0] * swaps.LOWER_CALORIE_RATIO) &
+                (df["calories"] >= macros[0] * swaps.MIN_CALORIE_RATIO)]
+    else:
+        df = df[(df["protein"] >= macros[1] * swaps.HIGHER_PROTEIN_RATIO + swaps.HIGHER_PROTEIN_GRAMS) &
+                (df["calories"] <= macros[0] * swaps.HIGHER_PROTEIN_CALORIES)]
+    df = df[(df["group"] != entry["Meal"]) & df["dist"].notna()]
+    return df.sort_values(["dist", "item"]).drop_duplicates("group")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.swaps")
+    parser.add_argument("--scale", choices=list(SCALES), default="quick")
+    parser.add_argument("--queries", type=int, default=1000, help="log entries in the large batch")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--checks", type=int, default=200, help="entries compared with the pandas reference")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir")
+    args = parser.parse_args(argv)
+
+    workdir = os.path.abspath(args.workdir) if args.workdir else tempfile.mkdtemp(prefix="nutrition-swaps-")
+    print(f"Generating '{args.scale}' workspace in {workdir} ...")
+    build_workspace(workdir, args.scale, args.seed)
+    os.chdir(workdir)
+
+    import swaps
+    from catalog import load_catalog
+    from helpers import get_meals_file
+    from meal_store import read_meals_file
+
+    catalog = load_catalog()
+    build_ms, index = timed(lambda: swaps.build_swap_index(catalog), repeat=3)
+    log = read_meals_file(get_meals_file(BENCH_USER), catalog)
+    rng = np.random.default_rng(args.seed)
+    batch = log.iloc[rng.choice(len(log), size=min(args.queries, len(log)), replace=False)].reset_index(drop=True)
+    day = log[log["Date"] == log["Date"].iloc[-1]]
+    print(f"{len(index)} candidates in {len(index.blocks)} blocks, built in {build_ms:.0f} ms; "
+          f"{len(batch)} entries in the batch, {len(day)} in a day")
+
+    print(f"\n{'goal':<16} {'one entry ms':>13} {'one day ms':>11} {'batch ms':>9} {'per entry us':>13} {'found':>6}")
+    problems = []
+    for goal in swaps.GOALS:
+        one_ms = timed(lambda: [index.swaps(batch.iloc[[i]], goal, args.k) for i in range(20)])[0] / 20
+        day_ms = timed(lambda: index.swaps(day, goal, args.k))[0]
+        batch_ms, results = timed(lambda: index.swaps(batch, goal, args.k), repeat=3)
+        found = np.mean([len(r) for r in results])
+        print(f"{swaps.GOALS[goal]:<16} {one_ms:>13.2f} {day_ms:>11.2f} {batch_ms:>9.1f} "
+              f"{batch_ms / len(batch) * 1000:>13.1f} {found:>6.2f}")
+
+        for i in range(min(args.checks, len(batch))):
+            entry = batch.iloc[i]
+            expected = pandas_swaps(index, entry, goal)
+            got = results[i]
+            # Ties may resolve to different names; each answer must be some name's best at the same distance
+            best_of = dict(zip(expected["group"], np.sqrt(expected["dist"])))
+            same_distances = np.allclose([s["Distance"] for s in got], np.sqrt(expected["dist"].head(args.k)), atol=1e-3)
+            if not same_distances or any(abs(best_of.get(s["DisplayMeal"], np.inf) - s["Distance"]) > 1e-3 for s in got):
+                problems.append(f"{goal}: entry {i} ({entry['Meal']}) differs from the pandas reference")
+        for r in results:
+            if len({s["DisplayMeal"] for s in r}) != len(r):
+                problems.append(f"{goal}: a result repeats a name")
+                break
+
+    ref_ms = timed(lambda: [pandas_swaps(index, batch.iloc[i], "lower_calorie").head(args.k) for i in range(20)],
+                   repeat=1)[0] / 20
+    print(f"\npandas reference: {ref_ms:.1f} ms per entry")
+    print("\n" + ("all checks passed" if not problems else "FAILED:\n  " + "\n  ".join(problems[:20])))
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
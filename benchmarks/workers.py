@@ -0,0 +1,118 @@
+# benchmarks/workers.py
+"""
+Per-worker memory / startup of the shared catalog snapshot.
+
+    python -m benchmarks.workers [--workers 4] [--scale full]
+
+Starts N worker processes against one generated workspace, first with
+NUTRITION_SHARED=0 (every worker parses its own catalog) and then with
+sharing on (the first worker publishes, the rest map it). Each worker loads
+the catalog and the AI page's USDA summary, touches every table and reports
+its load time and how much its resident and private memory grew. The gap
+between the two is the snapshot pages it shares with the other workers.
+Linux only (reads /proc/self/smaps_rollup).
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.generate import SCALES, build_workspace
+
+
+def memory_kb():
+    """{"Rss": kB, "Private": kB} for this process."""
+    fields = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return {"Rss": fields["Rss"], "Private": fields["Private_Clean"] + fields["Private_Dirty"]}
+
+
+# ---------------------------
+# Worker
+# ---------------------------
+def run_worker(workdir):
+    os.chdir(workdir)
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    import numpy as np
+    from catalog import load_catalog
+    from _pages._2_AI_Suggestions import load_usda_summary
+
+    before = memory_kb()
+    start = time.perf_counter()
+    catalog = load_catalog()
+    summary = load_usda_summary()
+    seconds = time.perf_counter() - start
+
+    # Touch every table, as serving requests would
+    touched = float(np.nansum(catalog.per_gram)) + float(np.nansum(catalog.portions.grams))
+    touched += float(catalog.foods["Calories"].sum()) + float(summary["Calories"].sum())
+    after = memory_kb()
+
+    print(json.dumps({
+        "seconds": seconds,
+        "rss_kb": after["Rss"] - before["Rss"],
+        "private_kb": after["Private"] - before["Private"],
+    }), flush=True)
+    sys.stdin.read()  # stay mapped until every worker has reported
+
+
+# ---------------------------
+# Parent
+# ---------------------------
+def run_round(workdir, workers, shared):
+    env = dict(os.environ, NUTRITION_SHARED="1" if shared else "0")
+    args = [sys.executable, "-m", "benchmarks.workers", "--worker", workdir]
+    procs, reports = [], []
+    try:
+        for _ in range(workers):
+            # One at a time, so later workers find the snapshot the first published
+            proc = subprocess.Popen(args, cwd=REPO_ROOT, env=env, text=True,
+                                    stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+            procs.append(proc)
+            reports.append(json.loads(proc.stdout.readline()))
+    finally:
+        for proc in procs:
+            proc.stdin.close()
+            proc.wait()
+    return reports
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.workers")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--scale", choices=list(SCALES), default="quick")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        run_worker(args.worker)
+        return 0
+
+    workdir = os.path.abspath(args.workdir) if args.workdir else tempfile.mkdtemp(prefix="nutrition-workers-")
+    print(f"Generating '{args.scale}' workspace in {workdir} ...")
+    build_workspace(workdir, args.scale, args.seed)
+
+    print(f"\n{'mode':<10} {'worker':>6} {'load ms':>9} {'Δ RSS MB':>9} {'Δ private MB':>13}")
+    for shared in (False, True):
+        mode = "shared" if shared else "private"
+        for i, report in enumerate(run_round(workdir, args.workers, shared)):
+            print(f"{mode:<10} {i:>6} {report['seconds'] * 1000:>9.1f} "
+                  f"{report['rss_kb'] / 1024:>9.1f} {report['private_kb'] / 1024:>13.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
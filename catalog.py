@@ -0,0 +1,287 @@
+# catalog.py
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from helpers import file_signature
+from profiling import profiled
+from portions import load_portion_table, PortionTable, PORTIONS_FILE
+from shared_store import shared_snapshot, frame_arrays, attach_frame
+
+USDA_FILE = "USDA.csv"
+# Nutrients every meal log entry stores; any other numeric USDA.csv column (Fiber, Sugar, Sodium, ...)
+# is an extra nutrient, derived from FoodID + Grams when needed
+NUTRIENTS = ["Calories", "Protein", "Carbs", "Fat"]
+USDA_RENAMES = {"Description": "Meal", "Carbohydrate": "Carbs"}
+# float32 keeps ~7 significant digits; amounts are rounded to this many decimals
+NUTRIENT_DIGITS = 4
+CATALOG_FORMAT = 2  # bump when build_catalog derives the shared snapshot differently
+
+# Compact per-food record; FoodID is None for a DisplayMeal average
+FoodRecord = namedtuple("FoodRecord", ["FoodID", "Meal", "DisplayMeal"] + NUTRIENTS)
+
+
+# -------------------------------------
+# Meal Name Cleanup
+# -------------------------------------
+def get_display_name(desc):
+    if pd.isna(desc):
+        return "Unknown"
+    desc = str(desc).lower()
+    if "rice" in desc:
+        if "brown" in desc:
+            return "Brown Rice"
+        elif "wild" in desc:
+            return "Wild Rice"
+        return "White Rice"
+    if "chick" in desc:
+        return "Chicken"
+    if "tomato" in desc:
+        return "Tomato"
+    if "butter" in desc:
+        return "Butter"
+    if "milk" in desc:
+        return "Milk"
+    if "soup" in desc:
+        if "tomato" in desc:
+            return "Tomato Soup"
+        if "chick" in desc:
+            return "Chicken Soup"
+    return str(desc).split(",")[0].title()
+
+
+# Junk / processed foods, left out of recommendations
+junk_keywords = [
+    "candy", "toffee", "syrup", "sugar", "frosting", "gelatin",
+    "powder", "mix", "drink", "beverage", "jelly", "dessert",
+    "cookie", "cake", "brownie", "marshmallow", "gum", "cola",
+    "chewing", "pudding", "cream", "whipped", "ice cream",
+    "liver", "sausage", "paste", "hot dog", "corn syrup",
+    "oil spray", "shortening", "margarine", "oleo", "yeast extract",
+    "gel", "flavoring", "confection", "capsule", "tablet", "supplement"
+]
+
+
+def is_junk_or_weird(meal_name):
+    meal = meal_name.lower()
+    return any(j in meal for j in junk_keywords)
+
+
+# -------------------------------------
+# Catalog
+# -------------------------------------
+class Catalog:
+    """
+    Parsed USDA catalog with hash indexes:
+      by_id       USDA ID     -> FoodRecord for that exact food
+      by_display  DisplayMeal -> FoodRecord averaged over all its variants
+      variants    DisplayMeal -> tuple of USDA IDs grouped under that name
+
+    USDA values are per 100 g. per_gram is a dense float32 matrix of every
+    food's nutrients per gram (rows: USDA IDs first, then DisplayMeal
+    averages; columns: `nutrients`, NUTRIENTS first, then any extra USDA
+    columns), so nutrients for any number of log entries are one row-gather
+    and multiply by their grams, and daily totals a matrix sum, however many
+    nutrient columns there are. The frames only carry NUTRIENTS.
+    """
+
+    def __init__(self, foods, friendly_df, per_gram, portions, nutrients=NUTRIENTS):
+        self.foods = foods  # USDA rows with DisplayMeal, indexed by ID
+        self.friendly_df = friendly_df  # one row per DisplayMeal, nutrients averaged
+        self.per_gram = per_gram
+        self.portions = portions  # grams per unit for every DisplayMeal (variants share their group's)
+        self.nutrients = list(nutrients)  # per_gram's columns
+        self.nutrient_index = {name: i for i, name in enumerate(self.nutrients)}
+        self.extra_nutrients = self.nutrients[len(NUTRIENTS):]
+
+        self.by_id = {
+            int(food_id): FoodRecord(int(food_id), meal, display, *macros)
+            for food_id, meal, display, *macros in foods[["Meal", "DisplayMeal"] + NUTRIENTS].itertuples()
+        }
+        self.by_display = {
+            display: FoodRecord(None, display, display, *macros)
+            for _, display, *macros in friendly_df[["DisplayMeal"] + NUTRIENTS].itertuples()
+        }
+        self.variants = {
+            display: tuple(int(i) for i in ids)
+            for display, ids in foods.groupby("DisplayMeal").groups.items()
+        }
+
+        self.id_rows = {food_id: i for i, food_id in enumerate(self.by_id)}
+        self.display_rows = {
+            display: len(self.id_rows) + j for j, display in enumerate(self.by_display)
+        }
+        # Same order as id_rows / display_rows, so get_indexer() resolves a whole log at once
+        self._id_lookup = pd.Index(list(self.id_rows), dtype="float64")
+        self._display_lookup = pd.Index(list(self.display_rows))
+
+    def get(self, food_id=None, display=None):
+        """Looks up a specific USDA food by ID, falling back to the DisplayMeal average."""
+        if food_id is not None and not pd.isna(food_id):
+            record = self.by_id.get(int(food_id))
+            if record is not None:
+                return record
+        if display is not None:
+            return self.by_display.get(display)
+        return None
+
+    def row_of(self, record):
+        """per_gram row of a FoodRecord."""
+        if record.FoodID is not None:
+            return self.id_rows[record.FoodID]
+        return self.display_rows[record.DisplayMeal]
+
+    def nutrients_in(self, record, grams, columns=None):
+        """Nutrients (default: all of them) in `grams` of a food, as a dict of floats."""
+        columns = self.nutrients if columns is None else columns
+        values = self.per_gram[self.row_of(record), [self.nutrient_index[c] for c in columns]]
+        return dict(zip(columns, np.round(values.astype(float) * grams, NUTRIENT_DIGITS).tolist()))
+
+    def macros(self, record, grams):
+        """NUTRIENTS in `grams` of a food, as a dict of floats."""
+        return self.nutrients_in(record, grams, NUTRIENTS)
+
+    def _resolve(self, df):
+        """per_gram rows and grams of log entries, and which entries have both."""
+        food_ids = pd.to_numeric(df["FoodID"], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+        rows = self._id_lookup.get_indexer(food_ids)
+        missing = rows < 0
+        if missing.any():
+            display = self._display_lookup.get_indexer(df["Meal"].to_numpy()[missing])
+            rows[missing] = np.where(display >= 0, display + len(self.id_rows), -1)
+        grams = pd.to_numeric(df["Grams"], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+        ok = (rows >= 0) & ~np.isnan(grams)
+        return rows, grams, ok
+
+    def to_grams(self, record, quantity, unit):
+        return quantity * self.portions.grams_per_unit(record.DisplayMeal, unit)
+
+    @profiled("catalog.recompute_macros", "derive")
+    def recompute_macros(self, df):
+        """
+        Vectorized macro recomputation for log entries that store Grams.
+        Rows are resolved by FoodID, falling back to the Meal's DisplayMeal
+        average; rows that can't be resolved keep their logged values.
+        """
+        df = df.copy()
+        df[NUTRIENTS] = df[NUTRIENTS].astype(float)
+        rows, grams, ok = self._resolve(df)
+        if ok.any():
+            per_gram = self.per_gram[rows[ok], :len(NUTRIENTS)]
+            df.loc[ok, NUTRIENTS] = np.round(per_gram * grams[ok, None], NUTRIENT_DIGITS)
+        return df
+
+    @profiled("catalog.nutrient_matrix", "derive")
+    def nutrient_matrix(self, df, columns=None):
+        """
+        float32 matrix (one row per log entry, one column per nutrient in
+        `columns`, default all): the food's per-gram row times its Grams.
+        The logged NUTRIENTS columns are used as they are (they may have been
+        edited); other nutrients are 0 where unknown (manual entries, foods
+        without that value).
+        """
+        columns = self.nutrients if columns is None else list(columns)
+        matrix = np.zeros((len(df), len(columns)), dtype=np.float32)
+        rows, grams, ok = self._resolve(df)
+        if ok.any():
+            cols = [self.nutrient_index[c] for c in columns]
+            matrix[ok] = self.per_gram[np.ix_(rows[ok], cols)] * grams[ok, None]
+            np.nan_to_num(matrix, copy=False)
+        for j, col in enumerate(columns):
+            if col in NUTRIENTS:
+                matrix[:, j] = pd.to_numeric(df[col], errors="coerce").fillna(0).to_numpy()
+        return matrix
+
+    def daily_nutrients(self, df, columns=None):
+        """Nutrient totals per Date of log entries (a DataFrame indexed by Date, one column per nutrient)."""
+        columns = self.nutrients if columns is None else list(columns)
+        codes, days = pd.factorize(df["Date"].astype(str), sort=True)
+        matrix = self.nutrient_matrix(df, columns)
+        if not len(df):
+            return pd.DataFrame(columns=columns, index=pd.Index([], name="Date"), dtype=float)
+        # Entries sorted by day, then one segmented sum over the whole matrix
+        order = np.argsort(codes, kind="stable")
+        starts = np.flatnonzero(np.r_[True, np.diff(codes[order]) != 0])
+        totals = np.add.reduceat(matrix[order], starts, axis=0, dtype=np.float64)
+        return pd.DataFrame(np.round(totals, NUTRIENT_DIGITS), index=pd.Index(days, name="Date"), columns=columns)
+
+    @profiled("catalog.search", "derive")
+    def search(self, text):
+        return self.friendly_df[self.friendly_df["DisplayMeal"]
+                                .str.contains(text, case=False, na=False, regex=False)]
+
+
+@profiled("catalog.build", "load")
+def build_catalog(usda_file=USDA_FILE, portions_file=PORTIONS_FILE):
+    foods = pd.read_csv(usda_file)
+    foods = foods.rename(columns=USDA_RENAMES)
+    for col in NUTRIENTS:
+        foods[col] = pd.to_numeric(foods[col], errors="coerce")
+    extra = [
+        col for col in foods.columns
+        if col not in ["ID", "Meal"] + NUTRIENTS and pd.api.types.is_numeric_dtype(foods[col])
+    ]
+    nutrients = NUTRIENTS + extra
+
+    foods["DisplayMeal"] = foods["Meal"].apply(get_display_name)
+    foods = foods.dropna(subset=["ID"]).set_index("ID")
+
+    averages = foods.groupby("DisplayMeal")[nutrients].mean()
+    per_gram = np.vstack([
+        foods[nutrients].to_numpy(dtype=np.float32),
+        averages.to_numpy(dtype=np.float32),
+    ]) / np.float32(100)
+    # Extra nutrients live only in per_gram
+    foods = foods[["Meal"] + NUTRIENTS + ["DisplayMeal"]]
+    friendly_df = averages[NUTRIENTS].reset_index()
+    portions = load_portion_table(list(friendly_df["DisplayMeal"]), portions_file)
+    return Catalog(foods, friendly_df, per_gram, portions, nutrients)
+
+
+# -------------------------------------
+# Shared snapshot (one copy per host)
+# -------------------------------------
+def catalog_arrays(catalog):
+    """The catalog's tables as flat arrays + layout, for shared_snapshot()."""
+    foods, foods_layout = frame_arrays(catalog.foods, "foods")
+    friendly, friendly_layout = frame_arrays(catalog.friendly_df, "friendly")
+    arrays = dict(foods, **friendly, per_gram=catalog.per_gram, portion_grams=catalog.portions.grams)
+    return arrays, {"foods": foods_layout, "friendly": friendly_layout, "nutrients": catalog.nutrients}
+
+
+def catalog_from_arrays(arrays, meta):
+    """
+    Catalog over (possibly memory-mapped, read-only) snapshot arrays. Only
+    the hash indexes are rebuilt per process; no CSV parsing or name cleanup.
+    """
+    friendly_df = attach_frame(arrays, meta["friendly"], "friendly")
+    portions = PortionTable(list(friendly_df["DisplayMeal"]), arrays["portion_grams"])
+    return Catalog(attach_frame(arrays, meta["foods"], "foods"), friendly_df, arrays["per_gram"], portions,
+                   meta["nutrients"])
+
+
+@lru_cache(maxsize=4)
+def _cached_catalog(usda_file, version, portions_version):
+    arrays, meta = shared_snapshot(
+        "catalog", [usda_file, PORTIONS_FILE],
+        lambda: catalog_arrays(build_catalog(usda_file)),
+        version=CATALOG_FORMAT,
+    )
+    return catalog_from_arrays(arrays, meta)
+
+
+@profiled("catalog.load", "load")
+def load_catalog(usda_file=USDA_FILE):
+    """
+    Catalog for the USDA file, built once per file version (USDA.csv and
+    portions.csv) and shared by every rerun / session in the process. The
+    tables themselves are a read-only snapshot mapped by every worker on
+    the host (see shared_store.py). Returns None if the file is missing.
+    """
+    version = file_signature(usda_file)
+    if version is None:
+        return None
+    portions_version = file_signature(PORTIONS_FILE)
+    return _cached_catalog(usda_file, tuple(version), tuple(portions_version or ()))
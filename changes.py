@@ -0,0 +1,141 @@
+# changes.py
+"""Per-user change feed of meal log adds / edits / deletes, read by cursor (see changes_since)."""
+import json
+import os
+import threading
+from datetime import datetime
+from functools import lru_cache
+
+from helpers import file_signature
+from profiling import profiled
+from write_queue import WRITE_QUEUE, json_state_writer
+
+COMPACT_EVENTS = 1000  # events kept before compaction...
+KEEP_EVENTS = 500      # ...and after it
+OPS = ("add", "edit", "delete")
+
+_lock = threading.Lock()  # one read-modify-stage of a feed at a time
+
+
+def changes_file(meals_file):
+    return os.path.splitext(meals_file)[0] + "_changes.json"
+
+
+# -------------------------------------
+# Reads
+# -------------------------------------
+@lru_cache(maxsize=64)
+def _cached_feed(path, version):
+    with open(path) as f:
+        return json.load(f)
+
+
+def _empty_feed():
+    return {"base": 0, "seq": 0, "events": []}
+
+
+def load_feed(meals_file):
+    """
+    The feed as last written by the app — the staged copy if a flush is
+    pending. A feed that no longer matches its log (edited outside the app)
+    is restarted at a new base. Shared between callers — treat as read-only.
+    """
+    path = changes_file(meals_file)
+    staged = WRITE_QUEUE.pending(path)
+    if staged is not None:
+        return json.loads(staged)
+    version = file_signature(path)
+    if version is None:
+        return _empty_feed()
+    try:
+        feed = _cached_feed(path, tuple(version))
+    except (ValueError, OSError):
+        feed = None
+
+    if feed is None or (WRITE_QUEUE.pending(meals_file) is None and
+                        feed.get("meals_signature") != file_signature(meals_file)):
+        # Imported here: meal_store records into this module
+        from meal_store import locked_log
+
+        seq = feed["seq"] + 1 if feed is not None else 1
+        feed = {"base": seq, "seq": seq, "events": []}
+        with locked_log(meals_file):
+            _save(meals_file, feed)
+    return feed
+
+
+@profiled("changes.since", "load")
+def changes_since(meals_file, cursor=None, limit=None):
+    """
+    Events after `cursor`, oldest first, at most `limit` of them:
+
+        {"cursor": <seq to ask from next>, "changes": [...], "more": bool, "reset": bool}
+
+    "reset" means the cursor is missing, older than the feed or from a feed
+    that was restarted: reload the whole log, then continue from "cursor".
+    """
+    feed = load_feed(meals_file)
+    if cursor is None or cursor < feed["base"] or cursor > feed["seq"]:
+        return {"cursor": feed["seq"], "changes": [], "more": False, "reset": True}
+
+    events = feed["events"]
+    start = cursor - feed["base"]  # events[i] has seq base + 1 + i
+    end = len(events) if limit is None else min(len(events), start + limit)
+    page = events[start:end]
+    return {
+        "cursor": page[-1]["seq"] if page else cursor,
+        "changes": page,
+        "more": end < len(events),
+        "reset": False,
+    }
+
+
+# -------------------------------------
+# Writes
+# -------------------------------------
+def _save(meals_file, feed):
+    # The log's signature is stamped at flush time, after the log itself has landed
+    WRITE_QUEUE.stage(changes_file(meals_file), json.dumps(feed), json_state_writer(
+        meals_signature=meals_file,
+    ))
+
+
+@profiled("changes.record", "write")
+def record(meals_file, op, entries):
+    """
+    Appends one `op` event per row of `entries` (a DataFrame of MEAL_COLS:
+    the new / edited entries, or the deleted ones). Call after staging the log.
+    """
+    if op not in OPS:
+        raise ValueError(f"unknown change {op!r}")
+    if entries.empty:
+        return
+    rows = json.loads(entries.to_json(orient="records"))  # NaN / NA -> null
+    at = datetime.now().isoformat(timespec="seconds")
+
+    with _lock:
+        feed = load_feed(meals_file)
+        seq, events = feed["seq"], list(feed["events"])
+        for row in rows:
+            seq += 1
+            events.append({
+                "seq": seq, "op": op, "EntryID": row["EntryID"], "Date": row["Date"], "at": at,
+                "entry": None if op == "delete" else row,
+            })
+        base = feed["base"]
+        if len(events) > COMPACT_EVENTS:
+            # The log already holds the state the dropped events led to
+            base += len(events) - KEEP_EVENTS
+            events = events[-KEEP_EVENTS:]
+        _save(meals_file, {"base": base, "seq": seq, "events": events})
+
+
+def touch(meals_file):
+    """
+    Re-stages the feed unchanged, after the log was rewritten without any
+    entry changing (archive compaction), so its signature stays current.
+    """
+    with _lock:
+        path = changes_file(meals_file)
+        if WRITE_QUEUE.pending(path) is not None or file_signature(path) is not None:
+            _save(meals_file, load_feed(meals_file))
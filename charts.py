@@ -0,0 +1,215 @@
+# charts.py
+"""Vega-Lite specs for the Visualization page, drawn in the browser by st.vega_lite_chart."""
+import pandas as pd
+
+from nutrition_stats import MACROS, WINDOWS
+
+CALORIES_COLOR = "#66B3FF"
+GOAL_COLOR = "#FF9999"
+# matplotlib's default cycle, so exported PNGs and live charts use the same macro colors
+MACRO_SCALE = {"domain": MACROS, "range": ["#1f77b4", "#ff7f0e", "#2ca02c"]}
+DATE_FORMATS = {"Week": "%b %d", "Month": "%b %d", "Year": "%b"}
+
+
+def _values(df, digits=1):
+    """Rows as JSON-ready dicts: dates as ISO strings, floats rounded, NaN -> None."""
+    df = df.copy()
+    for col in df.columns:
+        if pd.api.types.is_float_dtype(df[col]):
+            df[col] = df[col].round(digits)
+        elif pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = df[col].dt.strftime("%Y-%m-%d")
+    return df.astype(object).where(df.notna(), None).to_dict("records")
+
+
+def _date_axis(title="Date", fmt=None):
+    # ISO dates parse as UTC midnight; a UTC scale keeps them on the right day in every timezone
+    axis = {"labelAngle": -45}
+    if fmt:
+        axis["format"] = fmt
+    return {"field": "Date", "type": "temporal", "title": title, "scale": {"type": "utc"}, "axis": axis}
+
+
+def _macro_bars(values, category=None, title=None, horizontal=False):
+    """Protein / carbs / fat stacked into one bar per `category` value (a single bar if None)."""
+    encoding = {
+        "x" if horizontal else "y": {"field": "Grams", "type": "quantitative", "title": "Grams", "stack": "zero"},
+        "color": {"field": "Nutrient", "type": "nominal", "scale": MACRO_SCALE, "title": None},
+        "tooltip": [{"field": "Nutrient"}, {"field": "Grams", "format": ".1f"}],
+    }
+    if category:
+        encoding["y" if horizontal else "x"] = {"field": category, "type": "nominal", "title": None,
+                                                "axis": {"labelAngle": 0}}
+        encoding["tooltip"].insert(0, {"field": category})
+    return {
+        "title": title,
+        "data": {"values": values},
+        "transform": [{"fold": MACROS, "as": ["Nutrient", "Grams"]}],
+        "mark": "bar",
+        "encoding": encoding,
+    }
+
+
+# ---------------------------
+# Range charts
+# ---------------------------
+def calories_over_time(df_range, range_option, goal_for):
+    calories_daily = df_range.groupby("Date")["Calories"].sum()
+    if calories_daily.empty:
+        return None
+    data = pd.DataFrame({
+        "Date": [str(d) for d in calories_daily.index],
+        "Calories": calories_daily.to_numpy(dtype=float),
+        "Goal": [goal_for(d) for d in calories_daily.index],
+    })
+    return {
+        "data": {"values": _values(data)},
+        "height": 260,
+        "encoding": {
+            "x": _date_axis(fmt=DATE_FORMATS.get(range_option, "%b %Y")),
+            "tooltip": [{"field": "Date", "type": "nominal"},
+                        {"field": "Calories", "format": ".0f"}, {"field": "Goal"}],
+        },
+        "layer": [
+            {"mark": {"type": "line", "point": True, "strokeWidth": 2, "color": CALORIES_COLOR},
+             "encoding": {"y": {"field": "Calories", "type": "quantitative", "title": "Calories"}}},
+            {"mark": {"type": "line", "interpolate": "step-after", "strokeDash": [6, 4], "color": GOAL_COLOR},
+             "encoding": {"y": {"field": "Goal", "type": "quantitative"}}},
+        ],
+    }
+
+
+def rolling_calories(daily):
+    series = {f"Calories_{w}d": f"{w}-day mean" for w in WINDOWS}
+    series["Calories_ema7"] = "EMA (7)"
+    data = daily[list(series)].rename(columns=series)
+    data.insert(0, "Daily", daily["Calories"].where(daily["Logged"]))
+    data.insert(0, "Date", daily.index)
+    return {
+        "title": "Rolling Calorie Averages",
+        "data": {"values": _values(data)},
+        "height": 260,
+        "encoding": {"x": _date_axis(title=None)},
+        "layer": [
+            {"mark": {"type": "circle", "size": 12, "opacity": 0.3, "color": CALORIES_COLOR},
+             "encoding": {"y": {"field": "Daily", "type": "quantitative", "title": "Calories"}}},
+            {"transform": [{"fold": list(series.values()), "as": ["Series", "Mean"]}],
+             "mark": {"type": "line", "strokeWidth": 1.5},
+             "encoding": {"y": {"field": "Mean", "type": "quantitative"},
+                          "color": {"field": "Series", "type": "nominal", "sort": list(series.values()),
+                                    "title": None}}},
+        ],
+    }
+
+
+def macro_ratio_trend(daily):
+    data = daily[[f"{m}Share_7d" for m in MACROS]].fillna(0) * 100
+    data.columns = MACROS
+    data.insert(0, "Date", daily.index)
+    return {
+        "title": "Macro Ratio Trend (7-day)",
+        "data": {"values": _values(data)},
+        "height": 260,
+        "transform": [{"fold": MACROS, "as": ["Nutrient", "Share"]}],
+        "mark": {"type": "area", "opacity": 0.8},
+        "encoding": {
+            "x": _date_axis(title=None),
+            "y": {"field": "Share", "type": "quantitative", "stack": "zero",
+                  "scale": {"domain": [0, 100]}, "title": "% of macro calories"},
+            "color": {"field": "Nutrient", "type": "nominal", "scale": MACRO_SCALE, "title": None},
+            "order": {"field": "Nutrient"},
+        },
+    }
+
+
+def weekday_calories(weekday):
+    data = pd.DataFrame({
+        "Day": list(weekday.index),
+        "Calories": weekday["Calories"].fillna(0).to_numpy(dtype=float),
+        "Weekend": [False] * 5 + [True] * 2,
+    })
+    return {
+        "title": "Average Calories by Weekday",
+        "data": {"values": _values(data)},
+        "height": 260,
+        "mark": "bar",
+        "encoding": {
+            "x": {"field": "Day", "type": "ordinal", "sort": list(weekday.index), "title": None,
+                  "axis": {"labelAngle": 0}},
+            "y": {"field": "Calories", "type": "quantitative", "title": "Avg Calories"},
+            "color": {"field": "Weekend", "type": "nominal", "legend": None,
+                      "scale": {"domain": [False, True], "range": [CALORIES_COLOR, GOAL_COLOR]}},
+            "tooltip": [{"field": "Day"}, {"field": "Calories", "format": ".0f"}],
+        },
+    }
+
+
+# ---------------------------
+# Selected-day charts
+# ---------------------------
+def _pie(labels, amounts, title, color_scale=None):
+    data = pd.DataFrame({"Part": labels, "Amount": [float(a) for a in amounts]})
+    if data["Amount"].sum() <= 0:
+        return None
+    color = {"field": "Part", "type": "nominal", "title": None, "sort": labels}
+    if color_scale:
+        color["scale"] = color_scale
+    return {
+        "title": title,
+        "data": {"values": _values(data)},
+        "transform": [{"joinaggregate": [{"op": "sum", "field": "Amount", "as": "Total"}]},
+                      {"calculate": "datum.Amount / datum.Total", "as": "Share"}],
+        "mark": {"type": "arc"},
+        "encoding": {
+            "theta": {"field": "Amount", "type": "quantitative", "stack": True},
+            "color": color,
+            "tooltip": [{"field": "Part", "title": "Part"}, {"field": "Amount", "format": ".1f"},
+                        {"field": "Share", "format": ".1%"}],
+        },
+    }
+
+
+def macro_pie(total_protein, total_carbs, total_fat):
+    return _pie(MACROS, [total_protein, total_carbs, total_fat], "Macronutrient Distribution", MACRO_SCALE)
+
+
+def calorie_pie(total_calories, remaining_calories, calorie_goal):
+    return _pie(["Consumed", "Remaining"], [total_calories, remaining_calories],
+                f"Calories (Goal: {calorie_goal} kcal)",
+                {"domain": ["Consumed", "Remaining"], "range": ["#1f77b4", "#ff7f0e"]})
+
+
+def macros_by_meal_type(day_df):
+    meal_totals = day_df.groupby("MealType")[MACROS].sum().reset_index()
+    if meal_totals.empty:
+        return None
+    spec = _macro_bars(_values(meal_totals), "MealType", "Macros by Meal Type")
+    spec["height"] = 260
+    return spec
+
+
+def cumulative_macros(day_df):
+    day_sorted = day_df.sort_values("DateTime")
+    if day_sorted.empty:
+        return None
+    data = day_sorted[MACROS].cumsum()
+    data.insert(0, "Time", pd.to_datetime(day_sorted["DateTime"]).dt.strftime("%Y-%m-%dT%H:%M:%S"))
+    return {
+        "title": "Cumulative Macronutrients",
+        "data": {"values": _values(data)},
+        "height": 260,
+        "transform": [{"fold": MACROS, "as": ["Nutrient", "Grams"]}],
+        "mark": {"type": "line", "point": True},
+        "encoding": {
+            "x": {"field": "Time", "type": "temporal", "title": None, "axis": {"format": "%H:%M"}},
+            "y": {"field": "Grams", "type": "quantitative", "title": "Grams"},
+            "color": {"field": "Nutrient", "type": "nominal", "scale": MACRO_SCALE, "title": None},
+        },
+    }
+
+
+def macro_proportions(total_protein, total_carbs, total_fat):
+    values = _values(pd.DataFrame([{"Protein": total_protein, "Carbs": total_carbs, "Fat": total_fat}], dtype=float))
+    spec = _macro_bars(values, title="Macro Proportion (Horizontal)", horizontal=True)
+    spec["height"] = 60
+    return spec
@@ -0,0 +1,202 @@
+# food_index.py
+import json
+import os
+from datetime import datetime
+
+import pandas as pd
+
+import archive
+from helpers import file_signature, get_meals_file, get_food_index_file
+from meal_store import locked_log, read_raw_meals
+from profiling import profiled
+from write_queue import WRITE_QUEUE, json_state_writer
+
+MEAL_TYPES = ["Breakfast", "Lunch", "Dinner", "Snack"]
+
+# Values copied from the most recent entry so a quick add re-logs it as-is
+ENTRY_FIELDS = ["Meal", "FoodID", "Quantity", "Unit", "Grams", "Servings",
+                "Calories", "Protein", "Carbs", "Fat"]
+
+
+def time_of_day(hour):
+    if 5 <= hour < 11:
+        return "Morning"
+    if 11 <= hour < 16:
+        return "Afternoon"
+    if 16 <= hour < 22:
+        return "Evening"
+    return "Night"
+
+
+def food_key(row):
+    food_id = row.get("FoodID")
+    if food_id is not None and not pd.isna(food_id):
+        return f"id:{int(food_id)}"
+    return f"meal:{row.get('Meal')}"
+
+
+def _clean(value):
+    """JSON-safe scalar (NaN/NA → None, numpy → python)."""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if hasattr(value, "item"):
+        return value.item()
+    return value
+
+
+class FoodFrequencyIndex:
+    """
+    Per-user counts of how often each food is logged, split by MealType and
+    time of day, plus the last-used entry values and pinned favorites.
+
+    Updated as meals are added/deleted so Quick Add never scans the log or
+    searches the catalog.
+    """
+
+    def __init__(self, username):
+        self.username = username
+        self.foods = {}       # key -> stats dict
+        self.favorites = []   # keys, in pin order
+        self.meals_signature = None
+
+    # ---------------------------
+    # Updates
+    # ---------------------------
+    def record(self, row, count=1):
+        key = food_key(row)
+        stats = self.foods.setdefault(key, {
+            "count": 0,
+            "types": {},
+            "times": {},
+            "last": "",
+        })
+
+        logged_at = str(_clean(row.get("DateTime")) or "")
+        try:
+            bucket = time_of_day(datetime.fromisoformat(logged_at).hour)
+        except ValueError:
+            bucket = None
+
+        stats["count"] += count
+        meal_type = _clean(row.get("MealType"))
+        stats["types"][meal_type] = stats["types"].get(meal_type, 0) + count
+        if bucket:
+            stats["times"][bucket] = stats["times"].get(bucket, 0) + count
+
+        if count > 0 and logged_at >= stats["last"]:
+            stats["last"] = logged_at
+            stats["entry"] = {f: _clean(row.get(f)) for f in ENTRY_FIELDS}
+
+        if stats["count"] <= 0 and key not in self.favorites:
+            del self.foods[key]
+
+    def remove(self, row):
+        if food_key(row) in self.foods:
+            self.record(row, count=-1)
+
+    def toggle_favorite(self, key):
+        if key in self.favorites:
+            self.favorites.remove(key)
+        elif key in self.foods:
+            self.favorites.append(key)
+
+    # ---------------------------
+    # Queries
+    # ---------------------------
+    def top_foods(self, meal_type=None, bucket=None, n=6):
+        """
+        Most likely foods for a MealType / time of day: count within the meal
+        type weighs most, then the time of day, then overall count and recency.
+        """
+        def score(item):
+            _, stats = item
+            return (
+                stats["types"].get(meal_type, 0) * 2 + stats["times"].get(bucket, 0),
+                stats["count"],
+                stats["last"],
+            )
+
+        ranked = sorted(
+            (item for item in self.foods.items() if item[0] not in self.favorites and "entry" in item[1]),
+            key=score, reverse=True
+        )
+        return ranked[:n]
+
+    def favorite_foods(self):
+        return [(k, self.foods[k]) for k in self.favorites if "entry" in self.foods.get(k, {})]
+
+    def likely_meal_type(self, bucket):
+        """MealType most often logged at this time of day (by entry timestamps)."""
+        totals = {}
+        for stats in self.foods.values():
+            if stats["times"].get(bucket):
+                for meal_type, count in stats["types"].items():
+                    totals[meal_type] = totals.get(meal_type, 0) + count
+        if not totals:
+            return None
+        return max(totals, key=totals.get)
+
+    # ---------------------------
+    # Persistence
+    # ---------------------------
+    @profiled("food_index.rebuild", "derive")
+    def rebuild(self):
+        """Full rescan of the meals file and its archive — only used when the cached index is stale."""
+        self.foods = {}
+        meals_file = get_meals_file(self.username)
+        frames = [archive.read_archived(meals_file), read_raw_meals(meals_file)]
+        frames = [df for df in frames if df is not None and not df.empty]
+        if frames:
+            df = pd.concat(frames, ignore_index=True)
+            for row in df.sort_values("DateTime").to_dict("records"):
+                self.record(row)
+
+    @profiled("food_index.save", "write")
+    def save(self):
+        state = {
+            "foods": self.foods,
+            "favorites": self.favorites,
+        }
+        WRITE_QUEUE.stage(get_food_index_file(self.username), json.dumps(state), json_state_writer(
+            meals_signature=get_meals_file(self.username),
+        ))
+
+
+@profiled("food_index.load", "load")
+def load_food_index(username):
+    """
+    Loads the cached frequency index, rebuilding counts from the meals file
+    only if it changed outside the app. Favorites survive a rebuild.
+    """
+    index = FoodFrequencyIndex(username)
+
+    index_file = get_food_index_file(username)
+    staged = WRITE_QUEUE.pending(index_file)
+    if staged is not None:
+        # Not flushed yet, so newer than anything on disk
+        state = json.loads(staged)
+        index.favorites = state["favorites"]
+        index.foods = state["foods"]
+        return index
+
+    state = None
+    if os.path.exists(index_file):
+        try:
+            with open(index_file, "r") as f:
+                state = json.load(f)
+        except (ValueError, OSError):
+            state = None
+
+    if state is not None:
+        index.favorites = state.get("favorites", [])
+
+    if state is None or state.get("meals_signature") != file_signature(get_meals_file(username)):
+        # Under the log's lock, so the rebuilt counts are flushed before anyone else changes the log
+        with locked_log(get_meals_file(username)):
+            index.rebuild()
+            index.save()
+        return index
+
+    index.foods = state["foods"]
+    index.meals_signature = state["meals_signature"]
+    return index
@@ -1,8 +1,11 @@
 import json
 import os
 from datetime import date
+from functools import lru_cache
 import streamlit as st
 
+USERS_FILE = "data/users.json"
+
 # -------------------------------------
 # Get the correct log file per user
 # -------------------------------------
@@ -62,3 +65,92 @@ def load_today_logs():
         logs[today_str] = []
 
     return logs, today_str
+
+
+# -------------------------------------
+# File version (used to invalidate caches)
+# -------------------------------------
+def file_signature(path):
+    """(mtime_ns, size) of a file, or None if it does not exist."""
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+# -------------------------------------
+# Per-user meal / goal files
+# -------------------------------------
+def get_meals_file(username):
+    # Demo user → shared demo meals file
+    if username is None or username == "demo":
+        return "data/meals.csv"
+    return f"data/{username}_meals.csv"
+
+
+def get_goal_file(username):
+    if username is None or username == "demo":
+        return "data/goal.txt"
+    return f"data/goal_{username}.txt"
+
+
+def get_goal_history_file(username):
+    if username is None or username == "demo":
+        return "data/goal_history.csv"
+    return f"data/goal_history_{username}.csv"
+
+
+def get_adherence_file(username):
+    if username is None or username == "demo":
+        return "data/adherence.json"
+    return f"data/adherence_{username}.json"
+
+
+def get_food_index_file(username):
+    if username is None or username == "demo":
+        return "data/food_index.json"
+    return f"data/food_index_{username}.json"
+
+
+def get_insights_file(username):
+    if username is None or username == "demo":
+        return "data/insights.json"
+    return f"data/insights_{username}.json"
+
+
+def get_reports_dir(username):
+    if username is None or username == "demo":
+        return "data/reports"
+    return f"data/{username}_reports"
+
+
+# -------------------------------------
+# Users (shared by the app's login and the HTTP API)
+# -------------------------------------
+def load_users():
+    with open(USERS_FILE, "r") as f:
+        return json.load(f)
+
+
+def save_users(users):
+    with open(USERS_FILE, "w") as f:
+        json.dump(users, f, indent=4)
+
+
+@lru_cache(maxsize=2)
+def _users_by_name(version):
+    return {u["username"]: u for u in load_users()}
+
+
+def find_user(username, password):
+    """
+    The user record matching these credentials, or None. users.json is
+    parsed and indexed by username once per file version.
+    """
+    version = file_signature(USERS_FILE)
+    if version is None:
+        return None
+    user = _users_by_name(tuple(version)).get(username)
+    if user is None or user["password"] != password:
+        return None
+    return user
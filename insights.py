@@ -0,0 +1,366 @@
+# insights.py
+"""
+Nightly batch job: a short weekly AI insight for every user, shown on the Home page.
+
+    python -m insights [--as-of YYYY-MM-DD] [--concurrency 8] [--rate 5] [--base-url URL]
+"""
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import os
+import random
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+import archive
+from adherence import AdherenceTracker, DEFAULT_GOAL
+from helpers import (
+    file_signature, get_meals_file, get_goal_file,
+    get_goal_history_file, get_insights_file, load_users
+)
+from nutrition_stats import NUTRIENTS, KCAL_PER_GRAM
+from write_queue import atomic_write, write_text
+
+MODEL = "gpt-4o-mini"
+MAX_TOKENS = 200
+WEEK = 7
+PROTEIN_LOW_SHARE = 0.15   # a day is "low protein" under 15% of calories from protein
+
+DEFAULT_CONCURRENCY = 8    # requests in flight
+DEFAULT_RATE = 5.0         # requests started per second (0 = unlimited)
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 1.0         # seconds before the first retry, doubled each time
+BACKOFF_MAX = 30.0
+
+logger = logging.getLogger("nutrition.insights")
+
+
+# -------------------------------------
+# Weekly stats (all users at once)
+# -------------------------------------
+def users_with_logs():
+    return [u["username"] for u in load_users() if file_signature(get_meals_file(u["username"]))]
+
+
+def _goal_history(username):
+    """
+    Goal changes as load_goal_history returns them (last change of a day wins),
+    read with the csv module since it's a handful of rows, and without seeding
+    files for users who never set a goal.
+    """
+    latest = {}
+    try:
+        with open(get_goal_history_file(username), newline="") as f:
+            for row in sorted(csv.DictReader(f), key=lambda r: r["DateTime"] or ""):
+                try:
+                    latest[row["Date"]] = int(float(row["Goal"]))
+                except (TypeError, ValueError):
+                    continue
+    except OSError:
+        pass
+    if latest:
+        return sorted(latest.items())
+    try:
+        with open(get_goal_file(username)) as f:
+            return [("", int(f.read().strip()))]
+    except (OSError, ValueError):
+        return [("", DEFAULT_GOAL)]
+
+
+def _read_window(meals_file, start, end):
+    frames = []
+    try:
+        df = pd.read_csv(meals_file, usecols=["Date"] + NUTRIENTS, dtype={"Date": str})
+        frames.append(df[(df["Date"] >= start) & (df["Date"] <= end)])
+    except (OSError, ValueError, pd.errors.EmptyDataError):
+        pass
+    # Only for an --as-of older than the hot window
+    if archive.covers(meals_file, start):
+        frames.append(archive.read_archived(meals_file, start, end)[["Date"] + NUTRIENTS])
+    frames = [df for df in frames if len(df)]
+    return pd.concat(frames, ignore_index=True) if frames else None
+
+
+def weekly_stats(usernames, as_of):
+    """
+    One row per user for the week ending on `as_of` (inclusive): days logged,
+    average calories vs. goal, days over goal / low on protein, average macros
+    and the previous week's average for the trend. Meals of all users are
+    summed onto a (user, day, nutrient) grid with a single bincount per nutrient.
+    """
+    n_days = 2 * WEEK  # this week plus the one before
+    first = as_of - timedelta(days=n_days - 1)
+    start, end = first.isoformat(), as_of.isoformat()
+
+    codes, day_idx, values = [], [], []
+    for code, username in enumerate(usernames):
+        df = _read_window(get_meals_file(username), start, end)
+        if df is None:
+            continue
+        days = pd.to_datetime(df["Date"], errors="coerce").to_numpy("datetime64[D]")
+        ok = ~np.isnat(days)
+        codes.append(np.full(ok.sum(), code))
+        day_idx.append((days[ok] - np.datetime64(first)).astype(np.int64))
+        values.append(df[NUTRIENTS].to_numpy(dtype=float)[ok])
+
+    n_users = len(usernames)
+    totals = np.zeros((n_users, n_days, len(NUTRIENTS)))
+    logged = np.zeros((n_users, n_days), dtype=bool)
+    if codes:
+        flat = np.concatenate(codes) * n_days + np.concatenate(day_idx)
+        values = np.nan_to_num(np.concatenate(values))
+        for j in range(len(NUTRIENTS)):
+            totals[:, :, j] = np.bincount(flat, weights=values[:, j], minlength=n_users * n_days).reshape(n_users, n_days)
+        logged = (np.bincount(flat, minlength=n_users * n_days) > 0).reshape(n_users, n_days)
+
+    calendar = [(first + timedelta(days=i)).isoformat() for i in range(n_days)]
+    goals = np.empty((n_users, n_days))
+    for code, username in enumerate(usernames):
+        tracker = AdherenceTracker(username)
+        tracker._set_goal_history(_goal_history(username))
+        goals[code] = [tracker.goal_for(day) for day in calendar]
+
+    week, prev = totals[:, WEEK:], totals[:, :WEEK]
+    week_logged = logged[:, WEEK:]
+    calories = week[:, :, 0]
+    days_logged = week_logged.sum(axis=1)
+    prev_days = logged[:, :WEEK].sum(axis=1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        protein_share = week[:, :, 1] * KCAL_PER_GRAM[0] / calories
+        over = week_logged & (calories > goals[:, WEEK:])
+        averages = week.sum(axis=1) / days_logged[:, None]
+        prev_avg = prev[:, :, 0].sum(axis=1) / prev_days
+
+    return pd.DataFrame({
+        "week_start": calendar[WEEK],
+        "week_end": end,
+        "days_logged": days_logged,
+        "avg_calories": averages[:, 0],
+        "goal": goals[:, -1],
+        "days_over_goal": over.sum(axis=1),
+        "days_met": (week_logged & ~over).sum(axis=1),
+        "low_protein_days": (week_logged & (protein_share < PROTEIN_LOW_SHARE)).sum(axis=1),
+        "avg_protein": averages[:, 1],
+        "avg_carbs": averages[:, 2],
+        "avg_fat": averages[:, 3],
+        "prev_avg_calories": prev_avg,
+    }, index=pd.Index(usernames, name="username"))
+
+
+def _stats_record(row):
+    """A stats row as plain JSON values (rounded, NaN -> None), so stored and fresh stats compare equal."""
+    record = {}
+    for key, value in row.items():
+        if isinstance(value, str):
+            record[key] = value
+        elif pd.isna(value):
+            record[key] = None
+        elif key.startswith("avg_") or key.startswith("prev_"):
+            record[key] = round(float(value), 1)
+        else:
+            record[key] = int(value)
+    return record
+
+
+def build_messages(stats):
+    lines = [
+        f"Week: {stats['week_start']} to {stats['week_end']}",
+        f"Days logged: {stats['days_logged']} of {WEEK}",
+        f"Average calories on logged days: {stats['avg_calories']:.0f} kcal (daily goal {stats['goal']} kcal)",
+        f"Days over goal: {stats['days_over_goal']}",
+        f"Days with protein under {PROTEIN_LOW_SHARE:.0%} of calories: {stats['low_protein_days']}",
+        f"Average macros: protein {stats['avg_protein']:.0f} g, carbs {stats['avg_carbs']:.0f} g, "
+        f"fat {stats['avg_fat']:.0f} g",
+    ]
+    if stats["prev_avg_calories"] is not None:
+        lines.append(f"Previous week's average: {stats['prev_avg_calories']:.0f} kcal")
+    return [
+        {"role": "system", "content": (
+            "You are a friendly nutrition coach. Summarize the user's week in 2-3 sentences "
+            "using only the numbers given, then give one practical tip for next week. "
+            "No medical advice, no extreme dieting."
+        )},
+        {"role": "user", "content": "\n".join(lines)},
+    ]
+
+
+# -------------------------------------
+# Stored insights (read by the Home page)
+# -------------------------------------
+def load_insight(username):
+    try:
+        with open(get_insights_file(username)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_insight(username, insight):
+    atomic_write(get_insights_file(username), json.dumps(insight), write_text)
+
+
+def _is_current(username, as_of, stats):
+    stored = load_insight(username)
+    return stored is not None and stored.get("as_of") == as_of.isoformat() and stored.get("stats") == stats
+
+
+# -------------------------------------
+# Concurrent LLM requests
+# -------------------------------------
+class RateLimiter:
+    """Token bucket: at most `rate` acquisitions per second, bursting up to `burst`."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        if not self.rate:
+            return
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def _retry_delay(error, attempt):
+    response = getattr(error, "response", None)
+    if response is not None:
+        try:
+            return min(float(response.headers.get("retry-after")), BACKOFF_MAX)
+        except (TypeError, ValueError):
+            pass
+    # Full jitter, so users that failed together don't retry together
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempt - 1)))
+
+
+async def request_insight(client, limiter, messages, model=MODEL, max_attempts=MAX_ATTEMPTS):
+    import openai
+
+    retryable = (openai.RateLimitError, openai.InternalServerError,
+                 openai.APITimeoutError, openai.APIConnectionError)
+    for attempt in range(1, max_attempts + 1):
+        await limiter.acquire()
+        try:
+            response = await client.chat.completions.create(
+                model=model, messages=messages, max_tokens=MAX_TOKENS, temperature=0.7
+            )
+            return response.choices[0].message.content.strip()
+        except retryable as e:
+            if attempt == max_attempts:
+                raise
+            delay = _retry_delay(e, attempt)
+            logger.info("retrying in %.1f s after %s (attempt %d)", delay, type(e).__name__, attempt)
+            await asyncio.sleep(delay)
+
+
+async def generate_insights(jobs, client, as_of, concurrency=DEFAULT_CONCURRENCY, rate=DEFAULT_RATE,
+                            model=MODEL, max_attempts=MAX_ATTEMPTS):
+    """
+    Runs `jobs` [(username, stats), ...] through a pool of `concurrency`
+    workers sharing one rate limiter; each insight is saved as it arrives.
+    Returns (generated, failed) counts.
+    """
+    queue = asyncio.Queue()
+    for job in jobs:
+        queue.put_nowait(job)
+    limiter = RateLimiter(rate)
+    counts = {"generated": 0, "failed": 0}
+
+    async def worker():
+        while not queue.empty():
+            username, stats = queue.get_nowait()
+            try:
+                text = await request_insight(client, limiter, build_messages(stats), model, max_attempts)
+            except Exception:
+                logger.exception("no insight for %s", username)
+                counts["failed"] += 1
+                continue
+            save_insight(username, {
+                "as_of": as_of.isoformat(),
+                "generated_at": datetime.now().strftime("%Y-%m-%d %H:%M"),
+                "model": model,
+                "stats": stats,
+                "text": text,
+            })
+            counts["generated"] += 1
+
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    return counts["generated"], counts["failed"]
+
+
+# -------------------------------------
+# Batch job
+# -------------------------------------
+def run(as_of=None, usernames=None, concurrency=DEFAULT_CONCURRENCY, rate=DEFAULT_RATE,
+        model=MODEL, max_attempts=MAX_ATTEMPTS, base_url=None, force=False):
+    """Generates missing or outdated insights for the week ending `as_of` (default: yesterday)."""
+    from openai import AsyncOpenAI
+
+    as_of = as_of or date.today() - timedelta(days=1)
+    usernames = users_with_logs() if usernames is None else list(usernames)
+
+    start = time.perf_counter()
+    stats = weekly_stats(usernames, as_of)
+    jobs, skipped = [], 0
+    for username, row in stats.iterrows():
+        record = _stats_record(row)
+        if not record["days_logged"]:
+            continue
+        if not force and _is_current(username, as_of, record):
+            skipped += 1
+        else:
+            jobs.append((username, record))
+    logger.info("stats for %d users in %.2f s: %d to generate, %d already current",
+                len(usernames), time.perf_counter() - start, len(jobs), skipped)
+
+    generated = failed = 0
+    if jobs:
+        base_url = base_url or os.getenv("OPENAI_BASE_URL")
+        client = AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY") or ("local" if base_url else None),
+            base_url=base_url, max_retries=0,  # retries are ours, so they go through the rate limiter
+        )
+        generated, failed = asyncio.run(
+            generate_insights(jobs, client, as_of, concurrency, rate, model, max_attempts)
+        )
+    logger.info("%d generated, %d failed, %d skipped in %.1f s",
+                generated, failed, skipped, time.perf_counter() - start)
+    return {"users": len(usernames), "generated": generated, "failed": failed, "skipped": skipped}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m insights")
+    parser.add_argument("--as-of", type=date.fromisoformat, help="last day of the week (default: yesterday)")
+    parser.add_argument("--users", help="comma-separated usernames (default: everyone with a meal log)")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE, help="requests per second, 0 = unlimited")
+    parser.add_argument("--max-attempts", type=int, default=MAX_ATTEMPTS)
+    parser.add_argument("--model", default=MODEL)
+    parser.add_argument("--base-url", help="OpenAI-compatible endpoint (default: OPENAI_BASE_URL or OpenAI)")
+    parser.add_argument("--force", action="store_true", help="regenerate insights that are already current")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    result = run(args.as_of, args.users.split(",") if args.users else None, args.concurrency,
+                 args.rate, args.model, args.max_attempts, args.base_url, args.force)
+    print(json.dumps(result))
+    return 1 if result["failed"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -5,12 +5,17 @@ import json
 from datetime import datetime
 from _pages import _1_Food_Logging, _2_AI_Suggestions, _3_Visualization
 from Home import home_page
+from helpers import USERS_FILE, load_users, save_users, find_user, get_meals_file
+from meal_store import ensure_meals_file
+from archive import compact_in_background
+from reports import newly_finished
+import profiling
 
 # ---------------------------
 # Data paths
 # ---------------------------
 DATA_DIR = "data"
-USERS_FILE = os.path.join(DATA_DIR, "users.json")
+PROFILE_HISTORY = 50  # reruns kept per session for the profiling panel
 
 os.makedirs(DATA_DIR, exist_ok=True)
 
@@ -54,29 +59,26 @@ if "page" not in st.session_state:
 # ---------------------------
 # Helper functions
 # ---------------------------
-def load_users():
-    with open(USERS_FILE, "r") as f:
-        return json.load(f)
+def login_user(username, password):
+    user = find_user(username, password)
 
-def save_users(users):
-    with open(USERS_FILE, "w") as f:
-        json.dump(users, f, indent=4)
+    if user is not None:
+        st.session_state["user"] = username
+        st.session_state["page"] = "Home"
+        st.session_state["is_admin"] = bool(user.get("admin", False))
 
+        # Initialize correct log file for this user
+        initialize_user_files(username)
 
-def login_user(username, password):
-    users = load_users()
+        # Give entries logged before entry IDs existed a stable one
+        ensure_meals_file(get_meals_file(username))
 
-    for u in users:
-        if u["username"] == username and u["password"] == password:
-            st.session_state["user"] = username
-            st.session_state["page"] = "Home"
+        # Move history older than the hot window into the archive (once a day, off the login path)
+        compact_in_background(username)
 
-            # Initialize correct log file for this user
-            initialize_user_files(username)
-
-            # Trigger rerun safely
-            st.session_state["login_trigger"] = not st.session_state.get("login_trigger", False)
-            return True
+        # Trigger rerun safely
+        st.session_state["login_trigger"] = not st.session_state.get("login_trigger", False)
+        return True
 
     st.error("Invalid username or password")
     return False
@@ -154,19 +156,60 @@ else:
     )
 
     # Logout
-    st.sidebar.button("Logout", on_click=lambda: st.session_state.update({"user": None, "page": "Welcome"}))
+    st.sidebar.button("Logout", on_click=lambda: st.session_state.update(
+        {"user": None, "page": "Welcome", "is_admin": False, "profiling": False}))
 
     # Update current page
     st.session_state["page"] = page
 
+    # ---------------------------
+    # Admin-only profiling panel (drawn before the page, which may st.stop())
+    # ---------------------------
+    if st.session_state.get("is_admin"):
+        with st.sidebar.expander("⏱️ Profiling"):
+            st.checkbox("Profile this session", key="profiling")
+            reruns = st.session_state.get("profile_reruns", [])
+
+            if not reruns:
+                st.caption("No profiled reruns yet.")
+            else:
+                last = reruns[-1]
+                st.caption(f"Previous rerun: {last['page']} · {last['seconds'] * 1000:.0f} ms")
+                st.bar_chart({"ms": profiling.category_breakdown(last)})
+
+                st.write(f"Slowest spans (last {len(reruns)} reruns)")
+                st.dataframe(profiling.slowest_spans(reruns), hide_index=True)
+
+                if st.button("Clear", key="profile_clear"):
+                    st.session_state["profile_reruns"] = []
+
+    # ---------------------------
+    # Reports finished in the background since the last rerun
+    # ---------------------------
+    report_jobs = st.session_state.get("report_jobs", {}).get(st.session_state["user"], {})
+    for label, error in newly_finished(report_jobs):
+        if error is None:
+            st.toast(f"{label} is ready to download on the Visualization page.", icon="📄")
+        else:
+            st.toast(f"{label} could not be generated.", icon="⚠️")
+
     # ---------------------------
     # Render selected page
     # ---------------------------
-    if page == "Home":
-        home_page()
-    elif page == "Food Logging":
-        _1_Food_Logging.food_logging_page()
-    elif page == "AI Suggestions":
-        _2_AI_Suggestions.ai_suggestions_page()
-    elif page == "Visualization":
-        _3_Visualization.visualization_page()
+    # Recorded in `finally` so reruns that end in st.rerun() / st.stop() (i.e. every write) are kept
+    profiling.start_rerun(page, st.session_state["user"], profiling.profiling_requested(st.session_state))
+    try:
+        if page == "Home":
+            home_page()
+        elif page == "Food Logging":
+            _1_Food_Logging.food_logging_page()
+        elif page == "AI Suggestions":
+            _2_AI_Suggestions.ai_suggestions_page()
+        elif page == "Visualization":
+            _3_Visualization.visualization_page()
+    finally:
+        record = profiling.finish_rerun()
+        if record is not None:
+            reruns = st.session_state.setdefault("profile_reruns", [])
+            reruns.append(record)
+            del reruns[:-PROFILE_HISTORY]
@@ -0,0 +1,300 @@
+# meal_store.py
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import pandas as pd
+
+import changes
+from helpers import file_signature
+from profiling import profiled
+from write_queue import WRITE_QUEUE, file_lock, write_csv
+
+MEAL_COLS = ["EntryID", "DateTime", "Date", "MealType", "Meal",
+             "Servings", "Calories", "Protein", "Carbs", "Fat", "FoodID",
+             "Quantity", "Unit", "Grams"]
+
+
+def new_entry_id():
+    """Stable unique ID for a logged entry (edit / delete / widget keys use it)."""
+    return uuid.uuid4().hex
+
+
+# -------------------------------------
+# Cross-process write lock
+# -------------------------------------
+_held = threading.local()
+
+
+@contextmanager
+def locked_log(meals_file):
+    """
+    Holds the log's cross-process lock for a read-modify-write. Every writer
+    of a user's log and the state derived from it (Streamlit workers, the API,
+    the nightly jobs) takes it. Returns once the block's writes are staged;
+    other processes stay locked out until the write-behind queue has flushed
+    them (see write_queue.file_lock), so they never read a stale log.
+    Re-entrant; take it before opening a WRITE_QUEUE.batch(), not inside one
+    (a flush waiting on that batch would then wait on this lock too).
+    """
+    held = _held.__dict__.setdefault("files", set())
+    if meals_file in held:
+        yield
+        return
+    if WRITE_QUEUE.in_batch():
+        raise RuntimeError(f"locked_log({meals_file!r}) entered inside an open WRITE_QUEUE.batch()")
+
+    with file_lock(meals_file):
+        held.add(meals_file)
+        try:
+            with WRITE_QUEUE.batch():
+                yield
+            WRITE_QUEUE.after_flush(lambda: _flushed(meals_file))
+        finally:
+            held.discard(meals_file)
+
+
+# -------------------------------------
+# Meals CSV read / write
+# -------------------------------------
+def ensure_meals_file(meals_file, catalog=None):
+    """
+    Creates an empty log, or gives entries logged before entry IDs existed
+    (or with a duplicated one) a new stable ID and saves them. Called where
+    a user's log is opened for writing (login, Food Logging), never on reads.
+    """
+    if file_signature(meals_file) is not None:
+        log = _load_log(meals_file, catalog)
+        if len(log.ids) == len(log.frame):
+            return  # the common case, without taking the lock
+
+    with locked_log(meals_file):
+        if WRITE_QUEUE.pending(meals_file) is None and (
+                not os.path.exists(meals_file) or os.stat(meals_file).st_size == 0):
+            write_meals_file(pd.DataFrame(columns=MEAL_COLS), meals_file)
+            return
+        log = _load_log(meals_file, catalog)
+        if len(log.ids) == len(log.frame):
+            return
+        # The raw rows, so legacy entries are saved as they were apart from the ID
+        raw = read_raw_meals(meals_file)
+        ids = raw["EntryID"].astype(object) if "EntryID" in raw.columns else pd.Series(pd.NA, index=raw.index, dtype=object)
+        unassigned = ids.isna() | ids.duplicated()
+        ids[unassigned] = [new_entry_id() for _ in range(unassigned.sum())]
+        raw["EntryID"] = ids
+        write_meals_file(raw, meals_file)
+
+
+def read_raw_meals(meals_file):
+    """
+    The meals log as last written by the app — the staged copy if a
+    write-behind flush is pending — or None if there is no log yet.
+    """
+    staged = WRITE_QUEUE.pending(meals_file)
+    if staged is not None:
+        return staged.reset_index(drop=True)
+    if not os.path.exists(meals_file) or os.stat(meals_file).st_size == 0:
+        return None
+    return pd.read_csv(meals_file, dtype={"EntryID": str})
+
+
+def _coerce_columns(df):
+    """Adds missing MEAL_COLS and casts the numeric ones, in place."""
+    for col in MEAL_COLS:
+        if col not in df.columns:
+            df[col] = pd.NA
+    for col in ["Servings", "Calories", "Protein", "Carbs", "Fat"]:
+        df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0).astype(float)
+    # USDA ID of the logged food (blank for averaged or manual entries)
+    df["FoodID"] = pd.to_numeric(df["FoodID"], errors="coerce").astype("Int64")
+    for col in ["Quantity", "Grams"]:
+        df[col] = pd.to_numeric(df[col], errors="coerce").astype(float)
+
+
+def _normalize(df, catalog=None):
+    _coerce_columns(df)
+
+    # Rows logged before units existed: catalog foods were 100 g "servings"
+    legacy = df["Unit"].isna()
+    if legacy.any():
+        from_catalog = df["FoodID"].notna()
+        if catalog is not None:
+            from_catalog |= df["Meal"].isin(catalog.by_display)
+        df.loc[legacy, "Quantity"] = df.loc[legacy, "Servings"]
+        df.loc[legacy & from_catalog, "Unit"] = "100 g"
+        df.loc[legacy & from_catalog, "Grams"] = df.loc[legacy & from_catalog, "Servings"] * 100
+        df.loc[legacy & ~from_catalog, "Unit"] = "serving"
+
+    df["EntryID"] = df["EntryID"].astype(object)
+    return df[MEAL_COLS]
+
+
+# -------------------------------------
+# Parsed log cache
+# -------------------------------------
+MAX_CACHED_LOGS = 64
+
+
+class _Log:
+    """
+    A normalized meals log and its EntryID -> index label map. Labels stay
+    stable across appends and deletes, so the map is updated in place by
+    each mutation instead of being rebuilt.
+    """
+
+    def __init__(self, frame, signature, with_catalog):
+        self.frame = frame
+        self.signature = signature  # file signature it was parsed from; None while staged
+        self.with_catalog = with_catalog
+        first = frame["EntryID"].notna() & ~frame["EntryID"].duplicated()
+        self.ids = dict(zip(frame["EntryID"][first], frame.index[first]))
+
+    def next_label(self):
+        return int(self.frame.index.max()) + 1 if len(self.frame) else 0
+
+
+_logs = OrderedDict()  # meals file -> _Log for its current content
+_logs_lock = threading.Lock()
+
+
+def _load_log(meals_file, catalog=None):
+    """
+    The _Log for the log's current content: the cached one when the staged
+    frame (or, once flushed, the file version) is the one it holds, otherwise
+    parsed and cached.
+    """
+    staged = WRITE_QUEUE.pending(meals_file)
+    signature = file_signature(meals_file) if staged is None else None
+    with _logs_lock:
+        log = _logs.get(meals_file)
+        if log is not None and (log.with_catalog or catalog is None) and (
+                log.frame is staged if staged is not None else signature is not None and log.signature == signature):
+            _logs.move_to_end(meals_file)
+            return log
+
+    if staged is not None:
+        df = staged.copy()
+    elif signature is not None:
+        df = pd.read_csv(meals_file, dtype={"EntryID": str})
+    else:
+        df = pd.DataFrame(columns=MEAL_COLS)
+    log = _Log(_normalize(df, catalog), signature, catalog is not None)
+    if staged is None and signature is None:
+        return log  # no log yet; nothing worth caching
+    with _logs_lock:
+        _logs[meals_file] = log
+        _logs.move_to_end(meals_file)
+        while len(_logs) > MAX_CACHED_LOGS:
+            _logs.popitem(last=False)
+    return log
+
+
+def _forget(meals_file, unless=None):
+    with _logs_lock:
+        log = _logs.get(meals_file)
+        if log is not None and log.frame is not unless:
+            del _logs[meals_file]
+
+
+def _commit(meals_file, log, frame):
+    """Stages `frame` as the log's new content and keeps `log` as the cached view of it."""
+    with _logs_lock:
+        log.frame, log.signature = frame, None
+        _logs[meals_file] = log
+        _logs.move_to_end(meals_file)
+    try:
+        write_meals_file(frame, meals_file)
+    except Exception:
+        _forget(meals_file)
+        raise
+    _flushed(meals_file)  # written through already when write-behind is off
+
+
+def _flushed(meals_file):
+    """After a flush: the cached log, if it was the last one staged, is now the file's version."""
+    if WRITE_QUEUE.pending(meals_file) is not None:
+        return
+    signature = file_signature(meals_file)
+    with _logs_lock:
+        log = _logs.get(meals_file)
+        if log is not None and log.signature is None:
+            log.signature = signature
+
+
+@profiled("meals.read", "load")
+def read_meals_file(meals_file, catalog=None):
+    """The normalized log (MEAL_COLS) as a fresh frame the caller may modify."""
+    log = _load_log(meals_file, catalog)
+    with _logs_lock:  # update_meal may be editing the frame in place
+        df = log.frame.copy()
+    df.index = pd.RangeIndex(len(df))
+    return df
+
+
+@profiled("meals.write", "write")
+def write_meals_file(df, meals_file):
+    # Returns once staged; the CSV is written atomically by the write-behind queue.
+    # Callers outside this module must hold locked_log(meals_file).
+    _forget(meals_file, unless=df)
+    WRITE_QUEUE.stage(meals_file, df, write_csv)
+
+
+# -------------------------------------
+# Mutations
+# -------------------------------------
+def append_meal(meals_file, row, catalog=None):
+    append_meals(meals_file, [row], catalog)
+
+
+def append_meals(meals_file, rows, catalog=None):
+    """Appends any number of entries with one write of the log."""
+    new_rows = pd.DataFrame(rows, columns=MEAL_COLS)
+    _coerce_columns(new_rows)
+    with locked_log(meals_file):
+        log = _load_log(meals_file, catalog)
+        start = log.next_label()
+        new_rows.index = pd.RangeIndex(start, start + len(new_rows))
+        frame = pd.concat([log.frame, new_rows]) if len(log.frame) else new_rows
+        _commit(meals_file, log, frame)
+        for label, entry_id in zip(new_rows.index, new_rows["EntryID"]):
+            if isinstance(entry_id, str):
+                log.ids.setdefault(entry_id, label)
+        changes.record(meals_file, "add", new_rows)
+
+
+def update_meal(meals_file, entry_id, row, catalog=None):
+    """
+    Replaces the one entry with this EntryID; returns False if it doesn't
+    exist. The cached frame is edited in place unless a flush is writing it.
+    """
+    with locked_log(meals_file):
+        log = _load_log(meals_file, catalog)
+        label = log.ids.get(entry_id)
+        if label is None:
+            return False
+        frame = log.frame.copy() if WRITE_QUEUE.writing(meals_file, log.frame) else log.frame
+        with _logs_lock:
+            for col in MEAL_COLS:
+                frame.at[label, col] = entry_id if col == "EntryID" else row.get(col, pd.NA)
+        _commit(meals_file, log, frame)
+        changes.record(meals_file, "edit", frame.loc[[label]])
+    return True
+
+
+def delete_meal(meals_file, entry_id, catalog=None):
+    """
+    Removes the one entry with this EntryID; returns False if it doesn't
+    exist. Still O(log size): pandas can't drop a row without a new frame.
+    """
+    with locked_log(meals_file):
+        log = _load_log(meals_file, catalog)
+        label = log.ids.get(entry_id)
+        if label is None:
+            return False
+        removed = log.frame.loc[[label]]
+        _commit(meals_file, log, log.frame.drop(index=label))
+        del log.ids[entry_id]
+        changes.record(meals_file, "delete", removed)
+    return True
@@ -0,0 +1,181 @@
+# nutrition_stats.py
+import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+import archive
+from helpers import file_signature
+from profiling import profiled
+from write_queue import WRITE_QUEUE
+
+NUTRIENTS = ["Calories", "Protein", "Carbs", "Fat"]
+MACROS = ["Protein", "Carbs", "Fat"]
+KCAL_PER_GRAM = np.array([4.0, 4.0, 9.0])  # Protein, Carbs, Fat
+WINDOWS = [7, 14, 30]
+EMA_SPANS = [7, 30]
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+
+# -------------------------------------
+# Kernels
+# -------------------------------------
+def daily_totals(dates, values):
+    """
+    Sums per-meal values onto a contiguous calendar.
+
+    dates: datetime64[D] array (one per meal), values: (n_meals, k) array.
+    Returns (days, totals (n_days, k), logged mask (n_days,)).
+    """
+    first = dates.min()
+    day_idx = (dates - first).astype(np.int64)
+    n_days = int(day_idx.max()) + 1
+
+    totals = np.empty((n_days, values.shape[1]))
+    for j in range(values.shape[1]):
+        totals[:, j] = np.bincount(day_idx, weights=values[:, j], minlength=n_days)
+    logged = np.bincount(day_idx, minlength=n_days) > 0
+
+    days = first + np.arange(n_days)
+    return days, totals, logged
+
+
+def rolling_sum(x, window):
+    """Trailing window sum along axis 0 in O(n) via a cumulative sum (partial windows at the start)."""
+    x = np.asarray(x, dtype=float)
+    cs = np.concatenate([np.zeros((1,) + x.shape[1:]), np.cumsum(x, axis=0)])
+    end = np.arange(1, len(x) + 1)
+    start = np.maximum(end - window, 0)
+    return cs[end] - cs[start]
+
+
+def rolling_mean(totals, logged, window):
+    """Mean over the logged days in each trailing window; NaN where nothing was logged."""
+    sums = rolling_sum(totals, window)
+    counts = rolling_sum(logged.astype(float), window)
+    if sums.ndim > 1:
+        counts = counts[:, None]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+
+def ema(values, logged, span):
+    """Exponential moving average over logged days, carried forward across gaps."""
+    series = pd.Series(np.where(logged, values, np.nan))
+    return series.ewm(span=span, ignore_na=True).mean().ffill().to_numpy()
+
+
+def weekday_means(days, totals, logged):
+    """Mean of each column per weekday (Mon=0) over logged days."""
+    # 1970-01-01 was a Thursday
+    weekday = (days.astype(np.int64) + 3) % 7
+    wd = weekday[logged]
+    counts = np.bincount(wd, minlength=7)
+    means = np.full((7, totals.shape[1]), np.nan)
+    for j in range(totals.shape[1]):
+        sums = np.bincount(wd, weights=totals[logged, j], minlength=7)
+        np.divide(sums, counts, out=means[:, j], where=counts > 0)
+    return means, counts
+
+
+# -------------------------------------
+# Stats over a user's full log
+# -------------------------------------
+@profiled("stats.compute", "derive")
+def compute_stats(df):
+    """
+    Daily totals, rolling means, EMAs, macro calorie shares and weekday
+    breakdowns for a meals DataFrame. Returns None if nothing is logged.
+    """
+    if df.empty:
+        return None
+
+    dates = pd.to_datetime(df["Date"], errors="coerce")
+    valid = dates.notna().to_numpy()
+    if not valid.any():
+        return None
+
+    dates = dates.to_numpy()[valid].astype("datetime64[D]")
+    values = np.column_stack([
+        pd.to_numeric(df[col], errors="coerce").fillna(0).to_numpy()[valid]
+        for col in NUTRIENTS
+    ])
+
+    days, totals, logged = daily_totals(dates, values)
+
+    daily = pd.DataFrame(totals, columns=NUTRIENTS, index=pd.DatetimeIndex(days, name="Date"))
+    daily["Logged"] = logged
+
+    for window in WINDOWS:
+        means = rolling_mean(totals, logged, window)
+        for j, col in enumerate(NUTRIENTS):
+            daily[f"{col}_{window}d"] = means[:, j]
+
+    for span in EMA_SPANS:
+        daily[f"Calories_ema{span}"] = ema(totals[:, 0], logged, span)
+
+    # Share of macro calories, from 7-day sums (ratio of sums, not mean of ratios)
+    macro_kcal = rolling_sum(totals[:, 1:] * KCAL_PER_GRAM, 7)
+    macro_total = macro_kcal.sum(axis=1, keepdims=True)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        shares = np.where(macro_total > 0, macro_kcal / macro_total, np.nan)
+    for j, col in enumerate(MACROS):
+        daily[f"{col}Share_7d"] = shares[:, j]
+
+    means, counts = weekday_means(days, totals, logged)
+    weekday = pd.DataFrame(means, columns=NUTRIENTS, index=WEEKDAYS)
+    weekday["Days"] = counts
+
+    weekend_mask = np.array([False] * 5 + [True] * 2)
+    split = {}
+    for label, mask in [("Weekday", ~weekend_mask), ("Weekend", weekend_mask)]:
+        n = counts[mask].sum()
+        sums = np.nansum(means[mask] * counts[mask, None], axis=0)
+        split[label] = sums / n if n else np.full(len(NUTRIENTS), np.nan)
+    weekend_split = pd.DataFrame(split, index=NUTRIENTS).T
+
+    return {"daily": daily, "weekday": weekday, "weekend_split": weekend_split}
+
+
+def _with_archive(df, meals_file):
+    """
+    Prepends the archive's per-day totals. Summed again per day they give the
+    same daily totals as the archived meals, so the stats cover the full history.
+    """
+    archived = archive.daily_summary(meals_file)
+    if archived.empty:
+        return df
+    archived = archived[["Date"] + NUTRIENTS]
+    return pd.concat([archived, df], ignore_index=True) if not df.empty else archived.copy()
+
+
+@lru_cache(maxsize=32)
+def _cached_stats(meals_file, version, archive_version):
+    if version is None or os.stat(meals_file).st_size == 0:
+        df = pd.DataFrame(columns=["Date"] + NUTRIENTS)
+    else:
+        df = pd.read_csv(meals_file, usecols=lambda c: c in ["Date"] + NUTRIENTS)
+        for col in NUTRIENTS:
+            if col not in df.columns:
+                df[col] = 0
+    return compute_stats(_with_archive(df, meals_file))
+
+
+@profiled("stats.load", "load")
+def get_stats(meals_file):
+    """
+    Stats for a meals file and its archive, cached per data version (the
+    files' mtime/size), so reruns only recompute after the log actually changes.
+    Treat the returned frames as read-only — they are shared between reruns.
+    """
+    staged = WRITE_QUEUE.pending(meals_file)
+    if staged is not None:
+        # Write-behind flush pending: the file's version would be stale, so don't cache
+        return compute_stats(_with_archive(staged[["Date"] + NUTRIENTS].copy(), meals_file))
+
+    version = file_signature(meals_file)
+    archived = archive.archive_version(meals_file)
+    if version is None and archived is None:
+        return None
+    return _cached_stats(meals_file, version and tuple(version), archived and tuple(archived))
@@ -0,0 +1,83 @@
+# portions.py
+import os
+
+import numpy as np
+import pandas as pd
+
+PORTIONS_FILE = "portions.csv"
+
+# Column order of the conversion table
+UNITS = ["g", "100 g", "oz", "cup", "tbsp", "piece", "serving"]
+
+# Units that weigh the same for every food
+FIXED_GRAMS = {"g": 1.0, "100 g": 100.0, "oz": 28.3495}
+
+
+class PortionTable:
+    """
+    Precomputed grams-per-unit for every DisplayMeal.
+
+    grams[row, col] is the weight of one UNITS[col] of the food at `row`
+    (NaN where the unit doesn't apply, e.g. a "cup" of chicken). Food-specific
+    units come from portions.csv; every food gets g / 100 g / oz.
+    """
+
+    def __init__(self, displays, grams):
+        self.rows = {display: i for i, display in enumerate(displays)}
+        self.cols = {unit: j for j, unit in enumerate(UNITS)}
+        self.grams = grams
+
+    def grams_per_unit(self, display, unit):
+        row = self.rows.get(display)
+        col = self.cols.get(unit)
+        if row is None or col is None:
+            return float("nan")
+        return float(self.grams[row, col])
+
+    def available_units(self, display):
+        row = self.rows.get(display)
+        if row is None:
+            return list(FIXED_GRAMS)
+        return [unit for unit, g in zip(UNITS, self.grams[row]) if not np.isnan(g)]
+
+    def default_unit(self, display):
+        # The food's own serving if portions.csv has one, else the USDA 100 g basis
+        return "serving" if "serving" in self.available_units(display) else "100 g"
+
+    def to_grams(self, displays, quantities, units):
+        """Vectorized quantity × grams-per-unit for whole columns of log entries."""
+        rows = pd.Series(displays).map(self.rows).fillna(-1).to_numpy(dtype=np.int64)
+        cols = pd.Series(units).map(self.cols).fillna(-1).to_numpy(dtype=np.int64)
+        valid = (rows >= 0) & (cols >= 0)
+
+        per_unit = np.full(len(rows), np.nan)
+        per_unit[valid] = self.grams[rows[valid], cols[valid]]
+        return np.asarray(quantities, dtype=float) * per_unit
+
+
+def portion_grams(displays, portions):
+    """The grams-per-unit matrix for `displays` (rows) × UNITS (columns)."""
+    rows = {display: i for i, display in enumerate(displays)}
+    cols = {unit: j for j, unit in enumerate(UNITS)}
+
+    grams = np.full((len(displays), len(UNITS)), np.nan)
+    for unit, unit_grams in FIXED_GRAMS.items():
+        grams[:, cols[unit]] = unit_grams
+
+    if not portions.empty:
+        known = portions["DisplayMeal"].isin(rows) & portions["Unit"].isin(cols)
+        portions = portions[known]
+        r = portions["DisplayMeal"].map(rows).to_numpy()
+        c = portions["Unit"].map(cols).to_numpy()
+        grams[r, c] = portions["Grams"].to_numpy()
+    return grams
+
+
+def load_portion_table(displays, portions_file=PORTIONS_FILE):
+    if os.path.exists(portions_file):
+        portions = pd.read_csv(portions_file)
+        portions["Grams"] = pd.to_numeric(portions["Grams"], errors="coerce")
+        portions = portions.dropna(subset=["DisplayMeal", "Unit", "Grams"])
+    else:
+        portions = pd.DataFrame(columns=["DisplayMeal", "Unit", "Grams"])
+    return PortionTable(displays, portion_grams(displays, portions))
@@ -0,0 +1,273 @@
+# profiling.py
+import json
+import logging
+import os
+import threading
+import time
+from functools import wraps
+
+from write_queue import atomic_write, write_text
+
+# NUTRITION_PROFILE=1 profiles every session; otherwise only admins who opt in
+PROFILE_ENV = "NUTRITION_PROFILE"
+METRICS_FILE = os.environ.get("NUTRITION_METRICS_FILE", "data/metrics.prom")
+EXPORT_INTERVAL = 5.0  # seconds between Prometheus file rewrites
+
+# Histogram bucket upper bounds, in seconds
+BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# One JSON line per profiled rerun; attach a handler (or set NUTRITION_PROFILE_LOG) to keep them
+logger = logging.getLogger("nutrition.profile")
+if os.environ.get("NUTRITION_PROFILE_LOG"):
+    _handler = logging.FileHandler(os.environ["NUTRITION_PROFILE_LOG"])
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+
+# Streamlit runs each session's script in its own thread, so the active
+# recorder is thread-local: spans from concurrent sessions never mix.
+_local = threading.local()
+
+
+def profiling_requested(session_state):
+    return os.environ.get(PROFILE_ENV) == "1" or bool(session_state.get("profiling"))
+
+
+# ---------------------------
+# Spans
+# ---------------------------
+class _NullSpan:
+    """Shared no-op span returned while profiling is off."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Span:
+    __slots__ = ("name", "category", "recorder", "start", "depth")
+
+    def __init__(self, name, category, recorder):
+        self.name = name
+        self.category = category
+        self.recorder = recorder
+
+    def __enter__(self):
+        self.depth = self.recorder.depth
+        self.recorder.depth += 1
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        self.recorder.depth -= 1
+        self.recorder.spans.append((self.name, self.category, elapsed, self.depth))
+        return False
+
+
+def span(name, category="other"):
+    """
+    Times a block in the current rerun:
+
+        with span("meals.read", "load"):
+            ...
+
+    Costs one thread-local lookup when profiling is off.
+    """
+    recorder = getattr(_local, "recorder", None)
+    if recorder is None:
+        return NULL_SPAN
+    return Span(name, category, recorder)
+
+
+def profiled(name, category="other"):
+    """Decorator form of span()."""
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            recorder = getattr(_local, "recorder", None)
+            if recorder is None:
+                return fn(*args, **kwargs)
+            with Span(name, category, recorder):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+# ---------------------------
+# Per-rerun recording
+# ---------------------------
+class RerunRecorder:
+    def __init__(self, page, user):
+        self.page = page
+        self.user = user
+        self.started = time.time()
+        self.start = time.perf_counter()
+        self.spans = []
+        self.depth = 0
+
+    def finish(self):
+        return {
+            "page": self.page,
+            "user": self.user,
+            "started": self.started,
+            "seconds": time.perf_counter() - self.start,
+            "spans": [
+                {"name": name, "category": category, "seconds": seconds, "depth": depth}
+                for name, category, seconds, depth in self.spans
+            ],
+        }
+
+
+def start_rerun(page, user, enabled):
+    _local.recorder = RerunRecorder(page, user) if enabled else None
+    return _local.recorder
+
+
+def finish_rerun():
+    """
+    Ends the current rerun's recording. Returns the rerun record (None when
+    profiling was off) after feeding it to the metrics and the structured log.
+    """
+    recorder = getattr(_local, "recorder", None)
+    _local.recorder = None
+    if recorder is None:
+        return None
+
+    record = recorder.finish()
+    METRICS.observe(record)
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps(record))
+    METRICS.maybe_export(METRICS_FILE)
+    return record
+
+
+# ---------------------------
+# Session summaries (admin panel)
+# ---------------------------
+def slowest_spans(records, n=10):
+    """Spans aggregated by name over a session's reruns, slowest total first."""
+    totals = {}
+    for record in records:
+        for s in record["spans"]:
+            entry = totals.setdefault(s["name"], {
+                "span": s["name"], "category": s["category"],
+                "calls": 0, "total_ms": 0.0, "max_ms": 0.0,
+            })
+            ms = s["seconds"] * 1000
+            entry["calls"] += 1
+            entry["total_ms"] += ms
+            entry["max_ms"] = max(entry["max_ms"], ms)
+
+    rows = sorted(totals.values(), key=lambda e: e["total_ms"], reverse=True)[:n]
+    for row in rows:
+        row["mean_ms"] = row["total_ms"] / row["calls"]
+    return rows
+
+
+def category_breakdown(record):
+    """Time per category in one rerun, counting only top-level spans of each category."""
+    breakdown = {}
+    open_categories = []  # spans are appended on exit, so walk them in reverse nesting order
+    for s in reversed(record["spans"]):
+        del open_categories[s["depth"]:]
+        if s["category"] not in open_categories:
+            breakdown[s["category"]] = breakdown.get(s["category"], 0.0) + s["seconds"] * 1000
+        open_categories.append(s["category"])
+    return breakdown
+
+
+# ---------------------------
+# Process-wide metrics (Prometheus text format)
+# ---------------------------
+class SpanMetrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.series = {}  # (metric, labels) -> [bucket counts..., count, sum]
+        self.counters = {}  # (metric, labels) -> count
+        self.last_export = 0.0
+        self.export_scheduled = False
+
+    def _observe(self, metric, labels, seconds):
+        stats = self.series.setdefault((metric, labels), [0] * len(BUCKETS) + [0, 0.0])
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                stats[i] += 1
+        stats[-2] += 1
+        stats[-1] += seconds
+
+    def observe(self, record):
+        with self.lock:
+            self._observe("nutrition_rerun_seconds", (("page", record["page"]),), record["seconds"])
+            for s in record["spans"]:
+                labels = (("span", s["name"]), ("category", s["category"]))
+                self._observe("nutrition_span_seconds", labels, s["seconds"])
+
+    def count(self, metric, labels, n=1):
+        with self.lock:
+            self.counters[(metric, labels)] = self.counters.get((metric, labels), 0) + n
+
+    def to_prometheus(self):
+        with self.lock:
+            series = sorted(self.series.items())
+            counters = sorted(self.counters.items())
+
+        lines = []
+        typed = set()
+        for (metric, labels), stats in series:
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} histogram")
+                typed.add(metric)
+            label_str = ",".join(f'{k}="{v}"' for k, v in labels)
+            for bound, count in zip(BUCKETS, stats):
+                lines.append(f'{metric}_bucket{{{label_str},le="{bound}"}} {count}')
+            lines.append(f'{metric}_bucket{{{label_str},le="+Inf"}} {stats[-2]}')
+            lines.append(f"{metric}_sum{{{label_str}}} {stats[-1]:.6f}")
+            lines.append(f"{metric}_count{{{label_str}}} {stats[-2]}")
+        for (metric, labels), value in counters:
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} counter")
+                typed.add(metric)
+            label_str = ",".join(f'{k}="{v}"' for k, v in labels)
+            lines.append(f"{metric}{{{label_str}}} {value}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, path):
+        # Temp file unique to the thread + rename, so a scraper never reads half a file
+        atomic_write(path, self.to_prometheus(), write_text)
+        with self.lock:
+            self.last_export = time.monotonic()
+
+    def maybe_export(self, path):
+        # At most one export per interval, written by a timer thread so callers never wait on disk
+        with self.lock:
+            if self.export_scheduled or not os.path.isdir(os.path.dirname(path) or "."):
+                return
+            self.export_scheduled = True
+            delay = max(0.0, self.last_export + EXPORT_INTERVAL - time.monotonic())
+        timer = threading.Timer(delay, self._scheduled_export, args=(path,))
+        timer.daemon = True
+        timer.start()
+
+    def _scheduled_export(self, path):
+        with self.lock:
+            self.export_scheduled = False
+            self.last_export = time.monotonic()
+        try:
+            self.export(path)
+        except OSError as e:
+            logger.warning("metrics export to %s failed: %s", path, e)
+
+
+METRICS = SpanMetrics()
+
+
+def count(metric, **labels):
+    """Increments a process-wide counter, exported with the span metrics whether or not profiling is on."""
+    METRICS.count(metric, tuple(sorted(labels.items())))
+    METRICS.maybe_export(METRICS_FILE)
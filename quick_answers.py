@@ -0,0 +1,258 @@
+# quick_answers.py
+"""Offline answers to the chat's most common questions, tried before the LLM."""
+import logging
+import re
+from datetime import date, timedelta
+from functools import lru_cache
+
+import pandas as pd
+
+import archive
+from adherence import load_tracker
+from catalog import NUTRIENTS, load_catalog
+from helpers import get_meals_file
+from meal_store import read_meals_file
+from portions import FIXED_GRAMS
+from profiling import count, profiled
+
+logger = logging.getLogger("nutrition.quick_answers")
+
+NUTRIENT_WORDS = {
+    "calories": "Calories", "calorie": "Calories", "kcal": "Calories", "cals": "Calories",
+    "protein": "Protein", "proteins": "Protein",
+    "carbs": "Carbs", "carb": "Carbs", "carbohydrates": "Carbs", "carbohydrate": "Carbs",
+    "fat": "Fat", "fats": "Fat",
+}
+UNIT_WORDS = {
+    "g": "g", "gram": "g", "grams": "g", "gr": "g",
+    "oz": "oz", "ounce": "oz", "ounces": "oz",
+    "cup": "cup", "cups": "cup",
+    "tbsp": "tbsp", "tablespoon": "tbsp", "tablespoons": "tbsp",
+    "piece": "piece", "pieces": "piece", "slice": "piece", "slices": "piece",
+    "serving": "serving", "servings": "serving", "portion": "serving", "portions": "serving",
+}
+NUMBER_WORDS = {"a": 1.0, "an": 1.0, "one": 1.0, "two": 2.0, "three": 3.0, "four": 4.0, "half a": 0.5, "half": 0.5}
+DAY_WORDS = {"today": 0, "tonight": 0, "so far": 0, "yesterday": 1}
+
+# Opinion / advice questions need the LLM even when they mention a food or the log
+OPEN_ENDED = re.compile(
+    r"\b(should|ok|okay|enough|good|bad|healthy|healthier|better|best|recommend|suggest|ideas?|"
+    r"why|plan|diet|lose|gain|too much|too little|instead|replace|swap)\b"
+)
+REMAINING = re.compile(
+    r"\b(calories?|kcal|goal|budget|limit)\b.*\b(left|remaining|remain)\b|"
+    r"\b(left|remaining)\b.*\b(calories?|kcal|goal|budget|limit)\b|"
+    r"\bmore can i (eat|have)\b|"
+    r"\b(over|under|within|reach(ed)?|hit) my (daily )?(calorie )?(goal|limit|budget)\b|"
+    r"\bwhat('s| is) my (daily )?(calorie )?goal\b"
+)
+EATEN = re.compile(
+    r"\b(did|have|has|'ve) i (eat|eaten|ate|had|have|consume|consumed|log|logged)\b|"
+    r"\bi('ve| have)? (ate|eaten|had|consumed|logged)\b|"
+    r"\bmy (intake|totals?)\b|\bwhat did i\b"
+)
+
+
+@lru_cache(maxsize=2)
+def _food_names(catalog):
+    """Lower-cased DisplayMeal -> DisplayMeal, for exact lookups."""
+    return {display.lower(): display for display in catalog.by_display}
+
+
+def _nutrient_words(catalog):
+    words = dict(NUTRIENT_WORDS)
+    for name in catalog.extra_nutrients:  # "Fiber", "Sodium (mg)" -> "fiber", "sodium"
+        words.setdefault(name.lower().split(" (")[0], name)
+    return words
+
+
+def _asked_nutrient(text, catalog):
+    words = _nutrient_words(catalog)
+    match = re.search(r"\b(" + "|".join(map(re.escape, sorted(words, key=len, reverse=True))) + r")\b", text)
+    return (words[match.group(1)], match) if match else (None, None)
+
+
+def _day(text, today):
+    for word, days_ago in DAY_WORDS.items():
+        if re.search(rf"\b{word}\b", text):
+            return today - timedelta(days=days_ago)
+    return today
+
+
+FILLER_WORDS = {"a", "an", "the", "some", "of", "my", "in", "for", "with", "and", "me", "it", "this", "that"}
+
+
+def find_food(name, catalog):
+    """
+    DisplayMeal for a food as typed: exact, singular / plural, then the most
+    common name containing every word of it as a whole word ("rice" finds
+    White Rice, "run" doesn't find Prunes). None when nothing matches that well.
+    """
+    names = _food_names(catalog)
+    name = name.strip()
+    for candidate in (name, re.sub(r"(es|s)$", "", name), name[:-1] if name.endswith("s") else name,
+                      name + "s", name + "es"):
+        if candidate in names:
+            return names[candidate]
+    words = [w for w in re.findall(r"[a-z]+", name) if w not in FILLER_WORDS and w not in UNIT_WORDS]
+    if not words:
+        return None
+    displays = catalog.friendly_df["DisplayMeal"]
+    mask = pd.Series(True, index=displays.index)
+    for word in words:
+        stem = re.sub(r"(es|s)$", "", word) if len(word) > 3 else word
+        mask &= displays.str.contains(rf"\b{re.escape(stem)}(?:e?s)?\b", case=False, regex=True)
+    matches = displays[mask]
+    if matches.empty:
+        return None
+    # Prefer names that start with the word, then foods with more USDA variants (the common one), then shorter
+    return min(matches, key=lambda d: (not d.lower().startswith(words[0]), -len(catalog.variants.get(d, ())), len(d)))
+
+
+def parse_portion(phrase):
+    """'2 cups of rice' -> (2.0, 'cup', 'rice'); no quantity -> (None, None, phrase); the name may be ''."""
+    phrase = re.sub(r"(\d)(g|oz)\b", r"\1 \2", phrase)  # "100g" -> "100 g"
+    number_words = "|".join(sorted(NUMBER_WORDS, key=len, reverse=True))
+    match = re.match(rf"^(?:(\d+(?:\.\d+)?|{number_words})(?:\s+|$))?(?:(\w+)(?:\s+|$))?(?:of(?:\s+|$))?(.*)$", phrase)
+    qty, unit, name = match.groups()
+    if unit is not None and unit not in UNIT_WORDS:
+        name, unit = f"{unit} {name}".strip(), None
+    if qty is not None:
+        qty = float(NUMBER_WORDS.get(qty, qty) if not qty[0].isdigit() else qty)
+    return qty, UNIT_WORDS.get(unit), name.strip()
+
+
+# ---------------------------
+# Intents
+# ---------------------------
+def nutrients_in_food(text, catalog):
+    nutrient, match = _asked_nutrient(text, catalog)
+    food_match = None
+    if match:
+        food_match = (re.search(r"\b(?:in|of|for)\s+(.+)$", text[match.end():]) or
+                      re.search(r"\b(?:does|do|is|are)\s+(.+?)\s+(?:have|has|contain)\b", text))
+    if food_match is None:
+        food_match = re.search(r"\b(?:macros|nutrition(?: facts)?)\s+(?:in|of|for)\s+(.+)$", text)
+        if food_match is None:
+            return None
+        nutrient = None
+    phrase = re.sub(r"\b(today|please)\b", "", food_match.group(1)).strip()
+    phrase = re.sub(r"^(the|some)\s+", "", phrase)
+    if not phrase:
+        return None
+    qty, unit, name = parse_portion(phrase)
+    display = find_food(name, catalog) if name else None
+    if display is None:
+        return None
+
+    record = catalog.by_display[display]
+    units = catalog.portions.available_units(display)
+    if unit is None or unit not in units:
+        unit = "piece" if qty is not None and "piece" in units else catalog.portions.default_unit(display)
+    qty = 1.0 if qty is None else qty
+    grams = catalog.to_grams(record, qty, unit)
+    values = catalog.nutrients_in(record, grams)
+
+    if unit in ("g", "100 g"):
+        portion = f"{grams:.0f} g"
+    else:
+        plural = "s" if qty != 1 and unit in ("cup", "piece", "serving") else ""
+        portion = f"{qty:g} {unit}{plural}" + ("" if unit in FIXED_GRAMS else f" ({grams:.0f} g)")
+    macros = " · ".join(f"{values[n]:.1f} g {n.lower()}" for n in NUTRIENTS[1:] if n != nutrient)
+    if nutrient is None or nutrient == "Calories":
+        answer = f"{portion} of **{display}** has **{values['Calories']:.0f} kcal** ({macros})."
+    else:
+        amount = f"{values[nutrient]:.1f}" + ("" if "(" in nutrient else " g")
+        answer = (f"{portion} of **{display}** has **{amount} {nutrient.lower()}** "
+                  f"({values['Calories']:.0f} kcal · {macros}).")
+    variants = len(catalog.variants.get(display, ()))
+    if variants > 1:
+        answer += f"\n\n_Average of {variants} USDA foods named {display}._"
+    return answer
+
+
+def _day_label(day, today):
+    return "today" if day == today else "yesterday" if day == today - timedelta(days=1) else day.isoformat()
+
+
+def eaten_on_day(text, username, catalog, today):
+    day = _day(text, today)
+    day_str = day.isoformat()
+    meals_file = get_meals_file(username)
+    df = read_meals_file(meals_file, catalog)
+    df = df[df["Date"] == day_str]
+    if archive.covers(meals_file, day_str):
+        archived = archive.read_archived(meals_file, day_str, day_str)
+        df = pd.concat([df, archived], ignore_index=True)
+    label = _day_label(day, today)
+    if df.empty:
+        return f"You haven't logged anything {label} yet."
+
+    totals = {n: float(df[n].sum()) for n in NUTRIENTS}
+    summary = (f"{totals['Calories']:.0f} kcal over {len(df)} entries — " +
+               " · ".join(f"{totals[n]:.0f} g {n.lower()}" for n in NUTRIENTS[1:]))
+    nutrient, _ = _asked_nutrient(text, catalog)
+    if re.search(r"\bwhat did i\b", text):
+        lines = [f"- {row.MealType}: {row.Meal} ({row.Calories:.0f} kcal)" for row in df.itertuples()]
+        return f"{label.capitalize()} you logged {summary}:\n" + "\n".join(lines)
+    if nutrient in NUTRIENTS[1:]:
+        return f"You've had **{totals[nutrient]:.0f} g {nutrient.lower()}** {label} ({summary})."
+    return f"You've logged **{totals['Calories']:.0f} kcal** {label} ({summary})."
+
+
+def goal_remaining(text, username, today):
+    day = _day(text, today)
+    tracker = load_tracker(username)
+    goal, consumed = tracker.goal_for(day), tracker.consumed(day)
+    label = _day_label(day, today)
+    if consumed > goal:
+        return (f"You're **{consumed - goal:.0f} kcal over** your {goal} kcal goal {label} "
+                f"({consumed:.0f} kcal eaten).")
+    return (f"You have **{goal - consumed:.0f} kcal left** of your {goal} kcal goal {label} "
+            f"({consumed:.0f} kcal eaten).")
+
+
+def classify(question):
+    """(intent, normalized text); intent is None for questions meant for the LLM."""
+    text = re.sub(r"[?!.,]+", " ", question.lower().replace("’", "'")).strip()
+    text = re.sub(r"\s+", " ", text)
+    if OPEN_ENDED.search(text):
+        return None, text
+    if REMAINING.search(text):
+        return "goal_remaining", text
+    if EATEN.search(text):
+        return "eaten_on_day", text
+    return "nutrients_in_food", text
+
+
+@profiled("ai.quick_answer", "derive")
+def quick_answer(question, username, catalog=None, today=None):
+    """
+    Markdown answer for a question the catalog / log can answer, or None to
+    ask the LLM. Counts the question either way; a question that trips up
+    the parsing goes to the LLM instead of failing the chat.
+    """
+    intent, text = classify(question)
+    try:
+        answer = _answer(intent, text, username, catalog, today)
+    except Exception:
+        logger.exception("quick answer failed for %r", question)
+        count("nutrition_chat_questions_total", answered_by="llm", intent="error")
+        return None
+
+    if answer is None:
+        count("nutrition_chat_questions_total", answered_by="llm", intent="none")
+    else:
+        count("nutrition_chat_questions_total", answered_by="local", intent=intent)
+    return answer
+
+
+def _answer(intent, text, username, catalog, today):
+    answer = None
+    if intent == "goal_remaining":
+        answer = goal_remaining(text, username, today or date.today())
+    elif intent == "eaten_on_day":
+        answer = eaten_on_day(text, username, catalog or load_catalog(), today or date.today())
+    elif intent == "nutrients_in_food":
+        answer = nutrients_in_food(text, catalog or load_catalog())
+    return answer
@@ -0,0 +1,466 @@
+# reports.py
+"""
+Weekly / monthly nutrition reports (HTML or PDF), rendered in a process pool and cached on disk.
+
+    python -m reports [--period week|month] [--as-of YYYY-MM-DD] [--format html|pdf] [--workers N]
+"""
+import argparse
+import atexit
+import base64
+import glob
+import hashlib
+import html
+import io
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+import types
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+import archive
+from adherence import AdherenceTracker, load_goal_history
+from helpers import file_signature, get_goal_history_file, get_meals_file, get_reports_dir, load_users
+from meal_store import MEAL_COLS, read_raw_meals
+from nutrition_stats import KCAL_PER_GRAM, MACROS, NUTRIENTS, compute_stats
+from profiling import count
+from write_queue import WRITE_QUEUE, atomic_write, write_bytes
+
+PERIODS = {"week": "Weekly", "month": "Monthly"}
+FORMATS = {"html": "text/html", "pdf": "application/pdf"}
+REPORT_WORKERS = int(os.environ.get("NUTRITION_REPORT_WORKERS", "0")) or min(4, os.cpu_count() or 1)
+LAYOUT_VERSION = 1   # bump when the report layout changes, so cached reports are re-rendered
+TREND_LOOKBACK = 30  # days read before the period, so rolling means are defined from its first day
+TOP_FOODS = 10
+CHART_DPI = 110
+
+logger = logging.getLogger("nutrition.reports")
+
+
+# -------------------------------------
+# Periods and cache keys
+# -------------------------------------
+def period_bounds(period, day):
+    """(key, first day, last day) of the calendar week (Mon–Sun) or month containing `day`."""
+    if period == "week":
+        start = day - timedelta(days=day.weekday())
+        year, week, _ = day.isocalendar()
+        return f"{year}-W{week:02d}", start, start + timedelta(days=6)
+    if period == "month":
+        start = day.replace(day=1)
+        end = (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        return start.strftime("%Y-%m"), start, end
+    raise ValueError(f"unknown report period {period!r}")
+
+
+def recent_periods(period, today, n=6):
+    """The last `n` periods, newest (the one containing `today`) first."""
+    periods, day = [], today
+    for _ in range(n):
+        key, start, end = period_bounds(period, day)
+        periods.append((key, start, end))
+        day = start - timedelta(days=1)
+    return periods
+
+
+def period_label(period, start, end):
+    if period == "month":
+        return start.strftime("%B %Y")
+    return f"{start:%b %d} – {end:%b %d, %Y}"
+
+
+def data_version(username):
+    """Short hash of the signatures of everything a report reads."""
+    meals_file = get_meals_file(username)
+    parts = [LAYOUT_VERSION, file_signature(meals_file), archive.archive_version(meals_file),
+             file_signature(get_goal_history_file(username))]
+    return hashlib.sha1(json.dumps(parts).encode()).hexdigest()[:12]
+
+
+def report_path(username, key, version, fmt):
+    return os.path.join(get_reports_dir(username), f"{key}_{version}.{fmt}")
+
+
+def cached_report(username, period, day, fmt="html"):
+    """Path of the report for the current data (pending writes flushed first), or None if not rendered yet."""
+    WRITE_QUEUE.flush()  # workers read the files on disk
+    key, _, _ = period_bounds(period, day)
+    path = report_path(username, key, data_version(username), fmt)
+    return path if os.path.exists(path) else None
+
+
+# -------------------------------------
+# Report contents
+# -------------------------------------
+def _entries(meals_file, start, end):
+    """Entries dated in [start, end] (ISO strings) from the hot log and the archive, prepared for the charts."""
+    # Imported here: the chart builders pull in streamlit and pyplot, which only workers need
+    from _pages._3_Visualization import prepare_meals_df
+
+    frames = []
+    df = read_raw_meals(meals_file)
+    if df is not None and not df.empty:
+        frames.append(df[(df["Date"] >= start) & (df["Date"] <= end)])
+    if archive.covers(meals_file, start):
+        frames.append(archive.read_archived(meals_file, start, end))
+    frames = [f for f in frames if not f.empty]
+    df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=MEAL_COLS)
+    return prepare_meals_df(df)
+
+
+def report_data(username, period, day):
+    """Everything a report shows, for the period containing `day`."""
+    key, start, end = period_bounds(period, day)
+    meals_file = get_meals_file(username)
+    history = _entries(meals_file, (start - timedelta(days=TREND_LOOKBACK)).isoformat(), end.isoformat())
+    entries = history[history["Date"] >= start]
+
+    # Goal adherence scored exactly like the app's tracker, over this period's days only
+    days = pd.date_range(start, end).date
+    daily = entries.groupby("Date")[NUTRIENTS].sum().reindex(days, fill_value=0.0)
+    tracker = AdherenceTracker(username)
+    tracker._set_goal_history(load_goal_history(username))
+    tracker.daily = {d.isoformat(): float(c) for d, c in daily["Calories"].items() if c > 0}
+    tracker._recompute_totals()
+    daily["Goal"] = [tracker.goal_for(d) for d in days]
+    daily["Met"] = [tracker.is_met(d) for d in days]
+
+    logged = daily[daily["Calories"] > 0]
+    macro_kcal = logged[MACROS].sum().to_numpy() * KCAL_PER_GRAM
+    summary = {
+        "days": len(days),
+        "days_logged": tracker.days_logged,
+        "days_met": tracker.days_met,
+        "balance": tracker.total_deficit,
+        "best_streak": tracker.best_streak,
+        "avg_goal": float(logged["Goal"].mean()) if len(logged) else float(daily["Goal"].iloc[-1]),
+        "averages": logged[NUTRIENTS].mean().to_dict() if len(logged) else None,
+        "macro_shares": dict(zip(MACROS, macro_kcal / macro_kcal.sum())) if macro_kcal.sum() > 0 else None,
+    }
+    top_foods = (entries.groupby("Meal").agg(Entries=("Meal", "size"), Calories=("Calories", "sum"))
+                 .nlargest(TOP_FOODS, "Calories").reset_index())
+
+    # (chart name, args) for the Visualization page's matplotlib builders
+    charts = []
+    if not entries.empty:
+        totals = entries[MACROS].sum()
+        charts.append(("calories_over_time", (entries, "Week" if period == "week" else "Month", tracker.goal_for)))
+        stats = compute_stats(history)
+        trend = stats["daily"][stats["daily"].index >= pd.Timestamp(start)]
+        charts += [("rolling_calories", (trend,)), ("macro_ratio_trend", (trend,)),
+                   ("macro_pie", tuple(totals)), ("macros_by_meal_type", (entries,))]
+        if period == "month":
+            charts.append(("weekday_calories", (compute_stats(entries)["weekday"],)))
+
+    return {
+        "username": username, "period": period, "key": key, "start": start, "end": end,
+        "title": f"{PERIODS[period]} nutrition report · {period_label(period, start, end)}",
+        "summary": summary, "daily": daily, "top_foods": top_foods, "charts": charts,
+    }
+
+
+def _summary_rows(summary):
+    averages, shares = summary["averages"], summary["macro_shares"]
+    rows = [("Days logged", f"{summary['days_logged']} of {summary['days']}")]
+    if averages is None:
+        return rows + [("Goal", f"{summary['avg_goal']:.0f} kcal/day")]
+    balance = summary["balance"]
+    rows += [
+        ("Average intake", f"{averages['Calories']:.0f} kcal/day (goal {summary['avg_goal']:.0f})"),
+        ("Days within goal", f"{summary['days_met']} of {summary['days_logged']} logged"),
+        ("Calorie balance", f"{abs(balance):.0f} kcal {'under' if balance >= 0 else 'over'} goal in total"),
+        ("Best streak", f"{summary['best_streak']} days"),
+        ("Average macros", " · ".join(f"{averages[m]:.0f} g {m.lower()}" for m in MACROS)),
+    ]
+    if shares is not None:
+        rows.append(("Macro calories", " / ".join(f"{shares[m]:.0%} {m.lower()}" for m in MACROS)))
+    return rows
+
+
+def _daily_table(daily):
+    logged = daily["Calories"] > 0
+    return pd.DataFrame({
+        "Date": [f"{d:%a %b %d}" for d in daily.index],
+        **{col: [f"{v:.0f}" if on else "–" for v, on in zip(daily[col], logged)] for col in NUTRIENTS},
+        "Goal": daily["Goal"].astype(int).astype(str),
+        "Within goal": ["✓" if met else "" for met in daily["Met"]],
+    })
+
+
+def _figures(data):
+    """(name, Figure) for each chart with something to draw; the caller closes them."""
+    from _pages._3_Visualization import CHARTS
+
+    for name, args in data["charts"]:
+        fig = CHARTS[name][1](*args)
+        if fig is not None:
+            yield name, fig
+
+
+# -------------------------------------
+# Rendering
+# -------------------------------------
+STYLE = """
+body { font-family: -apple-system, Segoe UI, Helvetica, Arial, sans-serif; max-width: 960px; margin: 2em auto; color: #222; }
+table { border-collapse: collapse; margin: 0.5em 0 1.5em; }
+th, td { padding: 4px 10px; border-bottom: 1px solid #ddd; text-align: left; }
+img { max-width: 100%; margin: 0.5em 0; }
+.charts { display: flex; flex-wrap: wrap; gap: 8px; }
+.charts img { max-width: 470px; }
+"""
+
+
+def render_html(data):
+    import matplotlib.pyplot as plt
+
+    images = []
+    for name, fig in _figures(data):
+        buf = io.BytesIO()
+        fig.savefig(buf, format="png", dpi=CHART_DPI, bbox_inches="tight")
+        plt.close(fig)
+        images.append(f'<img alt="{name}" src="data:image/png;base64,{base64.b64encode(buf.getvalue()).decode()}">')
+
+    summary = "".join(f"<tr><th>{html.escape(k)}</th><td>{html.escape(v)}</td></tr>"
+                      for k, v in _summary_rows(data["summary"]))
+    parts = [
+        f"<!doctype html><html><head><meta charset='utf-8'><title>{html.escape(data['title'])}</title>"
+        f"<style>{STYLE}</style></head><body>",
+        f"<h1>{html.escape(data['title'])}</h1>",
+        f"<p>{html.escape(data['username'])} · generated {datetime.now():%Y-%m-%d %H:%M}</p>",
+        f"<h2>Summary</h2><table>{summary}</table>",
+    ]
+    if images:
+        parts.append(f"<h2>Charts</h2><div class='charts'>{''.join(images)}</div>")
+    parts.append("<h2>Daily totals</h2>" + _daily_table(data["daily"]).to_html(index=False, border=0))
+    if not data["top_foods"].empty:
+        parts.append("<h2>Top foods by calories</h2>" +
+                     data["top_foods"].to_html(index=False, border=0, float_format="{:.0f}".format))
+    parts.append("</body></html>")
+    return "\n".join(parts).encode("utf-8")
+
+
+def _summary_page(data):
+    import matplotlib.pyplot as plt
+
+    fig = plt.figure(figsize=(8.27, 11.69))  # A4
+    fig.text(0.07, 0.95, data["title"], fontsize=15, weight="bold")
+    fig.text(0.07, 0.925, f"{data['username']} · generated {datetime.now():%Y-%m-%d %H:%M}", fontsize=9, color="#555")
+    y = 0.89
+    for label, value in _summary_rows(data["summary"]):
+        fig.text(0.07, y, label, fontsize=10, weight="bold")
+        fig.text(0.32, y, value, fontsize=10)
+        y -= 0.022
+
+    table = _daily_table(data["daily"])
+    ax = fig.add_axes([0.07, 0.04, 0.86, y - 0.06])
+    ax.axis("off")
+    cells = ax.table(cellText=table.to_numpy(), colLabels=list(table.columns), loc="upper center", cellLoc="left")
+    cells.auto_set_font_size(False)
+    cells.set_fontsize(7 if len(table) > 10 else 9)
+    return fig
+
+
+def render_pdf(data):
+    import matplotlib.pyplot as plt
+    from matplotlib.backends.backend_pdf import PdfPages
+
+    buf = io.BytesIO()
+    with PdfPages(buf, metadata={"Title": data["title"]}) as pdf:
+        page = _summary_page(data)
+        pdf.savefig(page)
+        plt.close(page)
+        for _, fig in _figures(data):
+            pdf.savefig(fig, bbox_inches="tight")
+            plt.close(fig)
+    return buf.getvalue()
+
+
+def render_report(username, period, day, fmt="html"):
+    """
+    Renders one report into the cache and returns its path (runs in a pool
+    worker). Older versions of the same report are removed.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown report format {fmt!r}")
+    day = date.fromisoformat(day) if isinstance(day, str) else day
+    # Taken before reading, so data changed mid-render is never cached as current
+    version = data_version(username)
+    data = report_data(username, period, day)
+    content = render_html(data) if fmt == "html" else render_pdf(data)
+
+    path = report_path(username, data["key"], version, fmt)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    atomic_write(path, content, write_bytes, binary=True)
+    pattern = os.path.join(glob.escape(get_reports_dir(username)), f"{glob.escape(data['key'])}_*.{fmt}")
+    for old in glob.glob(pattern):
+        if old != path:
+            try:
+                os.remove(old)
+            except FileNotFoundError:
+                pass
+    return path
+
+
+# -------------------------------------
+# Worker pool
+# -------------------------------------
+def _init_worker():
+    # Figures only ever go to files; importing the page once per worker keeps jobs fast
+    import matplotlib
+    matplotlib.use("Agg")
+    import _pages._3_Visualization
+
+
+@contextmanager
+def _without_main_script():
+    """
+    A spawned worker re-runs the parent's __main__ unless it is an importable
+    module. Under `streamlit run` that is the app script itself, so workers
+    are started without it; they only need this module.
+    """
+    main = sys.modules["__main__"]
+    if getattr(main, "__spec__", None) is not None:
+        yield
+        return
+    sys.modules["__main__"] = types.ModuleType("__main__")
+    try:
+        yield
+    finally:
+        sys.modules["__main__"] = main
+
+
+class ReportPool:
+    """
+    Renders reports in a process pool, started on first use. Workers are
+    spawned rather than forked, so they don't inherit the server's threads.
+
+    submit() never waits for rendering: it returns a Future of the report's
+    path, already resolved when the report for the current data is cached.
+    Requests for a report that is already being rendered share its future.
+    """
+
+    def __init__(self, workers=REPORT_WORKERS):
+        self.workers = workers
+        self.lock = threading.Lock()
+        self.executor = None
+        self.inflight = {}  # cache path -> Future
+
+    def _executor(self):
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                                initializer=_init_worker)
+        return self.executor
+
+    def submit(self, username, period, day, fmt="html"):
+        WRITE_QUEUE.flush()  # workers read the files on disk
+        key, _, _ = period_bounds(period, day)
+        path = report_path(username, key, data_version(username), fmt)
+        with self.lock:
+            future = self.inflight.get(path)
+            if future is not None:
+                return future
+            if os.path.exists(path):
+                count("nutrition_reports_total", result="cached")
+                future = Future()
+                future.set_result(path)
+                return future
+            with _without_main_script():
+                future = self._executor().submit(render_report, username, period, day.isoformat(), fmt)
+            self.inflight[path] = future
+        future.add_done_callback(lambda f: self._finished(path, f))
+        return future
+
+    def _finished(self, path, future):
+        with self.lock:
+            self.inflight.pop(path, None)
+            if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+                self.executor = None  # a worker died; start a fresh pool for the next job
+        failed = future.cancelled() or future.exception() is not None
+        if failed and not future.cancelled():
+            logger.error("report %s failed: %r", path, future.exception())
+        count("nutrition_reports_total", result="failed" if failed else "rendered")
+
+    def close(self, wait=False):
+        if self.executor is not None:
+            self.executor.shutdown(wait=wait, cancel_futures=not wait)
+            self.executor = None
+
+
+REPORT_POOL = ReportPool()
+atexit.register(REPORT_POOL.close)
+
+
+def newly_finished(jobs):
+    """
+    (label, error or None) for each job in a session's {key: job} that has
+    finished since the last call; `job` is {"label", "future", "notified"}.
+    """
+    finished = []
+    for job in jobs.values():
+        if not job["notified"] and job["future"].done():
+            job["notified"] = True
+            future = job["future"]
+            error = "cancelled" if future.cancelled() else future.exception()
+            finished.append((job["label"], error))
+    return finished
+
+
+# -------------------------------------
+# Bulk job
+# -------------------------------------
+def users_with_logs():
+    users = ["demo"] + [u["username"] for u in load_users()]
+    return [u for u in dict.fromkeys(users) if file_signature(get_meals_file(u))]
+
+
+def run(period="week", as_of=None, usernames=None, fmt="html", workers=REPORT_WORKERS):
+    """Renders every user's report for the period containing `as_of` (default: yesterday), skipping cached ones."""
+    as_of = as_of or date.today() - timedelta(days=1)
+    usernames = users_with_logs() if usernames is None else list(usernames)
+
+    start = time.perf_counter()
+    pool = ReportPool(workers)
+    jobs, cached = {}, 0
+    for username in usernames:
+        if cached_report(username, period, as_of, fmt):
+            cached += 1
+        else:
+            jobs[username] = pool.submit(username, period, as_of, fmt)
+    wait(jobs.values())
+    pool.close(wait=True)
+
+    failed = [u for u, f in jobs.items() if f.exception() is not None]
+    for username in failed:
+        logger.error("no report for %s: %r", username, jobs[username].exception())
+    seconds = time.perf_counter() - start
+    rendered = len(jobs) - len(failed)
+    logger.info("%d rendered, %d cached, %d failed in %.1f s", rendered, cached, len(failed), seconds)
+    return {"users": len(usernames), "rendered": rendered, "cached": cached, "failed": len(failed),
+            "seconds": round(seconds, 2), "per_second": round(rendered / seconds, 2) if seconds else None}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m reports")
+    parser.add_argument("--period", choices=list(PERIODS), default="week")
+    parser.add_argument("--as-of", type=date.fromisoformat, help="a day in the period (default: yesterday)")
+    parser.add_argument("--format", choices=list(FORMATS), default="html")
+    parser.add_argument("--workers", type=int, default=REPORT_WORKERS)
+    parser.add_argument("--users", help="comma-separated usernames (default: everyone with a meal log)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    result = run(args.period, args.as_of, args.users.split(",") if args.users else None, args.format, args.workers)
+    print(json.dumps(result))
+    return 1 if result["failed"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,143 @@
+# shared_store.py
+import json
+import logging
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from helpers import file_signature
+
+# Snapshots live next to the data; every worker process on the host maps the same files
+SHARED_DIR = os.environ.get("NUTRITION_SHARED_DIR", "data/shared")
+# Set NUTRITION_SHARED=0 to keep each worker's tables private (built in-process)
+SHARED = os.environ.get("NUTRITION_SHARED", "1") != "0"
+
+logger = logging.getLogger("nutrition.shared")
+
+
+# -------------------------------------
+# Frames <-> flat arrays
+# -------------------------------------
+def frame_arrays(df, prefix):
+    """
+    Splits a DataFrame into plain arrays for a snapshot: all float columns as
+    one matrix (so the attached frame is a single zero-copy block), every
+    other column as its own array (text as fixed-width unicode, since
+    object arrays can't be memory-mapped). Returns (arrays, layout).
+    """
+    floats = [col for col in df.columns if pd.api.types.is_float_dtype(df[col])]
+    arrays = {
+        f"{prefix}.index": df.index.to_numpy(),
+        f"{prefix}.floats": df[floats].to_numpy(dtype=float),
+    }
+    for col in df.columns:
+        if col not in floats:
+            values = df[col].to_numpy()
+            arrays[f"{prefix}.{col}"] = values.astype(str) if values.dtype == object else values
+    layout = {"index": df.index.name, "columns": list(df.columns), "floats": floats}
+    return arrays, layout
+
+
+def attach_frame(arrays, layout, prefix):
+    """Rebuilds a frame from frame_arrays() output; float columns stay backed by the shared mapping."""
+    index = pd.Index(arrays[f"{prefix}.index"], name=layout["index"])
+    df = pd.DataFrame(arrays[f"{prefix}.floats"], index=index, columns=layout["floats"], copy=False)
+    for i, col in enumerate(layout["columns"]):
+        if col not in layout["floats"]:
+            values = arrays[f"{prefix}.{col}"]
+            df.insert(i, col, values.astype(object) if values.dtype.kind == "U" else values)
+    return df
+
+
+# -------------------------------------
+# Snapshots on disk
+# -------------------------------------
+def snapshot_key(sources, version):
+    """Names a snapshot after the signatures of the files it was derived from."""
+    parts = [f"v{version}"]
+    for path in sources:
+        sig = file_signature(path)
+        parts.append("-".join(str(v) for v in sig) if sig else "none")
+    return "_".join(parts)
+
+
+def publish(name, key, arrays, meta):
+    """
+    Writes a snapshot directory of .npy files + meta.json. It is assembled
+    in a temp directory and renamed into place, so workers only ever see
+    complete snapshots; if another worker published the same key first,
+    this copy is discarded. Older snapshots of `name` are removed (workers
+    still mapping them keep their pages until they let go).
+    """
+    os.makedirs(SHARED_DIR, exist_ok=True)
+    final = os.path.join(SHARED_DIR, f"{name}-{key}")
+    if os.path.isdir(final):
+        return final
+
+    tmp = tempfile.mkdtemp(prefix=f".{name}-", dir=SHARED_DIR)
+    try:
+        for array_name, values in arrays.items():
+            np.save(os.path.join(tmp, f"{array_name}.npy"), values, allow_pickle=False)
+        with open(os.path.join(tmp, "meta.json"), "w") as f:
+            json.dump({"arrays": list(arrays), "meta": meta}, f)
+        try:
+            os.rename(tmp, final)
+        except OSError:
+            if not os.path.isdir(final):
+                raise
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    for entry in os.listdir(SHARED_DIR):
+        if entry.startswith(f"{name}-") and entry != os.path.basename(final):
+            shutil.rmtree(os.path.join(SHARED_DIR, entry), ignore_errors=True)
+    return final
+
+
+def attach(name, key):
+    """Memory-maps a published snapshot read-only. Returns (arrays, meta), or None if it isn't there."""
+    path = os.path.join(SHARED_DIR, f"{name}-{key}")
+    if not os.path.isdir(path):
+        return None
+    try:
+        with open(os.path.join(path, "meta.json")) as f:
+            manifest = json.load(f)
+        arrays = {
+            array_name: np.asarray(np.load(os.path.join(path, f"{array_name}.npy"), mmap_mode="r"))
+            for array_name in manifest["arrays"]
+        }
+    except (OSError, ValueError):
+        # Damaged (e.g. by a crash before the files hit the disk): rebuild it
+        logger.exception("discarding unreadable snapshot %s", path)
+        shutil.rmtree(path, ignore_errors=True)
+        return None
+    return arrays, manifest["meta"]
+
+
+def shared_snapshot(name, sources, build, version=1):
+    """
+    (arrays, meta) derived from `sources`, shared by every worker on the host.
+
+    The first worker to ask for a given version of the source files runs
+    build() -> (arrays, meta) and publishes the result; every worker (the
+    publisher included) then maps the same read-only files, so the tables
+    exist once in the page cache and new workers skip the parse entirely.
+    Bump `version` when build() changes what it derives.
+    """
+    if not SHARED:
+        return build()
+
+    key = snapshot_key(sources, version)
+    snapshot = attach(name, key)
+    if snapshot is None:
+        arrays, meta = build()
+        try:
+            publish(name, key, arrays, meta)
+        except OSError:
+            logger.exception("could not publish snapshot %s; keeping a private copy", name)
+            return arrays, meta
+        snapshot = attach(name, key) or (arrays, meta)
+    return snapshot
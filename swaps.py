@@ -0,0 +1,214 @@
+# swaps.py
+"""Healthier swaps: foods with a similar macro make-up but fewer calories or more protein."""
+import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from catalog import NUTRIENTS, USDA_FILE, junk_keywords, load_catalog
+from helpers import file_signature
+from portions import PORTIONS_FILE
+from profiling import profiled
+
+HEALTHY_FILE = "healthy_meals.csv"
+GOALS = {"lower_calorie": "Lower calorie", "higher_protein": "Higher protein"}
+# A lighter swap has at most this share of the entry's calories, but still at least the minimum
+LOWER_CALORIE_RATIO = 0.8
+MIN_CALORIE_RATIO = 0.4
+# A higher-protein swap has this much more protein (ratio + grams) for at most this share of the calories
+HIGHER_PROTEIN_RATIO = 1.2
+HIGHER_PROTEIN_GRAMS = 3.0
+HIGHER_PROTEIN_CALORIES = 1.1
+BLOCK_SIZE = 4096  # candidates per block; one block is a (queries x BLOCK_SIZE) float32 matrix
+QUERY_BLOCK = 256
+MACRO_KCAL = np.array([4.0, 4.0, 9.0], dtype=np.float32)  # protein, carbs, fat
+# Junk foods never offered as swaps, plus USDA abbreviations the shared list lets through
+SWAP_JUNK = junk_keywords + ["ice crm", "frankfurter", "formula", "sprd"]
+
+
+def macro_shares(macros):
+    """(n, 3) protein / carbs / fat grams -> calorie shares; NaN rows where there are no macro calories."""
+    kcal = np.asarray(macros, dtype=np.float32) * MACRO_KCAL
+    total = kcal.sum(axis=1, keepdims=True)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(total > 0, kcal / total, np.nan)
+
+
+class SwapIndex:
+    """
+    Swap candidates as parallel arrays, grouped by name:
+      shares    (n, 3) calorie shares, the search vectors
+      per_unit  (n, 4) NUTRIENTS per gram (USDA foods) or per serving (healthy meals)
+      fixed     True for healthy meals, which are always one serving
+      default_grams  portion a USDA food is suggested at when the entry has no grams
+    """
+
+    def __init__(self, names, groups, food_ids, per_unit, fixed, default_grams):
+        self.names = list(names)
+        self.groups = list(groups)
+        self.food_ids = np.asarray(food_ids)  # -1 for healthy meals
+        self.per_unit = np.asarray(per_unit, dtype=np.float32)
+        self.fixed = np.asarray(fixed, dtype=bool)
+        self.default_grams = np.asarray(default_grams, dtype=np.float32)
+        self.shares = macro_shares(self.per_unit[:, 1:]).astype(np.float32)
+
+        codes, uniques = pd.factorize(pd.Series(self.groups))
+        self.group_codes = codes
+        self.group_of = {name: code for code, name in enumerate(uniques)}
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+        self.blocks = self._blocks(starts, len(codes))
+
+    @staticmethod
+    def _blocks(starts, n):
+        """(start, end, group starts relative to start) of roughly BLOCK_SIZE candidates, cut between groups."""
+        blocks, begin = [], 0
+        bounds = list(starts[1:]) + [n]
+        for end in bounds:
+            if end - begin >= BLOCK_SIZE or end == n:
+                rel = starts[(starts >= begin) & (starts < end)] - begin
+                blocks.append((begin, end, rel))
+                begin = end
+        return blocks
+
+    def __len__(self):
+        return len(self.names)
+
+    @profiled("swaps.query", "derive")
+    def swaps(self, entries, goal="lower_calorie", k=3):
+        """
+        Up to `k` swaps for each log entry (DataFrame rows with Meal,
+        NUTRIENTS and optional Grams), closest macro make-up first. Returns
+        one list of dicts per entry.
+        """
+        if goal not in GOALS:
+            raise ValueError(f"unknown swap goal {goal!r}")
+        macros = entries[NUTRIENTS].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=np.float32)
+        grams = (pd.to_numeric(entries["Grams"], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+                 if "Grams" in entries.columns else np.full(len(entries), np.nan))
+        exclude = np.array([self.group_of.get(m, -1) for m in entries["Meal"]], dtype=np.int64)
+
+        results = []
+        for start in range(0, len(entries), QUERY_BLOCK):
+            chunk = slice(start, start + QUERY_BLOCK)
+            best, items = self._search(macros[chunk], grams[chunk], exclude[chunk], goal, k)
+            results += [self._describe(items[q], best[q], grams[chunk][q]) for q in range(len(best))]
+        return results
+
+    def _search(self, macros, grams, exclude, goal, k):
+        """Distances and candidate rows of the `k` nearest allowed groups per query, sorted."""
+        queries = macro_shares(macros[:, 1:])
+        calories, protein = macros[:, 0], macros[:, 1]
+        best = np.full((len(macros), 0), np.inf, dtype=np.float32)
+        items = np.zeros((len(macros), 0), dtype=np.int64)
+
+        for begin, end, rel in self.blocks:
+            shares = self.shares[begin:end]
+            dist = np.zeros((len(macros), end - begin), dtype=np.float32)
+            for j in range(3):
+                dist += (queries[:, j, None] - shares[None, :, j]) ** 2
+
+            # Each candidate's calories / protein at the portion it would be swapped in at
+            amount = np.where(self.fixed[None, begin:end], 1.0,
+                              np.where(np.isnan(grams)[:, None], self.default_grams[None, begin:end], grams[:, None]))
+            cand_calories = self.per_unit[None, begin:end, 0] * amount
+            cand_protein = self.per_unit[None, begin:end, 1] * amount
+            if goal == "lower_calorie":
+                allowed = ((cand_calories <= calories[:, None] * LOWER_CALORIE_RATIO) &
+                           (cand_calories >= calories[:, None] * MIN_CALORIE_RATIO))
+            else:
+                allowed = ((cand_protein >= protein[:, None] * HIGHER_PROTEIN_RATIO + HIGHER_PROTEIN_GRAMS) &
+                           (cand_calories <= calories[:, None] * HIGHER_PROTEIN_CALORIES))
+            allowed &= self.group_codes[None, begin:end] != exclude[:, None]
+            dist[~allowed | np.isnan(dist)] = np.inf
+
+            # Best candidate per group in this block: min distance, then its first position
+            group_best = np.minimum.reduceat(dist, rel, axis=1)
+            sizes = np.diff(np.r_[rel, end - begin])
+            hit = dist == np.repeat(group_best, sizes, axis=1)
+            positions = np.where(hit, np.arange(end - begin)[None, :], end - begin)
+            group_item = np.minimum.reduceat(positions, rel, axis=1) + begin
+
+            best = np.concatenate([best, group_best], axis=1)
+            items = np.concatenate([items, group_item], axis=1)
+            if best.shape[1] > k:
+                keep = np.argpartition(best, k, axis=1)[:, :k]
+                best = np.take_along_axis(best, keep, axis=1)
+                items = np.take_along_axis(items, keep, axis=1)
+
+        order = np.argsort(best, axis=1, kind="stable")
+        return np.take_along_axis(best, order, axis=1), np.take_along_axis(items, order, axis=1)
+
+    def _describe(self, items, dists, grams):
+        swaps = []
+        for i, dist in zip(items, dists):
+            if not np.isfinite(dist):
+                break
+            amount = 1.0 if self.fixed[i] else (self.default_grams[i] if np.isnan(grams) else grams)
+            swap = {
+                "Meal": self.names[i],
+                "DisplayMeal": self.groups[i],
+                "FoodID": None if self.fixed[i] else int(self.food_ids[i]),
+                "Grams": None if self.fixed[i] else round(float(amount), 1),
+                "Distance": round(float(np.sqrt(dist)), 4),
+            }
+            swap.update(zip(NUTRIENTS, np.round(self.per_unit[i].astype(float) * amount, 1).tolist()))
+            swaps.append(swap)
+        return swaps
+
+
+def swap_label(swap):
+    """One-line description of a swap: name, portion, calories and protein."""
+    portion = f"{swap['Grams']:.0f} g, " if swap["Grams"] is not None else ""
+    return f"{swap['Meal']} ({portion}{swap['Calories']:.0f} kcal, {swap['Protein']:.0f} g protein)"
+
+
+def build_swap_index(catalog, healthy_file=HEALTHY_FILE):
+    """
+    Index of every USDA food with usable macros (junk foods left out) and
+    every healthy meal, grouped by DisplayMeal / meal name.
+    """
+    foods = catalog.foods
+    per_gram = catalog.per_gram[:len(foods), :len(NUTRIENTS)]  # USDA rows come first, in foods order
+    junk = foods["Meal"].astype(str).str.lower().str.contains("|".join(map(re.escape, SWAP_JUNK)))
+    usable = np.isfinite(per_gram).all(axis=1) & (per_gram[:, 0] > 0) & ~junk.to_numpy()
+    usda = pd.DataFrame({
+        "Name": foods["Meal"].astype(str).str.title().to_numpy(),
+        "Group": foods["DisplayMeal"].to_numpy(),
+        "FoodID": foods.index.to_numpy(dtype=np.int64),
+        "Fixed": False,
+    })[usable]
+    usda[NUTRIENTS] = per_gram[usable]
+    groups = usda["Group"].unique()
+    default_grams = catalog.portions.to_grams(
+        groups, np.ones(len(groups)), [catalog.portions.default_unit(d) for d in groups])
+    usda["DefaultGrams"] = usda["Group"].map(dict(zip(groups, default_grams)))
+
+    healthy = pd.read_csv(healthy_file)
+    if "DisplayMeal" in healthy.columns and "Meal" not in healthy.columns:
+        healthy = healthy.rename(columns={"DisplayMeal": "Meal"})
+    healthy = healthy.dropna(subset=["Meal"]).drop_duplicates("Meal")
+    for col in NUTRIENTS:
+        healthy[col] = pd.to_numeric(healthy.get(col, np.nan), errors="coerce")
+    healthy = healthy[healthy[NUTRIENTS].notna().all(axis=1) & (healthy["Calories"] > 0)]
+    healthy = pd.DataFrame({
+        "Name": healthy["Meal"], "Group": healthy["Meal"], "FoodID": -1, "Fixed": True,
+        **{col: healthy[col] for col in NUTRIENTS}, "DefaultGrams": np.nan,
+    })
+
+    both = pd.concat([usda, healthy], ignore_index=True)
+    both = both.iloc[np.argsort(pd.factorize(both["Group"])[0], kind="stable")]
+    return SwapIndex(both["Name"], both["Group"], both["FoodID"], both[NUTRIENTS].to_numpy(),
+                     both["Fixed"], both["DefaultGrams"])
+
+
+@lru_cache(maxsize=2)
+def _cached_swap_index(usda_file, healthy_file, versions):
+    return build_swap_index(load_catalog(usda_file), healthy_file)
+
+
+@profiled("swaps.load", "load")
+def load_swap_index(usda_file=USDA_FILE, healthy_file=HEALTHY_FILE):
+    """The swap index, built once per USDA.csv / portions.csv / healthy_meals.csv version."""
+    versions = tuple(tuple(file_signature(f)) for f in (usda_file, PORTIONS_FILE, healthy_file))
+    return _cached_swap_index(usda_file, healthy_file, versions)
@@ -0,0 +1,298 @@
+# write_queue.py
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import partial
+
+from helpers import file_signature
+
+try:
+    import fcntl
+except ImportError:  # Windows: file_lock() then only covers this process
+    fcntl = None
+
+# Set NUTRITION_WRITE_BEHIND=0 to write synchronously (still atomically)
+WRITE_BEHIND = os.environ.get("NUTRITION_WRITE_BEHIND", "1") != "0"
+FLUSH_DELAY = 0.25  # seconds mutations are allowed to coalesce before a flush
+
+logger = logging.getLogger("nutrition.write_queue")
+
+
+# -------------------------------------
+# Atomic file writes
+# -------------------------------------
+def atomic_write(path, value, writer, binary=False):
+    """
+    Writes via a temp file in the same directory + fsync + os.replace, so a
+    crash mid-write leaves either the old file or the new one, never a torn one.
+    """
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with (open(tmp, "wb") if binary else open(tmp, "w", newline="")) as f:
+            writer(f, value)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+# -------------------------------------
+# Cross-process file locks
+# -------------------------------------
+class _PathLock:
+    def __init__(self):
+        self.rlock = threading.RLock()
+        self.depth = 0     # nesting depth of the thread holding rlock
+        self.file = None   # open "<path>.lock" while this process holds the flock
+        self.holds = 0     # completed holds; only the latest one's flush unlocks
+
+
+_path_locks = {}
+_path_locks_guard = threading.Lock()
+
+
+@contextmanager
+def file_lock(path):
+    """
+    Exclusive lock on `path` across every thread and process on the host:
+    an flock on a "<path>.lock" sidecar (the Streamlit workers, the API and
+    the nightly jobs all take the same one). Re-entrant within a thread.
+
+    Threads of this process are let in again as soon as the block exits, but
+    the flock is kept until the write-behind queue has flushed what was
+    staged so far, so another process never reads the file before it lands.
+    """
+    with _path_locks_guard:
+        lock = _path_locks.setdefault(path, _PathLock())
+    with lock.rlock:
+        if lock.file is None and fcntl is not None:
+            f = open(f"{path}.lock", "a")
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            except BaseException:
+                f.close()
+                raise
+            lock.file = f
+        lock.depth += 1
+        try:
+            yield
+        finally:
+            lock.depth -= 1
+            if lock.depth == 0 and lock.file is not None:
+                lock.holds += 1
+                WRITE_QUEUE.after_flush(partial(_unlock, lock, lock.holds))
+
+
+def _unlock(lock, hold):
+    with lock.rlock:
+        # A later hold (or one still open) has staged writes this flush may not cover
+        if lock.depth == 0 and lock.holds == hold and lock.file is not None:
+            fcntl.flock(lock.file, fcntl.LOCK_UN)
+            lock.file.close()
+            lock.file = None
+
+
+def write_text(f, text):
+    f.write(text)
+
+
+def write_bytes(f, data):
+    f.write(data)
+
+
+def write_csv(f, df):
+    df.to_csv(f, index=False)
+
+
+def write_csv_gz(f, df):
+    # mtime=0 keeps the bytes (and so the file) identical for identical content
+    df.to_csv(f, index=False, compression={"method": "gzip", "mtime": 0})
+
+
+def json_state_writer(**signature_files):
+    """
+    Writer for JSON state validated against other files' signatures
+    (e.g. meals_signature=<meals file>). Signatures are taken at flush time,
+    after any pending write to those files in the same flush has landed.
+    """
+    def writer(f, text):
+        state = json.loads(text)
+        for key, path in signature_files.items():
+            state[key] = file_signature(path)
+        json.dump(state, f)
+    return writer
+
+
+# -------------------------------------
+# Write-behind queue
+# -------------------------------------
+class WriteBehindQueue:
+    """
+    Per-process write-behind cache for user files.
+
+    stage() replaces a file's pending content and returns immediately;
+    readers see it through pending() until it is on disk. A background thread
+    flushes FLUSH_DELAY after the first pending change, so bursts of
+    mutations to the same file cost one write. Files are written in the order
+    they were last staged, and never while a batch() is open, so a flush
+    can't split the meals log from the state derived from it.
+    """
+
+    def __init__(self, flush_delay=FLUSH_DELAY, enabled=WRITE_BEHIND):
+        self.flush_delay = flush_delay
+        self.enabled = enabled
+        self.cond = threading.Condition()
+        self.views = {}      # path -> latest staged value (until written)
+        self.dirty = {}      # path -> writer, in staging order
+        self.in_flight = {}  # path -> value the running flush is writing
+        self.seq = 0         # stages so far
+        self.callbacks = []  # (seq, callback) to run once everything staged up to seq is written
+        self.open_batches = 0
+        self.flush_waiting = 0
+        self.local = threading.local()  # batch nesting depth per thread
+        self.flushing = False
+        self.closed = False
+        self.thread = None
+
+    # ---------------------------
+    # Mutations
+    # ---------------------------
+    def stage(self, path, value, writer):
+        if not self.enabled or self.closed:
+            atomic_write(path, value, writer)
+            return
+
+        with self.cond:
+            self.seq += 1
+            self.views[path] = value
+            self.dirty.pop(path, None)
+            self.dirty[path] = writer
+            self._ensure_thread()
+            self.cond.notify_all()
+
+    @contextmanager
+    def batch(self):
+        """Stages inside the block are flushed together (or not at all)."""
+        depth = getattr(self.local, "depth", 0)
+        with self.cond:
+            # A waiting flush goes first, so back-to-back batches can't starve it
+            while self.flush_waiting and depth == 0:
+                self.cond.wait()
+            self.open_batches += 1
+        self.local.depth = depth + 1
+        try:
+            yield
+        finally:
+            self.local.depth = depth
+            with self.cond:
+                self.open_batches -= 1
+                self.cond.notify_all()
+
+    def in_batch(self):
+        """True while the calling thread has a batch() open."""
+        return getattr(self.local, "depth", 0) > 0
+
+    def after_flush(self, callback):
+        """Runs callback() once everything staged so far is on disk (right away if it already is)."""
+        with self.cond:
+            if self.dirty or self.flushing:
+                self.callbacks.append((self.seq, callback))
+                return
+        callback()
+
+    def writing(self, path, value):
+        """
+        True while a flush is writing `value` to `path`. Inside a batch() no
+        new flush can start, so a staged value this returns False for may be
+        changed in place and staged again.
+        """
+        with self.cond:
+            return self.in_flight.get(path) is value
+
+    def pending(self, path):
+        """The staged value for `path` if it hasn't been written yet, else None."""
+        with self.cond:
+            return self.views.get(path)
+
+    # ---------------------------
+    # Flushing
+    # ---------------------------
+    def _ensure_thread(self):
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self.thread.start()
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while not self.dirty and not self.closed:
+                    self.cond.wait()
+                if self.closed:
+                    return
+            time.sleep(self.flush_delay)
+            self.flush()
+
+    def flush(self):
+        """Writes everything pending now. Safe to call from any thread."""
+        with self.cond:
+            self.flush_waiting += 1
+            try:
+                while self.open_batches or self.flushing:
+                    self.cond.wait()
+            finally:
+                self.flush_waiting -= 1
+                self.cond.notify_all()
+            if not self.dirty:
+                return
+            self.flushing = True
+            upto = self.seq
+            snapshot = [(path, self.views[path], writer) for path, writer in self.dirty.items()]
+            self.in_flight = {path: value for path, value, _ in snapshot}
+            self.dirty = {}
+
+        failed = []
+        ready = []
+        try:
+            for path, value, writer in snapshot:
+                try:
+                    atomic_write(path, value, writer)
+                except Exception:
+                    # Kept staged (and visible to readers) for the next flush to retry
+                    logger.exception("write-behind flush failed for %s", path)
+                    failed.append((path, writer))
+        finally:
+            with self.cond:
+                for path, writer in failed:
+                    self.dirty.setdefault(path, writer)
+                for path, value, _ in snapshot:
+                    # Drop the view unless it still has to be written
+                    if path not in self.dirty and self.views.get(path) is value:
+                        del self.views[path]
+                if not failed:
+                    ready = [callback for seq, callback in self.callbacks if seq <= upto]
+                    self.callbacks = [(seq, callback) for seq, callback in self.callbacks if seq > upto]
+                self.in_flight = {}
+                self.flushing = False
+                self.cond.notify_all()
+        for callback in ready:
+            try:
+                callback()
+            except Exception:
+                logger.exception("after-flush callback failed")
+
+    def close(self):
+        """Flushes and stops the background thread (runs at interpreter exit)."""
+        self.flush()
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+
+WRITE_QUEUE = WriteBehindQueue()
+atexit.register(WRITE_QUEUE.close)